@@ -1,4 +1,5 @@
 import sys
+import hmac
 import logging
 from flask import (
     Flask,
@@ -13,8 +14,13 @@ from flask_restx import Namespace, reqparse, Api, Resource
 import os.path
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from api.config import *
+from api.graph_store import get_store, reload_store, pin_store, unpin_store
+from api.conditional import conditional, item_record_age
+from api.response_cache import response_cache
+from api.export import export_lines, gzip_stream, MEDIA_TYPES as EXPORT_MEDIA_TYPES
 from pyldapi import Renderer
 from api.model import *
+from api.model.features import decode_cursor
 from rdflib import Graph, Literal, URIRef
 from rdflib.namespace import DCAT, DCTERMS, RDF
 from pathlib import Path
@@ -51,6 +57,7 @@ def context_processor():
 
 
 @app.route("/")
+@conditional(LandingPageRenderer, cache=True)
 def landing_page():
     try:
         return LandingPageRenderer(request).render()
@@ -63,19 +70,47 @@ def landing_page():
         )
 
 
-@app.route("/cache-clear")
+@app.before_request
+def before_request():
+    # each request sees one version of the data throughout, even if the cache is rebuilt meanwhile
+    pin_store()
+
+
+@app.teardown_request
+def teardown_request(exception=None):
+    unpin_store()
+
+
+@app.route("/cache-clear", methods=["POST"])
 def cache_clear():
-    if Path.is_file(CACHE_FILE):
-        Path.unlink(CACHE_FILE)
+    # rebuilds the cache from the source data: this and the other workers move to it, in-flight requests finish on
+    # the old one. As that is costly, only for those with the CACHE_CLEAR_TOKEN
+    if CACHE_CLEAR_TOKEN is None:
         return Response(
-            "cache cleared",
+            "Clearing the cache is disabled, as CACHE_CLEAR_TOKEN is not set",
+            status=403,
             mimetype="text/plain"
         )
-    else:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), CACHE_CLEAR_TOKEN):
         return Response(
-            "no cache to clear",
-            mimetype="text/plain"
+            "Clearing the cache needs the CACHE_CLEAR_TOKEN, as \"Authorization: Bearer <token>\"",
+            status=401,
+            mimetype="text/plain",
+            headers={"WWW-Authenticate": "Bearer"}
         )
+    store = reload_store()
+    return Response(
+        "cache rebuilt, version {}".format(store.version),
+        mimetype="text/plain"
+    )
+
+
+@app.route("/cache-stats")
+def cache_stats():
+    # the response cache's hit and miss counts and size, for this worker, for sizing RESPONSE_CACHE_MAX_BYTES and
+    # RESPONSE_CACHE_MAX_STREAM_BYTES
+    return jsonify(response_cache.stats())
 
 
 api = Api(app, doc="/doc/", version='1.0', title="OGC LD API",
@@ -94,17 +129,8 @@ class Spec(Resource):
 
 @api.route("/conformance")
 class ConformanceRoute(Resource):
+    @conditional(ConformanceRenderer, cache=True)
     def get(self):
-        q = """
-            PREFIX dcterms: <http://purl.org/dc/terms/>
-            PREFIX ogcapi: <https://data.surroundaustralia.com/def/ogcapi/>
-            
-            SELECT *
-            WHERE {
-                ?uri a ogcapi:ConformanceTarget ;
-                   dcterms:title ?title
-            }
-            """
         graph = get_graph()
         conformance_classes = []
         for s in graph.subjects(predicate=RDF.type, object=OGCAPI.ConformanceTarget):
@@ -117,6 +143,7 @@ class ConformanceRoute(Resource):
 
 @api.route("/collections")
 class CollectionsRoute(Resource):
+    @conditional(CollectionsRenderer, cache=True)
     def get(self):
         return CollectionsRenderer(request).render()
 
@@ -124,12 +151,10 @@ class CollectionsRoute(Resource):
 @api.route("/collections/<string:collection_id>")
 @api.param("collection_id", "The ID of a Collection delivered by this API. See /collections for the list.")
 class CollectionRoute(Resource):
+    @conditional(CollectionRenderer, cache=True)
     def get(self, collection_id):
-        g = get_graph()
         # get the URI for the Collection using the ID
-        collection_uri = None
-        for s in g.subjects(predicate=DCTERMS.identifier, object=Literal(collection_id)):
-            collection_uri = s
+        collection_uri = get_store().identifiers.collection(collection_id)
 
         if collection_uri is None:
             return Response(
@@ -144,18 +169,130 @@ class CollectionRoute(Resource):
 @api.route("/collections/<string:collection_id>/items")
 @api.param("collection_id", "The ID of a Collection delivered by this API. See /collections for the list.")
 class FeaturesRoute(Resource):
+    @conditional(FeaturesRenderer, cache=True)
     def get(self, collection_id):
         return FeaturesRenderer(request, collection_id).render()
 
 
+@api.route("/collections/<string:collection_id>/export")
+@api.param("collection_id", "The ID of a Collection delivered by this API. See /collections for the list.")
+@api.param("cursor", "The cursor of the last Feature received, to resume an export after it")
+class ExportRoute(Resource):
+    def get(self, collection_id):
+        store = get_store()
+        collection_uri = store.identifiers.collection(collection_id)
+        if collection_uri is None:
+            return Response(
+                "You have entered an unknown Collection ID",
+                status=400,
+                mimetype="text/plain"
+            )
+
+        mediatype = request.values.get("_mediatype") or \
+            request.accept_mimetypes.best_match(EXPORT_MEDIA_TYPES, default=EXPORT_MEDIA_TYPES[0])
+        if mediatype not in EXPORT_MEDIA_TYPES:
+            return Response(
+                "The Media Type you requested is not available. It must be one of {}".format(
+                    ", ".join(EXPORT_MEDIA_TYPES)
+                ),
+                status=400,
+                mimetype="text/plain"
+            )
+
+        # resume after the Feature the cursor is of, or where it was if it has gone since
+        start = 0
+        if request.values.get("cursor") is not None:
+            try:
+                direction, uri, _ = decode_cursor(request.values.get("cursor"))
+            except ValueError:
+                direction, uri = None, None
+            if direction != "next":
+                return Response(
+                    "The parameter 'cursor' you supplied is invalid. Use the cursor of an exported Feature",
+                    status=400,
+                    mimetype="text/plain"
+                )
+            start = store.membership.position_of_uri(collection_uri, uri)
+            members = store.membership.members(collection_uri)
+            if start < len(members) and str(members[start]) == uri:
+                start += 1
+
+        # the store is passed in as the stream outlives the request that pins it
+        stream = export_lines(store, collection_uri, start, mediatype)
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if request.accept_encodings["gzip"] > 0:
+            stream = gzip_stream(stream)
+            headers["Content-Encoding"] = "gzip"
+        return Response(stream, mimetype=mediatype, headers=headers)
+
+
 @api.route("/collections/<string:collection_id>/items/<string:item_id>")
 @api.param("collection_id", "The ID of a Collection delivered by this API. See /collections for the list.")
 @api.param("item_id", "The ID of a Feature in this Collection's list of Items")
 class FeatureRoute(Resource):
+    @conditional(StratUnitRenderer, record_age=item_record_age)
     def get(self, collection_id, item_id):
+        if get_store().identifiers.collection(collection_id) is None:
+            return Response(
+                "You have entered an unknown Collection ID",
+                status=400,
+                mimetype="text/plain"
+            )
+        if get_store().identifiers.item(collection_id, item_id) is None:
+            return Response(
+                "You have entered an unknown Item ID",
+                status=400,
+                mimetype="text/plain"
+            )
+
         return StratUnitRenderer(request, collection_id, item_id).render()
 
 
+def hierarchy_response(collection_id, item_id, direction):
+    # no containment links at all means no harvest has stored any yet, rather than that no unit has any
+    if len(get_store().hierarchy) == 0:
+        return Response(
+            "The stratigraphic hierarchy is not available yet: it is indexed from the harvest of the units, which "
+            "hasn't stored any links of units to the units they are part of",
+            status=503,
+            mimetype="text/plain"
+        )
+    if get_store().identifiers.collection(collection_id) is None:
+        return Response(
+            "You have entered an unknown Collection ID",
+            status=400,
+            mimetype="text/plain"
+        )
+    if get_store().identifiers.item(collection_id, item_id) is None:
+        return Response(
+            "You have entered an unknown Item ID",
+            status=400,
+            mimetype="text/plain"
+        )
+
+    return UnitHierarchy(request, collection_id, item_id, direction).render()
+
+
+@api.route("/collections/<string:collection_id>/items/<string:item_id>/ancestors")
+@api.param("collection_id", "The ID of a Collection delivered by this API. See /collections for the list.")
+@api.param("item_id", "The ID of a Feature in this Collection's list of Items")
+@api.param("depth", "The number of levels up the stratigraphic hierarchy to go, all of them if not given")
+class AncestorsRoute(Resource):
+    @conditional(UnitHierarchy, cache=True)
+    def get(self, collection_id, item_id):
+        return hierarchy_response(collection_id, item_id, "ancestors")
+
+
+@api.route("/collections/<string:collection_id>/items/<string:item_id>/descendants")
+@api.param("collection_id", "The ID of a Collection delivered by this API. See /collections for the list.")
+@api.param("item_id", "The ID of a Feature in this Collection's list of Items")
+@api.param("depth", "The number of levels down the stratigraphic hierarchy to go, all of them if not given")
+class DescendantsRoute(Resource):
+    @conditional(UnitHierarchy, cache=True)
+    def get(self, collection_id, item_id):
+        return hierarchy_response(collection_id, item_id, "descendants")
+
+
 @api.route("/object")
 class ObjectRoute(Resource):
     def get(self):
@@ -0,0 +1,32 @@
+from api.config import GRAPH_BACKEND
+
+# The graph backends, by the name GRAPH_BACKEND is set to:
+#
+#   snapshot: the whole graph in a memory-mapped snapshot file (the default)
+#   sqlite:   the whole graph in an on-disk SQLite database, for data that outgrows memory
+#   sparql:   a remote SPARQL endpoint, with the triples the indexes need fetched into a local snapshot
+#
+# Each gives the graph the models read and the numbered graph the store's indexes are built from: the same graph for
+# snapshot and sqlite.
+
+_backend = None
+
+
+def get_backend():
+    """
+    Returns the configured graph backend.
+    """
+    global _backend
+    if _backend is None:
+        if GRAPH_BACKEND == "snapshot":
+            from api.backends.snapshot import SnapshotBackend
+            _backend = SnapshotBackend()
+        elif GRAPH_BACKEND == "sqlite":
+            from api.backends.sqlite import SQLiteBackend
+            _backend = SQLiteBackend()
+        elif GRAPH_BACKEND == "sparql":
+            from api.backends.sparql import SPARQLBackend
+            _backend = SPARQLBackend()
+        else:
+            raise ValueError("Unknown GRAPH_BACKEND {}: it must be snapshot, sqlite or sparql".format(GRAPH_BACKEND))
+    return _backend
@@ -0,0 +1,78 @@
+import fcntl
+import logging
+import os
+from pathlib import Path
+from api.config import DATA_DIR
+from api.snapshot import snapshot_version
+
+
+def data_files():
+    """
+    Returns the source files of the graph.
+    """
+    return sorted(DATA_DIR.glob("**/*.ttl"))
+
+
+class FileBackend:
+    """
+    A graph backend whose data is built into a file shared by all the processes on a host.
+
+    Subclasses give the path of the file, write(), which builds the file, and open(), which returns the graph read by
+    the models and the numbered graph the indexes are built from. The file's version changes whenever it is rebuilt.
+    """
+    path = None
+
+    def write(self):
+        raise NotImplementedError
+
+    def open(self):
+        raise NotImplementedError
+
+    def version(self):
+        """
+        Returns the version of the data the backend would load now, or None if there isn't any.
+        """
+        return self.file_version()
+
+    def file_version(self):
+        """
+        Returns the version of the file, or None if there isn't one.
+        """
+        try:
+            return snapshot_version(os.stat(self.path))
+        except FileNotFoundError:
+            return None
+
+    def build(self, force: bool = False):
+        """
+        Builds the file, if it doesn't exist or force is set.
+
+        Only one process builds it at a time. The new file replaces any old one atomically, so a process reading the
+        old file keeps reading it until it moves to the new one. A process that waited for another's build uses that
+        build rather than building again.
+        """
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        version_before = self.file_version()
+        with open(str(self.path) + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                version = self.file_version()
+                if version is not None and (not force or version != version_before):
+                    return
+                logging.debug("writing {}".format(self.path))
+                self.write()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self):
+        """
+        Returns the (graph, index graph) of the file, building it first if need be.
+        """
+        while True:
+            self.build()
+            logging.debug("reading {}".format(self.path))
+            try:
+                return self.open()
+            except FileNotFoundError:
+                # removed between being built and being opened so build it again
+                continue
@@ -0,0 +1,22 @@
+from rdflib import Graph
+from api.config import CACHE_FILE
+from api.backends.base import FileBackend, data_files
+from api.snapshot import SnapshotGraph, write_snapshot
+
+
+class SnapshotBackend(FileBackend):
+    """
+    The whole graph in a snapshot file, memory-mapped by every process. Lookups are binary searches of the mapped
+    arrays, so this is the fastest backend while the snapshot fits in memory.
+    """
+    path = CACHE_FILE
+
+    def write(self):
+        g = Graph()
+        for f in data_files():
+            g.parse(f)
+        write_snapshot(g, self.path)
+
+    def open(self):
+        graph = SnapshotGraph(self.path)
+        return graph, graph
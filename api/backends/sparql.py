@@ -0,0 +1,214 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from rdflib import Graph, URIRef, BNode, Literal
+from rdflib.namespace import DCTERMS, RDF
+from api import upstream
+from api.config import GEO, GEOX, OGCAPI, SPARQL_ENDPOINT, SPARQL_INDEX_FILE, SPARQL_REFRESH_SECONDS, \
+    SPARQL_RETRY_SECONDS, SPARQL_INDEX_READ_TIMEOUT, SPARQL_CACHE_MAX_ENTRIES, SPARQL_CACHE_MAX_BYTES, \
+    SPARQL_CACHE_SECONDS, UPSTREAM_CONNECT_TIMEOUT
+from api.backends.base import FileBackend
+from api.snapshot import GraphReader, SnapshotGraph, write_snapshot
+
+# A remote SPARQL endpoint as the graph, for data held in a triplestore rather than in files here.
+#
+# The triples the indexes are built from, i.e. the Collections' types and every Feature's membership, identifier,
+# title, description and DGGS geometry, are fetched with one CONSTRUCT query into a local snapshot, which is fetched
+# again, in a background thread rather than by a request, once it is SPARQL_REFRESH_SECONDS old. Listing, paging,
+# searching and filtering Features then need no queries.
+# Everything else the models read is asked of the endpoint a triple pattern at a time, through the pooled upstream HTTP
+# client, and the results are cached.
+
+INDEX_PREDICATES = [DCTERMS.isPartOf, DCTERMS.identifier, DCTERMS.title, DCTERMS.description]
+INDEX_QUERY = """
+    CONSTRUCT {{ ?s ?p ?o . ?s <{has_geometry}> ?geometry . ?geometry <{as_dggs}> ?dggs }}
+    WHERE {{
+        {{ VALUES ?p {{ {predicates} }} ?s ?p ?o }}
+        UNION
+        {{ VALUES (?p ?o) {{ ({type} {collection}) }} ?s ?p ?o }}
+        UNION
+        {{ ?s <{has_geometry}> ?geometry . ?geometry <{as_dggs}> ?dggs }}
+    }}
+""".format(
+    predicates=" ".join(p.n3() for p in INDEX_PREDICATES),
+    type=RDF.type.n3(),
+    collection=OGCAPI.Collection.n3(),
+    has_geometry=GEO.hasGeometry,
+    as_dggs=GEOX.asDGGS
+)
+
+
+class QueryCache:
+    """
+    The results of queries, by query, in least recently used order within a number of entries and a budget of bytes,
+    and each for at most max_age seconds.
+
+    The bytes are those of the queries and their results' terms, which is most of the memory they use.
+    """
+    def __init__(self, max_entries: int, max_bytes: int, max_age: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str):
+        """
+        Returns the results cached for a query, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.max_age:
+                del self._entries[query]
+                self.bytes -= entry[2]
+                return None
+            self._entries.move_to_end(query)
+            return entry[0]
+
+    def put(self, query: str, results):
+        size = len(query)
+        if isinstance(results, list):
+            size += sum(len(term) for row in results for term in row if term is not None)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if query in self._entries:
+                self.bytes -= self._entries.pop(query)[2]
+            self._entries[query] = (results, time.time(), size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+
+
+def _term(binding: dict):
+    # a term of a SPARQL JSON results binding
+    if binding is None:
+        return None
+    elif binding["type"] == "uri":
+        return URIRef(binding["value"])
+    elif binding["type"] == "bnode":
+        return BNode(binding["value"])
+    return Literal(
+        binding["value"],
+        lang=binding.get("xml:lang"),
+        datatype=URIRef(binding["datatype"]) if binding.get("datatype") else None
+    )
+
+
+class SPARQLGraph(GraphReader):
+    """
+    A read-only graph of a remote SPARQL endpoint.
+
+    Blank nodes can't be looked up: an endpoint's blank node labels only identify nodes within one set of results.
+    """
+    def __init__(self, endpoint: str, cache: QueryCache):
+        self.endpoint = endpoint
+        self._cache = cache
+
+    def query(self, query: str):
+        """
+        Returns the results of a SELECT query as tuples of terms, in the order of its variables, or the result of an
+        ASK query.
+        """
+        results = self._cache.get(query)
+        if results is None:
+            r = upstream.get(
+                self.endpoint,
+                params={"query": query},
+                headers={"Accept": "application/sparql-results+json"}
+            )
+            r.raise_for_status()
+            j = r.json()
+            if "boolean" in j:
+                results = j["boolean"]
+            else:
+                variables = j["head"]["vars"]
+                results = [tuple(_term(b.get(v)) for v in variables) for b in j["results"]["bindings"]]
+            self._cache.put(query, results)
+        return results
+
+    def triples(self, triple):
+        if any(isinstance(term, BNode) for term in triple):
+            return
+        variables = []
+        pattern = []
+        for term, variable in zip(triple, ("?s", "?p", "?o")):
+            if term is None:
+                variables.append(variable)
+                pattern.append(variable)
+            else:
+                pattern.append(term.n3())
+
+        if len(variables) == 0:
+            if self.query("ASK {{ {} {} {} }}".format(*pattern)):
+                yield triple
+            return
+        for row in self.query("SELECT {} WHERE {{ {} {} {} }}".format(" ".join(variables), *pattern)):
+            values = iter(row)
+            yield tuple(term if term is not None else next(values) for term in triple)
+
+
+class SPARQLBackend(FileBackend):
+    """
+    A remote SPARQL endpoint, with the triples the indexes are built from held in a local snapshot.
+    """
+    path = SPARQL_INDEX_FILE
+
+    def __init__(self, endpoint: str = SPARQL_ENDPOINT):
+        if endpoint is None:
+            raise ValueError("SPARQL_ENDPOINT must be set to use the sparql graph backend")
+        self.endpoint = endpoint
+        self.cache = QueryCache(SPARQL_CACHE_MAX_ENTRIES, SPARQL_CACHE_MAX_BYTES, SPARQL_CACHE_SECONDS)
+        self._retry_after = 0
+        # the process refreshing the index triples, if one of this one's threads is
+        self._refreshing = None
+        self._refresh_lock = threading.Lock()
+
+    def write(self):
+        # the whole of the index triples can take longer to come than the usual read timeout
+        r = upstream.get(
+            self.endpoint,
+            params={"query": INDEX_QUERY},
+            headers={"Accept": "application/n-triples"},
+            timeout=(UPSTREAM_CONNECT_TIMEOUT, SPARQL_INDEX_READ_TIMEOUT)
+        )
+        r.raise_for_status()
+        g = Graph()
+        g.parse(data=r.text, format="nt")
+        write_snapshot(g, self.path)
+
+    def version(self):
+        # the index triples are fetched again once they are SPARQL_REFRESH_SECONDS old, in the background, and this
+        # process moves to them once they are written: until then it carries on with those it has
+        version = self.file_version()
+        try:
+            stale = version is not None and time.time() - os.stat(self.path).st_mtime > SPARQL_REFRESH_SECONDS
+        except FileNotFoundError:
+            stale = False
+        if stale:
+            with self._refresh_lock:
+                start = self._refreshing != os.getpid() and time.time() >= self._retry_after
+                if start:
+                    self._refreshing = os.getpid()
+            if start:
+                threading.Thread(target=self._refresh, daemon=True).start()
+        return version
+
+    def _refresh(self):
+        try:
+            self.build(force=True)
+        except Exception as e:
+            # carry on with the triples already fetched, and try again later
+            logging.warning("couldn't refresh the index triples from {}: {}".format(self.endpoint, e))
+            self._retry_after = time.time() + SPARQL_RETRY_SECONDS
+        finally:
+            self._refreshing = None
+
+    def open(self):
+        return SPARQLGraph(self.endpoint, self.cache), SnapshotGraph(self.path)
@@ -0,0 +1,176 @@
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.request import pathname2url
+from rdflib import Graph
+from api.config import GRAPH_SQLITE_FILE
+from api.backends.base import FileBackend, data_files
+from api.snapshot import NumberedGraph, encode_term, decode_term, snapshot_version
+
+# The graph in an SQLite database, for data that outgrows memory: only the pages that lookups read are loaded, through
+# SQLite's page cache, and the database is built from the source files one at a time.
+#
+# Terms are numbered in the order of their encoding, as in a snapshot, so the indexes are built the same way from
+# either. The triples are held as term numbers in a table clustered on (s, p, o), with indexes on (p, o, s) and
+# (o, s, p).
+#
+# Each build is a new file named for when it was built, and the backend's path is a symbolic link to the latest one,
+# replaced atomically. A graph connects to the build it was opened on, from every thread and from workers forked
+# after it was opened, so it never reads a newer build than its indexes were built from.
+#
+# An old build is removed once no process has it open: a graph holds a shared lock on its build for as long as it is
+# open, and a build is only removed by a process that can take an exclusive one, when a build is written or opened.
+
+
+def remove_unused_builds(path: Path, keep: Path):
+    """
+    Removes the builds of the database at path but keep that no process has open.
+    """
+    for build in path.parent.glob("{}-*{}".format(path.stem, path.suffix)):
+        if build.name == keep.name:
+            continue
+        try:
+            with open(str(build), "rb") as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                build.unlink()
+        except (BlockingIOError, FileNotFoundError):
+            # open, or removed by another process meanwhile
+            continue
+
+
+def write_sqlite(files, path: Path):
+    """
+    Writes the graph of the given source files to an SQLite database at path.
+    """
+    con = sqlite3.connect(str(path), isolation_level=None)
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.execute("BEGIN")
+    con.execute("CREATE TEMP TABLE raw (s BLOB, p BLOB, o BLOB)")
+    for f in files:
+        g = Graph()
+        g.parse(f)
+        con.executemany("INSERT INTO raw VALUES (?, ?, ?)", (tuple(encode_term(t) for t in triple) for triple in g))
+
+    # rows are numbered in the order they are inserted, so the terms are numbered in the order of their encoding
+    con.execute("CREATE TABLE terms (n INTEGER PRIMARY KEY, term BLOB NOT NULL)")
+    con.execute(
+        "INSERT INTO terms (term) SELECT term FROM (SELECT s AS term FROM raw UNION SELECT p FROM raw UNION "
+        "SELECT o FROM raw) ORDER BY term"
+    )
+    con.execute("CREATE UNIQUE INDEX terms_term ON terms (term)")
+    con.execute("CREATE TABLE triples (s INTEGER, p INTEGER, o INTEGER, PRIMARY KEY (s, p, o)) WITHOUT ROWID")
+    # a triple may be in more than one source file
+    con.execute(
+        """
+        INSERT OR IGNORE INTO triples
+        SELECT ts.n, tp.n, tobj.n FROM raw
+        JOIN terms ts ON ts.term = raw.s
+        JOIN terms tp ON tp.term = raw.p
+        JOIN terms tobj ON tobj.term = raw.o
+        ORDER BY 1, 2, 3
+        """
+    )
+    con.execute("CREATE INDEX triples_pos ON triples (p, o, s)")
+    con.execute("CREATE INDEX triples_osp ON triples (o, s, p)")
+    con.execute("DROP TABLE raw")
+    con.execute("COMMIT")
+    con.execute("ANALYZE")
+    con.close()
+
+
+class SQLiteGraph(NumberedGraph):
+    """
+    A read-only graph in an SQLite database written by write_sqlite().
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        # locked shared while this graph is open, here and in any worker forked after, so the build isn't removed
+        self._file = open(str(self.path), "rb")
+        fcntl.flock(self._file, fcntl.LOCK_SH)
+        stat = os.fstat(self._file.fileno())
+        if stat.st_nlink == 0:
+            # removed between being opened and being locked
+            self._file.close()
+            raise FileNotFoundError("{} has been removed".format(self.path))
+        self.version = snapshot_version(stat)
+        self.modified = stat.st_mtime
+        self._local = threading.local()
+        self._graph = None
+        self._n_triples = self._connection().execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def _connection(self):
+        # one connection per thread, and a new one after a fork as SQLite connections can't cross processes
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.con = sqlite3.connect(
+                "file:{}?mode=ro&immutable=1".format(pathname2url(str(self.path))), uri=True
+            )
+            self._local.pid = os.getpid()
+        return self._local.con
+
+    def term(self, n: int):
+        """
+        Returns the term with the given number.
+        """
+        row = self._connection().execute("SELECT term FROM terms WHERE n = ?", (n,)).fetchone()
+        return decode_term(row[0])
+
+    def number(self, term):
+        """
+        Returns the number of a term, or None if it isn't in the graph.
+        """
+        row = self._connection().execute("SELECT n FROM terms WHERE term = ?", (encode_term(term),)).fetchone()
+        return row[0] if row is not None else None
+
+    def triple_numbers(self, s: int = None, p: int = None, o: int = None):
+        """
+        Returns the matching triples as tuples of term numbers, given the numbers of the terms to match, in the same
+        order as a snapshot gives them.
+        """
+        # the order of the index whose leading columns are the bound terms
+        if s is not None:
+            order = "osp" if o is not None and p is None else "spo"
+        elif p is not None:
+            order = "pos"
+        elif o is not None:
+            order = "osp"
+        else:
+            order = "spo"
+        bound = [(c, n) for c, n in zip("spo", (s, p, o)) if n is not None]
+        sql = "SELECT s, p, o FROM triples WHERE {} ORDER BY {}".format(
+            " AND ".join("{} = ?".format(c) for c, n in bound) or "1",
+            ", ".join(order)
+        )
+        for row in self._connection().execute(sql, [n for c, n in bound]):
+            yield row
+
+    def __len__(self):
+        return self._n_triples
+
+
+class SQLiteBackend(FileBackend):
+    """
+    The whole graph in an SQLite database, for data too big to map a snapshot of into memory.
+    """
+    path = GRAPH_SQLITE_FILE
+
+    def write(self):
+        path = Path(self.path)
+        build = path.with_name("{}-{:x}{}".format(path.stem, time.time_ns(), path.suffix))
+        write_sqlite(data_files(), build)
+
+        link = Path(str(path) + ".tmp")
+        if os.path.lexists(str(link)):
+            link.unlink()
+        os.symlink(build.name, str(link))
+        os.replace(str(link), str(path))
+        remove_unused_builds(path, build)
+
+    def open(self):
+        graph = SQLiteGraph(os.path.realpath(str(self.path)))
+        # any builds before this one that the other processes have moved on from
+        remove_unused_builds(Path(self.path), graph.path)
+        return graph, graph
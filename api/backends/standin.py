@@ -0,0 +1,64 @@
+import sys
+import threading
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import make_server, WSGIServer
+from rdflib import Graph
+from api.backends.base import data_files
+
+# A stand-in SPARQL endpoint answering queries of the source files' graph, for running the API with the sparql graph
+# backend without a triplestore. From the repository root:
+#
+#   python -m api.backends.standin [port]
+#
+# and then run the API with GRAPH_BACKEND=sparql and SPARQL_ENDPOINT=http://localhost:3030/sparql. It only speaks as
+# much of the SPARQL protocol as the backend uses: queries given as the query parameter of a GET or a form POST.
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def make_app(graph: Graph):
+    lock = threading.Lock()
+
+    def app(environ, start_response):
+        params = parse_qs(environ.get("QUERY_STRING", ""))
+        if environ["REQUEST_METHOD"] == "POST":
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+            params.update(parse_qs(environ["wsgi.input"].read(length).decode("utf-8")))
+        if "query" not in params:
+            start_response("400 Bad Request", [("Content-Type", "text/plain")])
+            return [b"No query given"]
+
+        try:
+            with lock:
+                result = graph.query(params["query"][0])
+                if result.type == "CONSTRUCT":
+                    body, mediatype = result.graph.serialize(format="nt"), "application/n-triples"
+                else:
+                    body, mediatype = result.serialize(format="json"), "application/sparql-results+json"
+        except Exception as e:
+            start_response("400 Bad Request", [("Content-Type", "text/plain")])
+            return [str(e).encode("utf-8")]
+
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        start_response("200 OK", [("Content-Type", mediatype), ("Content-Length", str(len(body)))])
+        return [body]
+
+    return app
+
+
+def serve(port: int = 3030):
+    """
+    Serves the stand-in endpoint at http://localhost:<port>/sparql until interrupted.
+    """
+    g = Graph()
+    for f in data_files():
+        g.parse(f)
+    server = make_server("", port, make_app(g), server_class=ThreadingWSGIServer)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else 3030)
@@ -0,0 +1,190 @@
+import calendar
+import hashlib
+import itertools
+from email.utils import formatdate
+from functools import wraps
+from urllib.parse import urlencode
+from flask import request, make_response, Response
+from pyldapi import Renderer, ContainerRenderer
+from api import record_cache, unit_store
+from api.config import RESPONSE_CACHE_MAX_STREAM_BYTES
+from api.graph_store import get_store
+from api.model.profiles import profile_mem
+from api.response_cache import response_cache
+
+# Conditional GET support: validators (ETag and Last-Modified) for this API's responses and the handling of
+# If-None-Match and If-Modified-Since.
+#
+# The validators are worked out from the request alone, i.e. the version of the graph snapshot, the path, the query
+# string and the profile and Media Type negotiated, plus the age of the upstream record for an item. So a request
+# whose representation the client already has gets its 304 before any model is built or the WFS is called. One whose
+# upstream record hasn't been got, or has expired, never gets a 304: it is got afresh and the response's validators
+# are those of what was got.
+#
+# Routes whose responses depend only on the graph and the request can also have them kept in the response cache,
+# streamed ones included if they are short enough to read ahead.
+
+VARY = "Accept, Accept-Profile"
+
+
+def negotiate(renderer_class):
+    """
+    Returns the (profile token, Media Type) that an instance of renderer_class would render the current request
+    in, without making one.
+    """
+    profiles = dict(renderer_class.PROFILES)
+    if issubclass(renderer_class, ContainerRenderer):
+        # containers also offer the Members profile that ContainerRenderer adds
+        profiles["mem"] = profile_mem
+    r = Renderer(request, request.base_url, profiles, renderer_class.DEFAULT_PROFILE_TOKEN)
+    return r.profile, r.mediatype
+
+
+def _query():
+    # the query string, normalised so that parameter order doesn't change the validators
+    return urlencode(sorted(request.args.items(multi=True)))
+
+
+def item_record_age(profile: str, collection_id=None, item_id=None, **kwargs):
+    """
+    Returns the time the upstream record of an item, as the profile uses it, was harvested or fetched, or None if it
+    hasn't been.
+    """
+    if item_id is None:
+        return None
+    stratno = item_id.replace("SU", "")
+    if profile == "gsmlb":
+        # the WFS's own XML, which only the record cache holds: a harvested record is only the fields parsed from it
+        return record_cache.get_fetched(stratno)
+    return unit_store.get_harvested(stratno) or record_cache.get_fetched(stratno)
+
+
+def from_records(renderer_class, profile: str):
+    """
+    Returns whether a renderer_class's representations in a profile are made from the Features' upstream records, as
+    its PROFILE_USES_RECORD says.
+    """
+    return getattr(renderer_class, "PROFILE_USES_RECORD", {}).get(profile, False)
+
+
+def representation_key(renderer_class):
+    """
+    Returns what identifies the representation the current request is for: its (path, normalised query string,
+    profile token, Media Type).
+    """
+    profile, mediatype = negotiate(renderer_class)
+    return request.path, _query(), str(profile), str(mediatype)
+
+
+def validators(store, key: tuple, record_age=None):
+    """
+    Returns the (ETag, Last-Modified time) of the representation with the given key, from the given store.
+
+    :param record_age: the time the upstream data the response is made from was got, if it isn't all in the graph
+    """
+    etag = hashlib.sha1("\n".join((store.version,) + key + (repr(record_age),)).encode("utf-8")).hexdigest()
+    last_modified = max(store.modified, record_age or 0)
+    return etag, last_modified
+
+
+def _headers(etag, last_modified):
+    return {
+        "ETag": '"{}"'.format(etag),
+        "Last-Modified": formatdate(int(last_modified), usegmt=True),
+        "Vary": VARY,
+    }
+
+
+def _not_modified(etag, last_modified):
+    # If-None-Match, when given, is used instead of If-Modified-Since
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since is not None:
+        return int(last_modified) <= calendar.timegm(request.if_modified_since.utctimetuple())
+    return False
+
+
+def _read_ahead(response, limit: int):
+    """
+    Reads a streamed response's body, if it is no longer than limit bytes, so that it can be kept. Returns whether it
+    was: if not, the response streams what was read and then the rest.
+    """
+    chunks = []
+    size = 0
+    stream = iter(response.iter_encoded())
+    for chunk in stream:
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            response.response = itertools.chain(chunks, stream)
+            return False
+    response.set_data(b"".join(chunks))
+    return True
+
+
+def conditional(renderer_class, record_age=None, cache=False):
+    """
+    Decorates a route function or Resource method so that its responses carry validators and a 304 is returned,
+    without calling it, when the client's copy is current.
+
+    :param renderer_class: the Renderer the route renders with, for its profiles and default profile
+    :param record_age: a function of the profile and the route's arguments returning the age of any upstream data the
+        response uses, or None if it hasn't been got or has expired, for the profiles renderer_class's
+        PROFILE_USES_RECORD says use it
+    :param cache: whether to keep the route's responses in the response cache, for routes whose responses depend on
+        nothing but the graph and the request. The responses in profiles made from upstream records aren't kept, nor
+        validated unless record_age is given
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            store = get_store()
+            key = representation_key(renderer_class)
+            if not from_records(renderer_class, key[2]):
+                # this profile's representations are made from the graph alone, whatever the route's
+                age_of = None
+            elif record_age is None:
+                # made from upstream records whose ages aren't known here, so neither validated nor cached
+                response = make_response(f(*args, **kwargs))
+                response.headers["Vary"] = VARY
+                return response
+            else:
+                age_of = record_age
+            age = age_of(key[2], **kwargs) if age_of is not None else None
+            # a response made from upstream data that hasn't been got yet, or has expired, is made from what is got
+            # for it now, so it gets no 304 and its validators are those of what was got
+            validated = None
+            if age_of is None or age is not None:
+                validated = validators(store, key, age)
+                if _not_modified(*validated):
+                    return Response(status=304, headers=_headers(*validated))
+
+            # only those made from the graph alone are kept, as the cache is only for one version of the graph
+            cache_it = cache and age_of is None
+            cached = response_cache.get(store.version, key) if cache_it else None
+            if cached is not None:
+                body, status, cached_headers = cached
+                response = Response(body, status=status, headers=cached_headers)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if cache_it and response.status_code == 200:
+                    if response.is_streamed and not _read_ahead(response, RESPONSE_CACHE_MAX_STREAM_BYTES):
+                        response_cache.skip()
+                    else:
+                        response_cache.put(
+                            store.version,
+                            key,
+                            response.get_data(),
+                            response.status_code,
+                            list(response.headers.items())
+                        )
+            if validated is None:
+                # if what was got wasn't kept, there is nothing to validate against so no validators are given
+                age = age_of(key[2], **kwargs)
+                if age is not None:
+                    validated = validators(store, key, age)
+            if 200 <= response.status_code < 300:
+                response.headers.update(_headers(*validated) if validated is not None else {"Vary": VARY})
+            return response
+        return wrapper
+    return decorator
@@ -1,10 +1,8 @@
 import os
 from rdflib import Graph, Namespace, BNode
 from rdflib.namespace import RDF, RDFS
-from rdflib.plugins.stores.sparqlstore import SPARQLStore
 from pathlib import Path
 import logging
-import pickle
 
 APP_DIR = Path(__file__).parent
 TEMPLATES_DIR = APP_DIR / "view" / "templates"
@@ -13,7 +11,31 @@ LOGFILE = APP_DIR / "ogcapild.log"
 DEBUG = True
 PORT = os.environ.get("PORT", 5000)
 CACHE_HOURS = os.environ.get("CACHE_HOURS", 1)
-CACHE_FILE = APP_DIR / "cache" / "DATA.pickle"
+CACHE_FILE = APP_DIR / "cache" / "DATA.snapshot"
+CACHE_CHECK_SECONDS = float(os.environ.get("CACHE_CHECK_SECONDS", 2))
+# the token a POST to /cache-clear must give, as "Authorization: Bearer <token>": if not set, /cache-clear is disabled
+CACHE_CLEAR_TOKEN = os.environ.get("CACHE_CLEAR_TOKEN")
+GRAPH_BACKEND = os.environ.get("GRAPH_BACKEND", "snapshot")
+GRAPH_SQLITE_FILE = APP_DIR / "cache" / "graph.sqlite"
+SPARQL_ENDPOINT = os.environ.get("SPARQL_ENDPOINT")
+SPARQL_INDEX_FILE = APP_DIR / "cache" / "sparql-index.snapshot"
+SPARQL_REFRESH_SECONDS = float(os.environ.get("SPARQL_REFRESH_SECONDS", 3600))
+SPARQL_RETRY_SECONDS = float(os.environ.get("SPARQL_RETRY_SECONDS", 60))
+SPARQL_INDEX_READ_TIMEOUT = float(os.environ.get("SPARQL_INDEX_READ_TIMEOUT", 300))
+SPARQL_CACHE_MAX_ENTRIES = int(os.environ.get("SPARQL_CACHE_MAX_ENTRIES", 10000))
+SPARQL_CACHE_MAX_BYTES = int(os.environ.get("SPARQL_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+SPARQL_CACHE_SECONDS = float(os.environ.get("SPARQL_CACHE_SECONDS", 300))
+RECORD_CACHE_FILE = APP_DIR / "cache" / "records.sqlite"
+RECORD_CACHE_MAX_ENTRIES = int(os.environ.get("RECORD_CACHE_MAX_ENTRIES", 20000))
+UNIT_STORE_FILE = APP_DIR / "cache" / "units.sqlite"
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 5))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", 30))
+UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", 3))
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", 16))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# the most of a streamed response that is read ahead to keep it in the response cache: a longer one is streamed on
+RESPONSE_CACHE_MAX_STREAM_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_STREAM_BYTES", 4 * 1024 * 1024))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 1000))
 LOCAL_URIS = os.environ.get("LOCAL_URIS", True)
 
 GEO = Namespace("http://www.opengis.net/ont/geosparql#")
@@ -28,16 +50,6 @@ DATA_DIR = APP_DIR.parent / "data"
 
 
 def get_graph():
-    if Path.is_file(CACHE_FILE):  # and not DEBUG:
-        logging.debug("reading from cache")
-        with open(CACHE_FILE, "rb") as f:
-            g = pickle.load(f)
-    else:
-        logging.debug("writing cache")
-        g = Graph()
-        for f in DATA_DIR.glob("**/*.ttl"):
-            g.parse(f)
-        with open(CACHE_FILE, "wb") as f:
-            pickle.dump(g, f)
-
-    return g
+    # the graph is loaded once per process by the graph store, from the configured backend, and shared by all requests
+    from api.graph_store import get_store
+    return get_store().graph
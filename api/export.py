@@ -0,0 +1,103 @@
+import json
+import zlib
+from rdflib.namespace import DCTERMS
+from api import unit_store
+from api.graph_store import GraphStore
+from api.model.features import encode_cursor
+
+# Bulk export of all the Features of a Collection, one per line, as a stream.
+#
+# Features are read from the store's membership index a batch at a time, in URI order, with their harvested records
+# from the unit store, and each batch is written out before the next is read, so the whole Collection is never held
+# in memory. Nothing is fetched from the WFS: Features that haven't been harvested are exported with a null record.
+# GeoJSON Features' geometries are their harvested envelopes, as they are all the geometry the unit store holds.
+#
+# Each Feature carries the cursor to resume the export after it, of the same kind as the items pages' cursors.
+
+NDJSON = "application/x-ndjson"
+GEOJSON_SEQ = "application/geo+json-seq"
+MEDIA_TYPES = [NDJSON, GEOJSON_SEQ]
+BATCH_SIZE = 500
+
+
+def _feature(store: GraphStore, uri):
+    identifier = None
+    title = None
+    description = None
+    for p, o in store.index_graph.predicate_objects(subject=uri):
+        if p == DCTERMS.identifier:
+            identifier = str(o)
+        elif p == DCTERMS.title:
+            title = str(o)
+        elif p == DCTERMS.description:
+            description = str(o)
+    return identifier, title, description
+
+
+def _geometry(envelope):
+    # a GeoJSON geometry of an envelope of (min long, min lat, max long, max lat), or None for no envelope
+    if envelope is None:
+        return None
+    minx, miny, maxx, maxy = envelope
+    if minx == maxx and miny == maxy:
+        return {"type": "Point", "coordinates": [minx, miny]}
+
+    def ring(west, east):
+        return [[west, miny], [east, miny], [east, maxy], [west, maxy], [west, miny]]
+
+    if minx > maxx:
+        # crossing the antimeridian, so cut in two there as RFC 7946 says
+        return {"type": "MultiPolygon", "coordinates": [[ring(minx, 180.0)], [ring(-180.0, maxx)]]}
+    return {"type": "Polygon", "coordinates": [ring(minx, maxx)]}
+
+
+def export_lines(store: GraphStore, collection_uri: str, start: int, mediatype: str):
+    """
+    Yields the export of a Collection's members, from the one at position start on, in batches of lines.
+
+    NDJSON lines are JSON objects. GeoJSON text sequence (RFC 8142) lines are GeoJSON Features, each preceded by the
+    record separator character, with the cursor as a foreign member.
+    """
+    members = store.membership.members(collection_uri)
+    for i in range(start, len(members), BATCH_SIZE):
+        features = [(str(uri),) + _feature(store, uri) for uri in members[i:i + BATCH_SIZE]]
+        records = unit_store.get_records([uri.split("/SU")[-1] for uri, *_ in features])
+
+        lines = []
+        for uri, identifier, title, description in features:
+            record = records.get(uri.split("/SU")[-1])
+            if mediatype == GEOJSON_SEQ:
+                lines.append("\x1e" + json.dumps({
+                    "type": "Feature",
+                    "id": identifier,
+                    "cursor": encode_cursor("next", uri),
+                    "geometry": _geometry(record.get("envelope") if record is not None else None),
+                    "properties": {
+                        "uri": uri,
+                        "title": title,
+                        "description": description,
+                        "record": record,
+                    },
+                }) + "\n")
+            else:
+                lines.append(json.dumps({
+                    "id": identifier,
+                    "cursor": encode_cursor("next", uri),
+                    "uri": uri,
+                    "title": title,
+                    "description": description,
+                    "record": record,
+                }) + "\n")
+        yield "".join(lines).encode("utf-8")
+
+
+def gzip_stream(chunks):
+    """
+    Yields the gzip compression of a stream of chunks of bytes, as it goes.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if len(compressed) > 0:
+            yield compressed
+    yield compressor.flush()
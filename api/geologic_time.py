@@ -0,0 +1,132 @@
+import re
+
+# Named geological ages and ages given as quantities, in millions of years (Ma) before present.
+#
+# The named ages are the eons, eras, periods and epochs of the International Chronostratigraphic Chart (v2023/09),
+# with the Precambrian and the Tertiary, and the Early/Middle/Late series of the periods divided into named epochs.
+# Each is keyed by age_key() of its name and given as (younger bound, older bound), i.e. its top and its base.
+
+ICS_AGES = {
+    # eons
+    "phanerozoic": (0.0, 538.8),
+    "proterozoic": (538.8, 2500.0),
+    "archean": (2500.0, 4031.0),
+    "hadean": (4031.0, 4567.0),
+    "precambrian": (538.8, 4567.0),
+    # eras
+    "cenozoic": (0.0, 66.0),
+    "mesozoic": (66.0, 251.902),
+    "paleozoic": (251.902, 538.8),
+    "neoproterozoic": (538.8, 1000.0),
+    "mesoproterozoic": (1000.0, 1600.0),
+    "paleoproterozoic": (1600.0, 2500.0),
+    "neoarchean": (2500.0, 2800.0),
+    "mesoarchean": (2800.0, 3200.0),
+    "paleoarchean": (3200.0, 3600.0),
+    "eoarchean": (3600.0, 4031.0),
+    # periods
+    "quaternary": (0.0, 2.58),
+    "neogene": (2.58, 23.03),
+    "paleogene": (23.03, 66.0),
+    "tertiary": (2.58, 66.0),
+    "cretaceous": (66.0, 145.0),
+    "jurassic": (145.0, 201.4),
+    "triassic": (201.4, 251.902),
+    "permian": (251.902, 298.9),
+    "carboniferous": (298.9, 358.9),
+    "devonian": (358.9, 419.2),
+    "silurian": (419.2, 443.8),
+    "ordovician": (443.8, 485.4),
+    "cambrian": (485.4, 538.8),
+    "ediacaran": (538.8, 635.0),
+    "cryogenian": (635.0, 720.0),
+    "tonian": (720.0, 1000.0),
+    "stenian": (1000.0, 1200.0),
+    "ectasian": (1200.0, 1400.0),
+    "calymmian": (1400.0, 1600.0),
+    "statherian": (1600.0, 1800.0),
+    "orosirian": (1800.0, 2050.0),
+    "rhyacian": (2050.0, 2300.0),
+    "siderian": (2300.0, 2500.0),
+    # epochs
+    "holocene": (0.0, 0.0117),
+    "pleistocene": (0.0117, 2.58),
+    "pliocene": (2.58, 5.333),
+    "miocene": (5.333, 23.03),
+    "oligocene": (23.03, 33.9),
+    "eocene": (33.9, 56.0),
+    "paleocene": (56.0, 66.0),
+    "latecretaceous": (66.0, 100.5),
+    "earlycretaceous": (100.5, 145.0),
+    "latejurassic": (145.0, 161.5),
+    "middlejurassic": (161.5, 174.7),
+    "earlyjurassic": (174.7, 201.4),
+    "latetriassic": (201.4, 237.0),
+    "middletriassic": (237.0, 247.2),
+    "earlytriassic": (247.2, 251.902),
+    "lopingian": (251.902, 259.51),
+    "guadalupian": (259.51, 273.01),
+    "cisuralian": (273.01, 298.9),
+    "pennsylvanian": (298.9, 323.2),
+    "mississippian": (323.2, 358.9),
+    "latedevonian": (358.9, 382.7),
+    "middledevonian": (382.7, 393.3),
+    "earlydevonian": (393.3, 419.2),
+    "pridoli": (419.2, 423.0),
+    "ludlow": (423.0, 427.4),
+    "wenlock": (427.4, 433.4),
+    "llandovery": (433.4, 443.8),
+    "lateordovician": (443.8, 458.4),
+    "middleordovician": (458.4, 470.0),
+    "earlyordovician": (470.0, 485.4),
+    "furongian": (485.4, 497.0),
+    "miaolingian": (497.0, 509.0),
+    "cambrianseries2": (509.0, 521.0),
+    "terreneuvian": (521.0, 538.8),
+    # the informal Early/Middle/Late of the periods whose epochs have other names
+    "latepermian": (251.902, 259.51),
+    "middlepermian": (259.51, 273.01),
+    "earlypermian": (273.01, 298.9),
+    "latecarboniferous": (298.9, 323.2),
+    "earlycarboniferous": (323.2, 358.9),
+    "latecambrian": (485.4, 497.0),
+    "middlecambrian": (497.0, 509.0),
+    "earlycambrian": (509.0, 538.8),
+}
+
+# factors to Ma from the units of measure of ages, by the end of their URIs or their titles
+UOM_MA = {
+    "ga": 1000.0,
+    "ma": 1.0,
+    "ka": 0.001,
+}
+
+
+def age_key(name: str):
+    """
+    Returns the key of a named age, given its name or its URI: its name, or the last part of its URI, in lower case
+    without spaces or punctuation and with Lower and Upper read as Early and Late, e.g. "Upper Cretaceous" and
+    ".../ischart/LateCretaceous" are both "latecretaceous".
+    """
+    key = re.sub(r"[^a-z0-9]", "", re.split(r"[/#]", name.strip().rstrip("/"))[-1].lower())
+    if key.startswith("lower"):
+        return "early" + key[5:]
+    elif key.startswith("upper"):
+        return "late" + key[5:]
+    return key
+
+
+def in_ma(quantity):
+    """
+    Returns an age given as a (value, uom URI, uom title) quantity in Ma, or None if it isn't a number in a unit of
+    measure of ages.
+    """
+    if quantity is None or quantity[0] is None:
+        return None
+    uom = (quantity[2] or re.split(r"[/#]", quantity[1] or "")[-1]).strip().lower()
+    if uom not in UOM_MA:
+        return None
+    try:
+        return float(quantity[0]) * UOM_MA[uom]
+    except ValueError:
+        return None
@@ -0,0 +1,103 @@
+import threading
+import time
+from api.config import CACHE_CHECK_SECONDS
+from api import unit_store
+from api.backends import get_backend
+from api.index import MembershipIndex, IdentifierIndex, TitleIndex, SpatialIndex, DGGSIndex, HierarchyIndex, \
+    AgeIndex
+from api.snapshot import GraphReader, NumberedGraph
+
+
+class GraphStore:
+    """
+    The data this API delivers, loaded once per process and shared read-only by all request threads.
+
+    A store is never modified after it is built: reloading builds a new GraphStore and swaps it in, so a request
+    holding a reference to the old one keeps a consistent view until it finishes.
+
+    The models read the graph, from whichever backend is configured, and the indexes are built from the backend's
+    index graph, which holds at least the triples they need: the same graph but for a remote one. Its version is that
+    of the index graph and of the last harvest into the unit store, whose envelopes, hierarchy links and ages
+    are indexed here too.
+    """
+    def __init__(self, graph: GraphReader, index_graph: NumberedGraph = None):
+        finished = unit_store.get_finished()
+        self.graph = graph
+        self.index_graph = index_graph if index_graph is not None else graph
+        self.version = _store_version(self.index_graph.version, finished)
+        self.modified = max(self.index_graph.modified, finished or 0)
+        self.loaded = time.time()
+
+        # indexes of the graph for the lookups made on every request
+        self.membership = MembershipIndex(self.index_graph)
+        self.identifiers = IdentifierIndex(self.index_graph, self.membership)
+        self.titles = TitleIndex(self.index_graph, self.membership)
+        self.spatial = SpatialIndex(self.index_graph, self.membership, unit_store.get_envelopes())
+        self.dggs = DGGSIndex(self.index_graph, self.membership)
+        self.hierarchy = HierarchyIndex(self.index_graph, self.membership, unit_store.get_hierarchy_links())
+        self.ages = AgeIndex(self.index_graph, self.membership, unit_store.get_ages())
+
+
+_store = None
+_store_lock = threading.Lock()
+_store_checked = 0
+_pinned = threading.local()
+
+
+def _store_version(file_version, harvest_finished):
+    return "{}-{:x}".format(file_version, int((harvest_finished or 0) * 1000))
+
+
+def get_store():
+    """
+    Returns the store for the current request, if one is pinned for it, or else the current store.
+
+    The current store is swapped for a new one when the backend's data has been rebuilt, by this or any other process,
+    or a harvest has finished. This is checked at most every CACHE_CHECK_SECONDS.
+    """
+    pinned = getattr(_pinned, "store", None)
+    if pinned is not None:
+        return pinned
+
+    global _store, _store_checked
+    if _store is None:
+        with _store_lock:
+            # another thread may have loaded the store while this one waited for the lock
+            if _store is None:
+                _store = GraphStore(*get_backend().load())
+                _store_checked = time.time()
+    elif time.time() - _store_checked > CACHE_CHECK_SECONDS and _store_lock.acquire(blocking=False):
+        # one thread checks and loads any new store while the others carry on with the current one
+        try:
+            if _store_version(get_backend().version(), unit_store.get_finished()) != _store.version:
+                _store = GraphStore(*get_backend().load())
+            _store_checked = time.time()
+        finally:
+            _store_lock.release()
+    return _store
+
+
+def reload_store():
+    """
+    Rebuilds the backend's data and swaps a store of it in for subsequent requests. Other processes swap to it when
+    they next check the backend.
+    """
+    global _store, _store_checked
+    get_backend().build(force=True)
+    with _store_lock:
+        _store = GraphStore(*get_backend().load())
+        _store_checked = time.time()
+    return _store
+
+
+def pin_store():
+    """
+    Pins the current store to this thread, until unpin_store() is called, so that a request sees the one store
+    throughout even if a new one is swapped in while it is being handled.
+    """
+    _pinned.store = None
+    _pinned.store = get_store()
+
+
+def unpin_store():
+    _pinned.store = None
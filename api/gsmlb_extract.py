@@ -0,0 +1,150 @@
+from lxml import etree
+
+# Extracts a Stratigraphic Unit record from a GeoSciML Basic GeologicUnit element.
+#
+# The XPath expressions are compiled once, here, and are relative to the GeologicUnit element (or to one of its
+# GeologicEvents or GeologicUnitHierarchies) so each one only looks at the part of the document it needs rather
+# than the whole document from the root.
+
+NAMESPACES = {
+    "gml": "http://www.opengis.net/gml/3.2",
+    "gsmlb": "http://www.opengis.net/gsml/4.1/GeoSciML-Basic",
+    "swe": "http://www.opengis.net/swe/2.0",
+    "xlink": "http://www.w3.org/1999/xlink",
+}
+
+DESCRIPTION_PURPOSES = {
+    "definingNorm": ("http://resource.geosciml.org/classifier/cgi/descriptionpurpose/defining_norm", "defining norm"),
+    "instance": ("http://resource.geosciml.org/classifier/cgi/descriptionpurpose/instance", "instance"),
+    "typicalNorm": ("http://resource.geosciml.org/classifier/cgi/descriptionpurpose/typical_norm", "typical norm")
+}
+
+
+def _xpath(expression):
+    return etree.XPath(expression, namespaces=NAMESPACES)
+
+
+def _link(element_path):
+    # (href, title) of an xlink property
+    return _xpath(element_path + "/@xlink:href"), _xpath(element_path + "/@xlink:title")
+
+
+def _quantity(element_path):
+    # (value, uom href, uom title) of a swe:Quantity property
+    return (
+        _xpath(element_path + "/swe:Quantity/swe:value/text()"),
+        _xpath(element_path + "/swe:Quantity/swe:uom/@xlink:href"),
+        _xpath(element_path + "/swe:Quantity/swe:uom/@xlink:title"),
+    )
+
+
+GEOLOGIC_UNIT = _xpath("descendant-or-self::gsmlb:GeologicUnit")
+
+# relative to the GeologicUnit
+IDENTIFIER = _xpath(".//gml:identifier/text()")
+NAME = _xpath(".//gml:name/text()")
+DESCRIPTION = _xpath(".//gml:description/text()")
+PURPOSE = _xpath(".//gsmlb:purpose/text()")
+OBSERVATION_METHOD = _link(".//gsmlb:observationMethod")
+GEOLOGIC_UNIT_TYPE = _link(".//gsmlb:geologicUnitType")
+RANK = _link(".//gsmlb:rank")
+GEOLOGIC_EVENT = _xpath(".//gsmlb:geologicHistory/gsmlb:GeologicEvent")
+HIERARCHY_LINKS = _xpath(".//gsmlb:hierarchyLink/gsmlb:GeologicUnitHierarchy")
+ENVELOPE = _xpath("gml:boundedBy/gml:Envelope")
+
+# relative to an Envelope
+SRS_NAME = _xpath("@srsName")
+LOWER_CORNER = _xpath("gml:lowerCorner/text()")
+UPPER_CORNER = _xpath("gml:upperCorner/text()")
+
+# relative to a GeologicEvent
+EVENT_PROCESS = _link("gsmlb:eventProcess")
+YOUNGER_BOUND = _quantity(".//gsmlb:youngerBoundDate")
+OLDER_BOUND = _quantity(".//gsmlb:olderBoundDate")
+YOUNGER_NAMED_AGE = _link(".//gsmlb:youngerNamedAge")
+OLDER_NAMED_AGE = _link(".//gsmlb:olderNamedAge")
+
+# relative to a GeologicUnitHierarchy
+ROLE = _link("gsmlb:role")
+TARGET_UNIT = _link("gsmlb:targetUnit")
+
+
+def _first(xpath, element):
+    results = xpath(element)
+    return results[0] if len(results) > 0 else None
+
+
+def _values(xpaths, element):
+    # a tuple of the first result of each XPath, or None if the first XPath finds nothing
+    values = tuple(_first(x, element) for x in xpaths)
+    return values if values[0] is not None else None
+
+
+def _envelope(unit):
+    # the unit's extent as (min long, min lat, max long, max lat), or None
+    envelope = _first(ENVELOPE, unit)
+    if envelope is None:
+        return None
+    lower = _first(LOWER_CORNER, envelope)
+    upper = _first(UPPER_CORNER, envelope)
+    if lower is None or upper is None:
+        return None
+    lower = [float(x) for x in lower.split()]
+    upper = [float(x) for x in upper.split()]
+    # EPSG:4326 in its URN or URI forms has its axes in lat/long order, other CRSs used here long/lat
+    srs_name = _first(SRS_NAME, envelope) or ""
+    if "EPSG::4326" in srs_name or "EPSG/0/4326" in srs_name:
+        lower.reverse()
+        upper.reverse()
+    return lower[0], lower[1], upper[0], upper[1]
+
+
+def extract_strat_unit(element):
+    """
+    Returns the record dict for a Stratigraphic Unit from a GeologicUnit element, or from a document containing one.
+
+    :raises IndexError: if there is no GeologicUnit or it lacks one of the mandatory properties
+    """
+    unit = GEOLOGIC_UNIT(element)[0]
+
+    description_purpose = _first(PURPOSE, unit)
+    if description_purpose is not None:
+        description_purpose = DESCRIPTION_PURPOSES[description_purpose]
+
+    event_process = None
+    younger_bound = None
+    older_bound = None
+    younger_named_age = None
+    older_named_age = None
+    event = _first(GEOLOGIC_EVENT, unit)
+    if event is not None:
+        event_process = _values(EVENT_PROCESS, event)
+        younger_bound = _values(YOUNGER_BOUND, event)
+        older_bound = _values(OLDER_BOUND, event)
+        younger_named_age = _values(YOUNGER_NAMED_AGE, event)
+        older_named_age = _values(OLDER_NAMED_AGE, event)
+
+    hierarchy_links = [
+        {
+            "role": (_first(ROLE[0], hl), _first(ROLE[1], hl)),
+            "targetUnit": (_first(TARGET_UNIT[0], hl), _first(TARGET_UNIT[1], hl)),
+        }
+        for hl in HIERARCHY_LINKS(unit)
+    ]
+
+    return {
+        "uri": IDENTIFIER(unit)[0],
+        "title": NAME(unit)[0],
+        "description": _first(DESCRIPTION, unit),
+        "observationMethod": (OBSERVATION_METHOD[0](unit)[0], OBSERVATION_METHOD[1](unit)[0]),
+        "descriptionPurpose": description_purpose,
+        "geologicUnitType": (GEOLOGIC_UNIT_TYPE[0](unit)[0], GEOLOGIC_UNIT_TYPE[1](unit)[0]),
+        "stratigraphicRank": (RANK[0](unit)[0], RANK[1](unit)[0]),
+        "eventProcess": event_process,
+        "youngerBound": younger_bound,
+        "olderBound": older_bound,
+        "youngerNamedAge": younger_named_age,
+        "olderNamedAge": older_named_age,
+        "hierarchyLinks": hierarchy_links if len(hierarchy_links) > 0 else None,
+        "envelope": _envelope(unit),
+    }
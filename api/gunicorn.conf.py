@@ -0,0 +1,22 @@
+import gc
+import os
+
+# Gunicorn settings for serving the API, from the api directory: gunicorn --config gunicorn.conf.py app:app
+#
+# The app is loaded, and the graph store with its indexes built, once in the master process before the workers are
+# forked, so the workers share that memory copy-on-write rather than each building their own copy. With the default
+# backend the graph itself is a memory-mapped snapshot file, and the indexes are arrays, so workers reading them don't
+# write to (and so copy) the shared pages.
+
+bind = "0.0.0.0:{}".format(os.environ.get("PORT", 5000))
+workers = int(os.environ.get("WORKERS", 4))
+preload_app = True
+
+
+def when_ready(server):
+    # called in the master after the app is preloaded and before any workers are forked
+    from api.graph_store import get_store
+    get_store()
+    # move everything allocated so far out of the garbage collector's reach so collections in the workers don't
+    # write to the shared pages
+    gc.freeze()
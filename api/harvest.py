@@ -0,0 +1,127 @@
+"""
+Harvests every Stratigraphic Unit from the GeoSciML WFS into the local unit store, so that StratUnit can be
+delivered without calling the WFS.
+
+Run from the repository root, e.g. nightly:
+
+    python -m api.harvest [--page-size 200] [--workers 4] [--restart]
+
+An interrupted harvest is resumed from the pages not yet stored unless --restart is given. It must be resumed with
+the page size it was started with.
+"""
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from lxml import etree
+from api import unit_store, upstream
+from api.gsmlb_extract import extract_strat_unit
+
+GSMLB_WFS = "http://stratunits.gs.cloud.ga.gov.au/gsmlb/wfs"
+NAMESPACES = {
+    "wfs": "http://www.opengis.net/wfs/2.0",
+    "gsmlb": "http://www.opengis.net/gsml/4.1/GeoSciML-Basic",
+}
+
+
+def get_no_of_geologic_units():
+    r = upstream.get(
+        GSMLB_WFS,
+        params={
+            "service": "WFS",
+            "version": "2.0.0",
+            "request": "GetFeature",
+            "typeName": "gsmlb:GeologicUnit",
+            "resultType": "hits",
+        }
+    )
+    r.raise_for_status()
+
+    return int(r.text.split("numberMatched=\"", 1)[1].split("\"", 1)[0])
+
+
+def get_page(start_index: int, count: int):
+    """
+    Fetches one page of GeologicUnits and returns them parsed, as a dict of stratno: record.
+    """
+    r = upstream.get(
+        GSMLB_WFS,
+        params={
+            "service": "WFS",
+            "version": "2.0.0",
+            "request": "GetFeature",
+            "typeName": "gsmlb:GeologicUnit",
+            "sortBy": "gml:identifier",
+            "startIndex": start_index,
+            "count": count,
+        }
+    )
+    r.raise_for_status()
+
+    tree = etree.fromstring(r.content)
+    records = {}
+    for unit in tree.xpath("//wfs:member/gsmlb:GeologicUnit", namespaces=NAMESPACES):
+        record = extract_strat_unit(unit)
+        records[record["uri"].split("/SU")[1]] = record
+
+    return records
+
+
+def harvest(page_size: int = 200, workers: int = 4, restart: bool = False):
+    state = None if restart else unit_store.get_harvest_state()
+    if state is None:
+        total = get_no_of_geologic_units()
+        started = unit_store.start_harvest(total, page_size)
+        done = set()
+    else:
+        started, total, started_page_size, done = state
+        # the pages done are known by their start indexes, which are only those of pages of another size by chance,
+        # so pages of another size would leave gaps: the units in them would be taken as gone from the WFS
+        if started_page_size != page_size:
+            logging.error(
+                "the unfinished harvest was started with a page size of {}: resume it with that or use --restart"
+                .format(started_page_size if started_page_size is not None else "unknown")
+            )
+            return False
+        logging.info("resuming harvest, {} pages already stored".format(len(done)))
+
+    pages = [i for i in range(0, total, page_size) if i not in done]
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(get_page, i, page_size): i for i in pages}
+        for future in as_completed(futures):
+            start_index = futures[future]
+            try:
+                records = future.result()
+            except Exception as e:
+                logging.error("page starting at {} failed: {}".format(start_index, e))
+                failed.append(start_index)
+                continue
+            # stored from this thread only so SQLite sees a single writer per harvest
+            unit_store.put_page(start_index, records)
+            logging.info("stored {} units from {}".format(len(records), start_index))
+
+    if len(failed) > 0:
+        logging.error("{} pages failed, run the harvest again to resume".format(len(failed)))
+        return False
+
+    unit_store.finish_harvest(started)
+    logging.info("harvest finished in {:.0f}s, {} units stored".format(time.time() - started, unit_store.count()))
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        datefmt="%Y-%m-%d %H:%M:%S",
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--restart", action="store_true", help="ignore any unfinished harvest and start again")
+    args = parser.parse_args()
+
+    if not harvest(args.page_size, args.workers, args.restart):
+        sys.exit(1)
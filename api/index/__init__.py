@@ -0,0 +1,7 @@
+from api.index.membership import MembershipIndex
+from api.index.identifiers import IdentifierIndex
+from api.index.title_search import TitleIndex
+from api.index.spatial import SpatialIndex
+from api.index.dggs import DGGSIndex
+from api.index.hierarchy import HierarchyIndex
+from api.index.ages import AgeIndex
@@ -0,0 +1,116 @@
+import math
+import re
+from array import array
+from api.geologic_time import ICS_AGES, age_key
+from api.index.membership import MembershipIndex, TermSequence
+from api.index.spatial import PackedRTree
+from api.snapshot import NumberedGraph
+
+NUMBER = re.compile(r"^(\d+(\.\d*)?|\.\d+)$")
+
+
+class AgeIndex:
+    """
+    The ages of the Stratigraphic Units, from the age bounds and named ages harvested into the unit store, as
+    intervals in Ma in a packed R-tree, for finding the members of a Collection whose ages overlap a range.
+
+    A unit's age is from its numeric bounds where it has them and otherwise from the spans of its named ages: those of
+    the ICS chart or, for the named ages not in it, those derived from the data, i.e. from the numeric bounds of the
+    units given that named age.
+    """
+    def __init__(self, graph: NumberedGraph, membership: MembershipIndex, ages):
+        """
+        :param ages: an iterable of (stratno, younger bound in Ma, older bound in Ma, younger named age, older named
+            age)
+        """
+        self._graph = graph
+        self._membership = membership
+        ages = list(ages)
+
+        # the spans of the named ages not in the ICS chart, from the bounds of the units given them
+        bounds = {}
+        for stratno, younger, older, younger_named, older_named in ages:
+            if younger_named is not None and younger is not None:
+                bounds.setdefault(age_key(younger_named), []).append(younger)
+            if older_named is not None and older is not None:
+                bounds.setdefault(age_key(older_named), []).append(older)
+        self._derived = {k: (min(v), max(v)) for k, v in bounds.items() if k not in ICS_AGES}
+
+        intervals = {}
+        for stratno, younger, older, younger_named, older_named in ages:
+            younger_span = self.span(younger_named) if younger_named is not None else None
+            older_span = self.span(older_named) if older_named is not None else None
+            if younger is None:
+                younger = (younger_span or older_span or (None, None))[0]
+            if older is None:
+                older = (older_span or younger_span or (None, None))[1]
+            # a unit with only one bound is taken to be of that age
+            if younger is None or older is None:
+                younger = older = younger if younger is not None else older
+            if younger is not None:
+                intervals[str(stratno)] = (min(younger, older), max(younger, older))
+
+        # a tree for each Collection, of the positions of its members that have ages, as intervals along the x axis
+        self._trees = {}
+        for collection_uri in membership.collections() if len(intervals) > 0 else []:
+            positions = []
+            boxes = []
+            for p, n in enumerate(membership.member_numbers(collection_uri)):
+                interval = intervals.get(str(graph.term(n)).split("/SU")[-1])
+                if interval is not None:
+                    positions.append(p)
+                    boxes.append((interval[0], 0.0, interval[1], 0.0))
+            if len(positions) > 0:
+                tree = PackedRTree(boxes)
+                tree.ids = array("I", (positions[i] for i in tree.ids))
+                self._trees[collection_uri] = tree
+        self._count = len(intervals)
+
+    def __len__(self):
+        return self._count
+
+    def span(self, name: str):
+        """
+        Returns the (younger, older) bounds in Ma of a named age, given its name or URI, or None if it isn't known.
+        """
+        key = age_key(name)
+        return ICS_AGES.get(key) or self._derived.get(key)
+
+    def parse(self, value: str):
+        """
+        Returns the (younger, older) bounds in Ma of an age filter: an age in Ma, e.g. 260, a named age, e.g. Permian,
+        or a range from the younger to the older of two of them, e.g. 250/300 or Permian/Triassic, either of which may
+        be ".." for no bound.
+
+        :raises ValueError: if the value isn't one of those or names an unknown age
+        """
+        ends = [end.strip() for end in value.split("/")]
+        if len(ends) > 2:
+            raise ValueError("an age filter has at most two ends")
+        younger = []
+        older = []
+        for i, end in enumerate(ends):
+            if end == ".." and len(ends) == 2:
+                if i == 0:
+                    younger.append(0.0)
+                else:
+                    older.append(math.inf)
+                continue
+            span = (float(end), float(end)) if NUMBER.match(end) else self.span(end) if end != "" else None
+            if span is None:
+                raise ValueError("unknown named age {}".format(end))
+            younger.append(span[0])
+            older.append(span[1])
+        return min(younger + older), max(younger + older)
+
+    def overlapping(self, collection_uri: str, younger: float, older: float):
+        """
+        Returns the URIs of the members of a Collection whose ages overlap the range from younger to older Ma, in URI
+        order.
+        """
+        tree = self._trees.get(str(collection_uri))
+        if tree is None:
+            return TermSequence(self._graph, array("I"))
+        positions = tree.search(younger, 0.0, older, 0.0)
+        members = self._membership.member_numbers(collection_uri)
+        return TermSequence(self._graph, array("I", (members[p] for p in sorted(positions))))
@@ -0,0 +1,82 @@
+from array import array
+from bisect import bisect_left
+from api.config import GEO, GEOX
+from api.index.membership import MembershipIndex, TermSequence
+from api.snapshot import NumberedGraph
+
+
+def dggs_cells(literal: str):
+    """
+    Returns the cell IDs of a geox:asDGGS literal, e.g. "<https://w3id.org/dggs/auspix> POLYGON (R1234 R1235)".
+    """
+    return literal.partition("POLYGON (")[2].partition(")")[0].split()
+
+
+class _CollectionCells:
+    # every cell of every member of a Collection with a DGGS geometry, sorted, with the position of the member each is
+    # of, and the number of cells each of those members has
+    def __init__(self, cells: list, positions: array, counts: dict):
+        self.cells = cells
+        self.positions = positions
+        self.counts = counts
+
+
+class DGGSIndex:
+    """
+    The DGGS cells of the Features' geometries (their geo:hasGeometry/geox:asDGGS), as sorted cell IDs for finding the
+    members of a Collection within a cell.
+
+    A cell's sub-cells have IDs starting with its ID, so all the cells within a cell are a range of the sorted IDs. A
+    Feature is within a cell when all its cells are: when as many of its cells are in that range as it has.
+    """
+    def __init__(self, graph: NumberedGraph, membership: MembershipIndex):
+        self._graph = graph
+        self._membership = membership
+
+        cells = {}
+        for f, geometry in graph.subject_objects(predicate=GEO.hasGeometry):
+            for dggs in graph.objects(subject=geometry, predicate=GEOX.asDGGS):
+                cells.setdefault(graph.number(f), []).extend(dggs_cells(str(dggs)))
+
+        self._collections = {}
+        for collection_uri in membership.collections() if len(cells) > 0 else []:
+            pairs = []
+            counts = {}
+            for position, n in enumerate(membership.member_numbers(collection_uri)):
+                member_cells = set(cells.get(n, ()))
+                if len(member_cells) > 0:
+                    pairs.extend((cell, position) for cell in member_cells)
+                    counts[position] = len(member_cells)
+            pairs.sort()
+            self._collections[collection_uri] = _CollectionCells(
+                [cell for cell, position in pairs],
+                array("I", (position for cell, position in pairs)),
+                counts
+            )
+
+    def within(self, collection_uri: str, *cell_ids):
+        """
+        Returns the URIs of the members of a Collection whose every cell is within one of the given cells, in URI
+        order.
+        """
+        index = self._collections.get(str(collection_uri))
+        if index is None:
+            return TermSequence(self._graph, array("I"))
+
+        # a cell within another adds nothing to it
+        cell_ids = sorted(set(cell_ids))
+        cell_ids = [c for c in cell_ids if not any(c != o and c.startswith(o) for o in cell_ids)]
+
+        # the number of each member's cells that are within the given cells, by a range scan for each
+        within = {}
+        for cell_id in cell_ids:
+            start = bisect_left(index.cells, cell_id)
+            end = bisect_left(index.cells, cell_id + "\uffff", start)
+            for p in index.positions[start:end]:
+                within[p] = within.get(p, 0) + 1
+
+        members = self._membership.member_numbers(collection_uri)
+        return TermSequence(
+            self._graph,
+            array("I", (members[p] for p in sorted(within.keys()) if within[p] == index.counts[p]))
+        )
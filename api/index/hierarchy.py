@@ -0,0 +1,97 @@
+from array import array
+from bisect import bisect_right
+from api.index.membership import MembershipIndex, TermSequence
+from api.snapshot import NumberedGraph
+
+# the roles of the hierarchy links that place a unit within another: a unit's other links, e.g. to units it is
+# equivalent to or overlies, aren't part of the hierarchy
+CONTAINMENT_ROLES = {
+    "http://pid.geoscience.gov.au/def/voc/stratigraphichierarchy/member_of",
+    "http://pid.geoscience.gov.au/def/voc/stratigraphichierarchy/part_of",
+}
+
+
+class _Closure:
+    # the units related to each member of a Collection in one direction, up or down the hierarchy, as runs of the
+    # members' term numbers, each sorted by depth and then term number, i.e. URI, with each one's depth
+    def __init__(self, adjacency: dict, stratnos: list, number_of: dict):
+        self.starts = array("I", [0])
+        self.numbers = array("I")
+        self.depths = array("H")
+        for stratno in stratnos:
+            # breadth first, so each unit is reached first by the fewest links, and a cycle in the links ends
+            depth_of = {stratno: 0}
+            frontier = [stratno]
+            depth = 0
+            while len(frontier) > 0:
+                depth += 1
+                reached = []
+                for s in frontier:
+                    for t in adjacency.get(s, ()):
+                        if t not in depth_of:
+                            depth_of[t] = depth
+                            reached.append(t)
+                frontier = reached
+            related = sorted((d, number_of[t]) for t, d in depth_of.items() if d > 0 and t in number_of)
+            self.numbers.extend(n for d, n in related)
+            self.depths.extend(d for d, n in related)
+            self.starts.append(len(self.numbers))
+
+
+class HierarchyIndex:
+    """
+    The hierarchy of the Stratigraphic Units, from the hierarchy links harvested into the unit store. A unit is a child
+    of the targetUnit of each of its links whose role is one of CONTAINMENT_ROLES, e.g. a Formation is a child of the
+    Group it is a member_of. Links in other roles are ignored.
+
+    The transitive closure is precomputed both ways for the members of each Collection: every member's ancestors and
+    descendants, with their depths, i.e. the fewest links between them. Each member's are sorted by depth and then URI,
+    so those to a depth are a slice of them, found by binary search, and a page of those a slice of that.
+    """
+    def __init__(self, graph: NumberedGraph, membership: MembershipIndex, links):
+        """
+        :param links: an iterable of (stratno, role, target stratno)
+        """
+        self._graph = graph
+        parents = {}
+        children = {}
+        for stratno, role, target in links:
+            if role in CONTAINMENT_ROLES and stratno != target:
+                parents.setdefault(stratno, set()).add(target)
+                children.setdefault(target, set()).add(stratno)
+
+        self._ancestors = {}
+        self._descendants = {}
+        for collection_uri in membership.collections() if len(parents) > 0 else []:
+            members = membership.member_numbers(collection_uri)
+            stratnos = [str(graph.term(n)).split("/SU")[-1] for n in members]
+            number_of = dict(zip(stratnos, members))
+            self._ancestors[collection_uri] = _Closure(parents, stratnos, number_of)
+            self._descendants[collection_uri] = _Closure(children, stratnos, number_of)
+        self._count = sum(len(x) for x in parents.values())
+
+    def __len__(self):
+        return self._count
+
+    def _related(self, closures: dict, collection_uri: str, position: int, max_depth: int = None):
+        closure = closures.get(str(collection_uri))
+        if closure is None:
+            return TermSequence(self._graph, array("I")), array("H")
+        start, end = closure.starts[position], closure.starts[position + 1]
+        if max_depth is not None:
+            end = bisect_right(closure.depths, max_depth, start, end)
+        return TermSequence(self._graph, closure.numbers[start:end]), closure.depths[start:end]
+
+    def ancestors(self, collection_uri: str, position: int, max_depth: int = None):
+        """
+        Returns the URIs of the ancestors, in the Collection, of the member at the given position in it, to max_depth
+        links up if given, and their depths, nearest first and then in URI order.
+        """
+        return self._related(self._ancestors, collection_uri, position, max_depth)
+
+    def descendants(self, collection_uri: str, position: int, max_depth: int = None):
+        """
+        Returns the URIs of the descendants, in the Collection, of the member at the given position in it, to
+        max_depth links down if given, and their depths, nearest first and then in URI order.
+        """
+        return self._related(self._descendants, collection_uri, position, max_depth)
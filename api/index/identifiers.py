@@ -0,0 +1,39 @@
+from rdflib.namespace import DCTERMS, RDF
+from api.config import OGCAPI
+from api.index.membership import MembershipIndex
+from api.snapshot import NumberedGraph
+
+
+class IdentifierIndex:
+    """
+    Maps the IDs used in this API's routes straight to the things they identify: Collection IDs to Collection URIs and
+    (Collection ID, Item ID) pairs to the URI and title of the Feature.
+
+    Items are found through the membership index's sorted identifier arrays, so nothing is held per item here.
+    """
+    def __init__(self, graph: NumberedGraph, membership: MembershipIndex):
+        self._graph = graph
+        self._membership = membership
+        self._collections = {}
+        for c in graph.subjects(predicate=RDF.type, object=OGCAPI.Collection):
+            for collection_id in graph.objects(subject=c, predicate=DCTERMS.identifier):
+                self._collections[str(collection_id)] = str(c)
+
+    def collection(self, collection_id: str):
+        """
+        Returns the URI of the Collection with the given ID, or None.
+        """
+        return self._collections.get(collection_id)
+
+    def item(self, collection_id: str, item_id: str):
+        """
+        Returns a tuple of the URI and title of the Feature with the given ID in the given Collection, or None.
+        """
+        collection_uri = self._collections.get(collection_id)
+        if collection_uri is None:
+            return None
+        uri = self._membership.member(collection_uri, item_id)
+        if uri is None:
+            return None
+        title = self._graph.value(subject=uri, predicate=DCTERMS.title)
+        return str(uri), str(title) if title is not None else None
@@ -0,0 +1,141 @@
+from array import array
+from bisect import bisect_left
+from rdflib import URIRef, Literal
+from rdflib.namespace import DCTERMS
+from api.snapshot import NumberedGraph
+
+
+class TermSequence:
+    """
+    A read-only sequence of a graph's terms, held as an array of term numbers and turned into terms when read.
+    """
+    def __init__(self, graph: NumberedGraph, numbers: array):
+        self._graph = graph
+        self._numbers = numbers
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._graph.term(n) for n in self._numbers[i]]
+        return self._graph.term(self._numbers[i])
+
+    def __iter__(self):
+        for n in self._numbers:
+            yield self._graph.term(n)
+
+    def index(self, term):
+        # found by term number, without turning the others into terms
+        n = self._graph.number(term)
+        if n is None:
+            raise ValueError("{} is not in the sequence".format(term))
+        return self._numbers.index(n)
+
+    def intersection(self, other):
+        """
+        Returns the terms of this sequence that are also in another of the same graph's, in this one's order.
+        """
+        keep = set(other._numbers)
+        return TermSequence(self._graph, array("I", (n for n in self._numbers if n in keep)))
+
+
+class MembershipIndex:
+    """
+    The members of each Collection, i.e. everything that is dcterms:isPartOf it, sorted by URI.
+
+    A page of members is then a slice, a Collection's member count a lookup, and a member's position in its
+    Collection's sorted members can be found from its identifier.
+
+    The index is held in arrays of term numbers rather than Python objects per member, so that it is compact and, when
+    built before a server forks its workers, its memory stays shared by them: reading it doesn't touch any per-member
+    object's reference count.
+    """
+    def __init__(self, graph: NumberedGraph):
+        self._graph = graph
+        is_part_of = graph.number(DCTERMS.isPartOf)
+        identifier = graph.number(DCTERMS.identifier)
+
+        members = {}
+        if is_part_of is not None:
+            for s, p, o in graph.triple_numbers(p=is_part_of):
+                members.setdefault(o, []).append(s)
+
+        identifiers = {}
+        if identifier is not None:
+            for s, p, o in graph.triple_numbers(p=identifier):
+                identifiers.setdefault(s, []).append(o)
+
+        # for each Collection URI: members, sorted (term numbers sort as their URIs do), and the identifiers of the
+        # members, sorted, with each one's position in the members
+        self._members = {}
+        self._identifiers = {}
+        for collection, numbers in members.items():
+            numbers.sort()
+            by_identifier = sorted((i, position) for position, n in enumerate(numbers) for i in identifiers.get(n, []))
+            collection_uri = str(graph.term(collection))
+            self._members[collection_uri] = array("I", numbers)
+            self._identifiers[collection_uri] = (
+                array("I", (i for i, position in by_identifier)),
+                array("I", (position for i, position in by_identifier)),
+            )
+
+    def members(self, collection_uri: str):
+        """
+        Returns the URIs of all a Collection's members, in order.
+        """
+        return TermSequence(self._graph, self._members.get(str(collection_uri), array("I")))
+
+    def member_numbers(self, collection_uri: str):
+        """
+        Returns the term numbers of a Collection's members, in order, as an array.
+        """
+        return self._members.get(str(collection_uri), array("I"))
+
+    def collections(self):
+        return list(self._members.keys())
+
+    def count(self, collection_uri: str):
+        return len(self._members.get(str(collection_uri), ()))
+
+    def page(self, collection_uri: str, start: int, end: int):
+        return self.members(collection_uri)[start:end]
+
+    def position(self, collection_uri: str, identifier):
+        """
+        Returns the position of the member with the given identifier in its Collection's members, or None.
+
+        :param identifier: the identifier, as a string or a term
+        """
+        identifiers, positions = self._identifiers.get(str(collection_uri), ((), ()))
+        n = self._graph.number(identifier if not isinstance(identifier, str) else Literal(identifier))
+        if n is None:
+            return None
+        i = bisect_left(identifiers, n)
+        if i < len(identifiers) and identifiers[i] == n:
+            return positions[i]
+        return None
+
+    def member(self, collection_uri: str, identifier):
+        """
+        Returns the URI of the member with the given identifier, or None.
+        """
+        position = self.position(collection_uri, identifier)
+        if position is None:
+            return None
+        return self._graph.term(self._members[str(collection_uri)][position])
+
+    def position_of_uri(self, collection_uri: str, uri: str):
+        """
+        Returns the position at which a member with the given URI is, or would be, in its Collection's members.
+        """
+        members = self.members(collection_uri)
+        uri = URIRef(uri)
+        lo, hi = 0, len(members)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if members[mid] < uri:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
@@ -0,0 +1,118 @@
+from array import array
+from math import ceil, sqrt
+from api.index.membership import MembershipIndex, TermSequence
+from api.snapshot import NumberedGraph
+
+
+class PackedRTree:
+    """
+    A static R-tree of boxes, packed with the Sort-Tile-Recursive algorithm and held in flat arrays.
+
+    Level 0 holds the boxes themselves, in the packed order, and each level above holds the bounding boxes of
+    consecutive runs of node_size boxes in the level below, up to a root level of at most node_size boxes.
+    """
+    def __init__(self, boxes: list, node_size: int = 16):
+        """
+        :param boxes: a list of (min x, min y, max x, max y)
+        """
+        self.node_size = node_size
+
+        # sort into vertical slices by the boxes' centre x and each slice by centre y, so that each run of node_size
+        # boxes is spatially compact
+        order = sorted(range(len(boxes)), key=lambda i: boxes[i][0] + boxes[i][2])
+        per_slice = node_size * max(ceil(sqrt(ceil(len(boxes) / node_size))), 1)
+        packed = []
+        for start in range(0, len(order), per_slice):
+            packed.extend(sorted(order[start:start + per_slice], key=lambda i: boxes[i][1] + boxes[i][3]))
+
+        self.ids = array("I", packed)
+        self.levels = [array("d", (v for i in packed for v in boxes[i]))]
+        while len(self.levels[-1]) > 4 * node_size:
+            below = self.levels[-1]
+            level = array("d")
+            for start in range(0, len(below), 4 * node_size):
+                run = below[start:start + 4 * node_size]
+                level.extend((min(run[0::4]), min(run[1::4]), max(run[2::4]), max(run[3::4])))
+            self.levels.append(level)
+
+    def search(self, minx: float, miny: float, maxx: float, maxy: float, within: bool = False):
+        """
+        Returns the ids of the boxes that intersect the given box or, if within is set, that are within it.
+        """
+        results = []
+        candidates = range(len(self.levels[-1]) // 4)
+        for depth in range(len(self.levels) - 1, -1, -1):
+            b = self.levels[depth]
+            # the boxes under a node at this depth are a run of this many in level 0
+            span = self.node_size ** depth
+            partial = []
+            for i in candidates:
+                x0, y0, x1, y1 = b[4 * i:4 * i + 4]
+                if x0 > maxx or x1 < minx or y0 > maxy or y1 < miny:
+                    continue
+                if x0 >= minx and x1 <= maxx and y0 >= miny and y1 <= maxy:
+                    # all the boxes under a node within the box are within it too
+                    results.extend(self.ids[i * span:(i + 1) * span])
+                elif depth > 0:
+                    partial.append(i)
+                elif not within:
+                    results.append(self.ids[i])
+            if depth > 0:
+                n = len(self.levels[depth - 1]) // 4
+                candidates = [
+                    child for i in partial for child in range(i * self.node_size, min((i + 1) * self.node_size, n))
+                ]
+        return results
+
+
+class SpatialIndex:
+    """
+    The extents of the Stratigraphic Units, from the envelopes harvested into the unit store, in a packed R-tree for
+    finding the members of a Collection within a box.
+
+    A Feature is within a box exactly when its envelope is, so the index's answers need no further refinement
+    against the geometries.
+    """
+    def __init__(self, graph: NumberedGraph, membership: MembershipIndex, envelopes):
+        """
+        :param envelopes: an iterable of (stratno, min long, min lat, max long, max lat)
+        """
+        self._graph = graph
+        self._membership = membership
+        boxes = {str(stratno): (minx, miny, maxx, maxy) for stratno, minx, miny, maxx, maxy in envelopes}
+
+        # a tree for each Collection, of the positions of its members that have envelopes
+        self._trees = {}
+        for collection_uri in membership.collections() if len(boxes) > 0 else []:
+            members = membership.member_numbers(collection_uri)
+            positions = []
+            member_boxes = []
+            for p, n in enumerate(members):
+                box = boxes.get(str(graph.term(n)).split("/SU")[-1])
+                if box is not None:
+                    positions.append(p)
+                    member_boxes.append(box)
+            if len(positions) > 0:
+                tree = PackedRTree(member_boxes)
+                tree.ids = array("I", (positions[i] for i in tree.ids))
+                self._trees[collection_uri] = tree
+        self._count = len(boxes)
+
+    def __len__(self):
+        return self._count
+
+    def within(self, collection_uri: str, minx: float, miny: float, maxx: float, maxy: float):
+        """
+        Returns the URIs of the members of a Collection within a box, in URI order. A box with minx greater than maxx
+        crosses the antimeridian.
+        """
+        tree = self._trees.get(str(collection_uri))
+        if tree is None:
+            return TermSequence(self._graph, array("I"))
+        if minx > maxx:
+            positions = set(tree.search(minx, miny, 180.0, maxy, within=True))
+            positions.update(tree.search(-180.0, miny, maxx, maxy, within=True))
+        else:
+            positions = tree.search(minx, miny, maxx, maxy, within=True)
+        members = self._membership.member_numbers(collection_uri)
+        return TermSequence(self._graph, array("I", (members[p] for p in sorted(positions))))
@@ -0,0 +1,118 @@
+import re
+from array import array
+from bisect import bisect_left
+from rdflib.namespace import DCTERMS
+from api.index.membership import MembershipIndex, TermSequence
+from api.snapshot import NumberedGraph
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenise(text: str):
+    return TOKEN.findall(text.lower())
+
+
+class _CollectionTitles:
+    # the inverted index of one Collection's members' titles: its distinct title tokens, sorted, each with the
+    # positions of the members whose titles contain it, plus each member's first title token and number of tokens
+    def __init__(self, tokens: list, postings: list, first_tokens: array, lengths: array):
+        self.tokens = tokens
+        self.postings = postings
+        self.first_tokens = first_tokens
+        self.lengths = lengths
+
+    def prefixed(self, prefix: str):
+        # the indexes of the tokens starting with prefix
+        i = bisect_left(self.tokens, prefix)
+        while i < len(self.tokens) and self.tokens[i].startswith(prefix):
+            yield i
+            i += 1
+
+
+class TitleIndex:
+    """
+    An inverted index of the words in the titles of each Collection's members, for searching them by title.
+
+    Each word in a search matches the title words it is, or is the start of, so "lady lor" finds "Lady Loretta
+    Formation". Members matching all the search words are ranked by, in order: the number of search words matching
+    whole title words rather than the start of them, whether the title starts with the first search word, the number
+    of words in the title (fewer first) and then their URIs.
+    """
+    def __init__(self, graph: NumberedGraph, membership: MembershipIndex):
+        self._graph = graph
+        self._membership = membership
+        title = graph.number(DCTERMS.title)
+
+        titles = {}
+        if title is not None:
+            for s, p, o in graph.triple_numbers(p=title):
+                titles.setdefault(s, str(graph.term(o)))
+
+        self._collections = {}
+        for collection_uri in membership.collections():
+            postings = {}
+            first_tokens = []
+            lengths = []
+            for position, n in enumerate(membership.member_numbers(collection_uri)):
+                tokens = tokenise(titles.get(n, ""))
+                first_tokens.append(tokens[0] if len(tokens) > 0 else "")
+                lengths.append(min(len(tokens), 255))
+                for token in set(tokens):
+                    postings.setdefault(token, []).append(position)
+            tokens = sorted(postings.keys())
+            numbers = {token: i for i, token in enumerate(tokens)}
+            self._collections[collection_uri] = _CollectionTitles(
+                tokens,
+                [array("I", postings[token]) for token in tokens],
+                # held as the numbers of the tokens, with one past the last for a title with none
+                array("I", (numbers.get(token, len(tokens)) for token in first_tokens)),
+                array("B", lengths),
+            )
+
+    def search(self, collection_uri: str, q: str):
+        """
+        Returns the URIs of the members of a Collection whose titles match the search q, ranked best first.
+        """
+        members = self._membership.member_numbers(collection_uri)
+        return TermSequence(self._graph, array("I", (members[p] for p in self.positions(collection_uri, q))))
+
+    def positions(self, collection_uri: str, q: str):
+        """
+        Returns the positions, in their Collection's members, of the members whose titles match the search q, ranked
+        best first.
+        """
+        index = self._collections.get(str(collection_uri))
+        words = tokenise(q)
+        if index is None or len(words) == 0:
+            return []
+
+        # for each member matching every word so far, the number of words it matched whole
+        scores = None
+        first_word_tokens = set()
+        for j, word in enumerate(words):
+            matches = {}
+            for i in index.prefixed(word):
+                whole = 1 if index.tokens[i] == word else 0
+                if j == 0:
+                    first_word_tokens.add(i)
+                for position in index.postings[i]:
+                    if position not in matches or matches[position] < whole:
+                        matches[position] = whole
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    position: scores[position] + whole for position, whole in matches.items() if position in scores
+                }
+            if len(scores) == 0:
+                return []
+
+        return sorted(
+            scores.keys(),
+            key=lambda position: (
+                -scores[position],
+                index.first_tokens[position] not in first_word_tokens,
+                index.lengths[position],
+                position
+            )
+        )
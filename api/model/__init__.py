@@ -5,3 +5,4 @@ from api.model.collections import CollectionsRenderer
 from api.model.collection import Collection, CollectionRenderer
 from api.model.features import FeaturesRenderer
 from api.model.feature import StratUnit, StratUnitRenderer
+from api.model.hierarchy import UnitHierarchy
@@ -1,6 +1,7 @@
 from typing import List
 from api.model.profiles import *
 from api.config import *
+from api.graph_store import get_store
 from api.model.link import *
 import json
 from flask import Response, render_template
@@ -39,9 +40,7 @@ class Collection(object):
         if other_links is not None:
             self.links.extend(other_links)
 
-        self.feature_count = 0
-        for s in g.subjects(predicate=DCTERMS.isPartOf, object=URIRef(self.uri)):
-            self.feature_count += 1
+        self.feature_count = get_store().membership.count(self.uri)
 
     def to_dict(self):
         self.links = [x.__dict__ for x in self.links]
@@ -55,8 +54,9 @@ class Collection(object):
         delattr(self, "feature_count")  # this attribute is for internal use only and can be misleading if communicated
         return self.__dict__
 
-    def to_geosp_graph(self):
-        g = Graph()
+    def to_geosp_graph(self, g: Graph = None):
+        if g is None:
+            g = Graph()
         g.bind("geo", GEO)
         g.bind("geox", GEOX)
         g.bind("dcterms", DCTERMS)
@@ -91,6 +91,9 @@ class Collection(object):
 
 
 class CollectionRenderer(Renderer):
+    PROFILES = {"oai": profile_openapi}
+    DEFAULT_PROFILE_TOKEN = "oai"
+
     def __init__(self, request, collection_uri: str, other_links: List[Link] = None):
         self.collection = Collection(collection_uri)
         self.links = [
@@ -113,8 +116,8 @@ class CollectionRenderer(Renderer):
         super().__init__(
             request,
             LANDING_PAGE_URL + "/collection/" + self.collection.identifier,
-            profiles={"oai": profile_openapi},
-            default_profile_token="oai"
+            profiles=dict(self.PROFILES),
+            default_profile_token=self.DEFAULT_PROFILE_TOKEN
         )
 
         self.ALLOWED_PARAMS = ["_profile", "_mediatype"]
@@ -31,6 +31,9 @@ class Collections:
 
 
 class CollectionsRenderer(ContainerRenderer):
+    PROFILES = {"oai": profile_openapi}
+    DEFAULT_PROFILE_TOKEN = "oai"
+
     def __init__(self, request, other_links: List[Link] = None):
         self.links = [
             Link(
@@ -82,8 +85,8 @@ class CollectionsRenderer(ContainerRenderer):
             None,
             [(LANDING_PAGE_URL + "/collections/" + x[1], x[2]) for x in requested_collections],
             self.collections_count,
-            profiles={"oai": profile_openapi},
-            default_profile_token="oai"
+            profiles=dict(self.PROFILES),
+            default_profile_token=self.DEFAULT_PROFILE_TOKEN
         )
 
         self.ALLOWED_PARAMS = ["_profile", "_view", "_mediatype", "_format", "page", "per_page", "limit", "bbox"]
@@ -6,6 +6,9 @@ import json
 
 
 class ConformanceRenderer(Renderer):
+    PROFILES = {"oai": profile_openapi}
+    DEFAULT_PROFILE_TOKEN = "oai"
+
     def __init__(
             self,
             request,
@@ -13,7 +16,7 @@ class ConformanceRenderer(Renderer):
 
         self.conformance_classes = conformance_classes
 
-        super().__init__(request, LANDING_PAGE_URL + "/conformance", {"oai": profile_openapi}, "oai")
+        super().__init__(request, LANDING_PAGE_URL + "/conformance", dict(self.PROFILES), self.DEFAULT_PROFILE_TOKEN)
 
         self.ALLOWED_PARAMS = ["_profile", "_view", "_mediatype", "_format"]
 
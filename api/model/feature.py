@@ -1,29 +1,46 @@
 from typing import List
 from api.model.profiles import *
 from api.config import *
+from api.graph_store import get_store
 from api.model.link import *
 from flask import Response, render_template
 from rdflib import URIRef, Literal
 from rdflib.namespace import DCTERMS, SKOS, XSD
 from api.wfs_utils import get_strat_unit
+from api.rdf_stream import stream_rdf, WRITERS
 
 
 class StratUnit:
+    # the properties that come from the Strat Unit's WFS record. They are loaded from the WFS, or the local stores of
+    # its records, the first time one of them is read, so a StratUnit only used for its URI, ID & title costs nothing
+    RECORD_FIELDS = (
+        "description",
+        "observationMethod",
+        "descriptionPurpose",
+        "geologicUnitType",
+        "stratigraphicRank",
+        "eventProcess",
+        "youngerBound",
+        "olderBound",
+        "youngerNamedAge",
+        "olderNamedAge",
+        "hierarchyLinks",
+    )
+
     def __init__(
             self,
             uri: str,
             other_links: List[Link] = None,
+            title: str = None,
     ):
         # make URI from ID
         self.uri = uri
         self.identifier = uri.split("/SU")[1]
-
-        # get Strat Unit info from WFS
-        props = get_strat_unit("GA.GeologicProvince." + self.identifier)
-
-        # Strat Unit properties
-        for k, v in props.items():
-            setattr(self, k, v)
+        # the title is in the graph's index so needn't come from the WFS
+        if title is None:
+            title = get_store().index_graph.value(subject=URIRef(uri), predicate=DCTERMS.title)
+        self.title = str(title) if title is not None else None
+        self._loaded = False
 
         # Feature other properties
         self.links = [
@@ -37,8 +54,35 @@ class StratUnit:
 
         self.isPartOf = "http://example.com/dataset/auststrat/sus"  # TODO: remove magic var
 
-    def to_geosp_graph(self):
-        g = Graph()
+    def __getattr__(self, name):
+        # only called for attributes not yet set
+        if name in StratUnit.RECORD_FIELDS:
+            self.load()
+            return self.__dict__.get(name)
+        raise AttributeError("'StratUnit' object has no attribute '{}'".format(name))
+
+    def load(self):
+        """
+        Loads the properties from the Strat Unit's WFS record, if they haven't been already.
+        """
+        if self._loaded:
+            return
+        props = get_strat_unit("GA.GeologicProvince." + self.identifier)
+
+        # Strat Unit properties
+        for k, v in props.items():
+            if k == "uri" or (k == "title" and self.title is not None):
+                continue
+            setattr(self, k, v)
+        self._loaded = True
+
+    def to_geosp_graph(self, g: Graph = None):
+        """
+        Adds this Feature's GeoSPARQL triples to g, a Graph or anything else with Graph's add() and bind(), or to a new
+        Graph if g isn't given, and returns g.
+        """
+        if g is None:
+            g = Graph()
         g.bind("geo", GEO)
         g.bind("geox", GEOX)
 
@@ -59,8 +103,8 @@ class StratUnit:
 
         return g
 
-    def to_su_graph(self):
-        g = self.to_geosp_graph()
+    def to_su_graph(self, g: Graph = None):
+        g = self.to_geosp_graph(g)
         g.bind("dcterms", DCTERMS)
         SU = Namespace("https://linked.data.gov.au/def/su/")
         g.bind("su", SU)
@@ -204,8 +248,9 @@ class StratUnit:
 
         return g
 
-    def to_loop3d_graph(self):
-        g = Graph()
+    def to_loop3d_graph(self, g: Graph = None):
+        if g is None:
+            g = Graph()
         GSOC = Namespace("http://loop3d.org/GSO/ontology/2020/1/common/")
         g.bind("gsoc", GSOC)
         GSOG = Namespace("http://loop3d.org/GSO/ontology/2020/1/geologicfeature/")
@@ -461,35 +506,40 @@ class StratUnit:
 
 
 class StratUnitRenderer(Renderer):
+    PROFILES = {
+        "geosp": profile_geosparql,
+        "loop3d": profile_loop3d,
+        "su": profile_su,
+        "gsmlb": profile_gsmlb
+    }
+    DEFAULT_PROFILE_TOKEN = "su"
+    # whether each profile's representations are made from the Feature's WFS record, which is loaded whole for those
+    # that are, and not at all for those that aren't
+    PROFILE_USES_RECORD = {
+        "geosp": False,
+        "loop3d": True,
+        "su": True,
+        "gsmlb": True,
+    }
+
     def __init__(self, request, collection_id: str, item_id: str, other_links: List[Link] = None):
         self.feature_id = item_id
         super().__init__(
             request,
             LANDING_PAGE_URL + "/collections/" + collection_id + "/item/" + item_id,
-            profiles={
-                "geosp": profile_geosparql,
-                "loop3d": profile_loop3d,
-                "su": profile_su,
-                "gsmlb": profile_gsmlb
-            },
-            default_profile_token="su"
+            profiles=dict(self.PROFILES),
+            default_profile_token=self.DEFAULT_PROFILE_TOKEN
         )
 
         if self.profile != "gsmlb":
-            g = get_graph()
-            # get the URI for the Collection using the ID
-            collection_uri = None
-            for s in g.subjects(predicate=DCTERMS.identifier, object=Literal(collection_id)):
-                collection_uri = s
-
-            if collection_uri is None:
-                raise Exception("You have entered an unknown Collection ID")
-
-            # get URIs for things with this ID  - IDs may not be unique across Collections
-            for s in g.subjects(predicate=DCTERMS.identifier, object=Literal(item_id)):
-                # if this Feature is in this Collection, return it
-                if (s, DCTERMS.isPartOf, collection_uri) in g:
-                    self.feature = StratUnit(str(s))
+            # get the URI for the Feature using the IDs - IDs may not be unique across Collections
+            item = get_store().identifiers.item(collection_id, item_id)
+            if item is None:
+                raise Exception("You have entered an unknown Collection or Item ID")
+
+            self.feature = StratUnit(item[0], title=item[1])
+            if self.PROFILE_USES_RECORD.get(self.profile, False):
+                self.feature.load()
             self.links = []
             if other_links is not None:
                 self.links.extend(other_links)
@@ -506,13 +556,15 @@ class StratUnitRenderer(Renderer):
                 mimetype="application/xml",
                 headers=self.headers
             )
+        elif self.profile == "geosp":
+            return self._render_rdf(self.feature.to_geosp_graph)
         elif self.profile == "su":
             if self.mediatype == "text/html":
                 return self._render_su_html()
             else:
-                return self._render_rdf(self.feature.to_su_graph())
+                return self._render_rdf(self.feature.to_su_graph)
         elif self.profile == "loop3d":
-            return self._render_rdf(self.feature.to_loop3d_graph())
+            return self._render_rdf(self.feature.to_loop3d_graph)
 
     def _render_su_html(self):
         _template_context = {
@@ -525,7 +577,15 @@ class StratUnitRenderer(Renderer):
             headers=self.headers,
         )
 
-    def _render_rdf(self, g):
+    def _render_rdf(self, to_graph):
+        """
+        :param to_graph: the Feature's to_*_graph() method for the profile
+        """
+        # N-Triples & Turtle are streamed, other formats are serialised from a graph
+        if self.mediatype in WRITERS.keys():
+            return Response(stream_rdf(self.mediatype, [to_graph]), mimetype=self.mediatype, headers=self.headers)
+
+        g = to_graph()
         # serialise in the appropriate RDF format
         if self.mediatype in ["application/rdf+json", "application/json"]:
             return Response(g.serialize(format="json-ld"), mimetype=self.mediatype, headers=self.headers)
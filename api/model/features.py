@@ -2,10 +2,16 @@ from pyldapi import ContainerRenderer
 from typing import List
 from api.model.profiles import *
 from api.config import *
+from api.graph_store import get_store
 from api.model.link import *
 from api.model.collection import Collection
 from api.model.feature import StratUnit
+from api.rdf_stream import stream_rdf, WRITERS
+import base64
+import binascii
 import json
+from bisect import bisect_left
+from urllib.parse import urlencode
 from flask import Response, render_template
 from flask_paginate import Pagination
 from rdflib import Graph, Literal, URIRef
@@ -13,6 +19,34 @@ from rdflib.namespace import DCTERMS
 import re
 
 
+def encode_cursor(direction: str, uri: str, position: int = None):
+    """
+    Returns an opaque cursor for the page of Features "next" after, or "prev" before, the Feature with the given URI.
+
+    :param position: the Feature's position in the list being paged, for lists not sorted by URI
+    """
+    if position is not None:
+        direction = "{}@{}".format(direction, position)
+    return base64.urlsafe_b64encode("{}:{}".format(direction, uri).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    Returns the (direction, URI, position or None) of a cursor.
+
+    :raises ValueError: if the cursor is not one made by encode_cursor()
+    """
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("invalid cursor")
+    direction, _, uri = decoded.partition(":")
+    direction, _, position = direction.partition("@")
+    if direction not in ["next", "prev"] or uri == "" or (position != "" and not position.isdigit()):
+        raise ValueError("invalid cursor")
+    return direction, uri, int(position) if position != "" else None
+
+
 class FeaturesList:
     def __init__(self, request, collection_id):
         self.request = request
@@ -26,39 +60,54 @@ class FeaturesList:
         )
         # limit
         self.limit = int(request.values.get("limit")) if request.values.get("limit") is not None else None
+        # a cursor, if given, pages from a Feature rather than by page number
+        self.cursor = decode_cursor(request.values.get("cursor")) if request.values.get("cursor") is not None else None
 
-        # if limit is set, ignore page & per_page
-        if self.limit is not None:
-            self.start = 0
-            self.end = self.limit
-        else:
-            # generate list for requested page and per_page
-            self.start = (self.page - 1) * self.per_page
-            self.end = self.start + self.per_page
-
-        g = get_graph()
+        # the Features' identifiers, titles and descriptions are in the index graph, whatever the backend
+        g = get_store().index_graph
+        # set by get_feature_uris_by_bbox()
+        self.bbox_type = None
 
         # get Collection
-        for s in g.subjects(predicate=DCTERMS.identifier, object=Literal(collection_id)):
-            self.collection = Collection(str(s))
+        collection_uri = get_store().identifiers.collection(collection_id)
+        if collection_uri is not None:
+            self.collection = Collection(collection_uri)
 
         # get list of Features within this Collection
-        features_uris = []
-        # filter if we have a filtering param
+        # filter if we have a filtering param: each filter's matches are in URI order
+        matches = []
         if request.values.get("bbox") is not None:
             # work out what sort of BBOX filter it is and filter by that type
-            features_uris = self.get_feature_uris_by_bbox()
+            matches.append(self.get_feature_uris_by_bbox())
+        if request.values.get("age") is not None:
+            matches.append(self.get_feature_uris_by_age())
+        if request.values.get("q") is not None:
+            # ranked matches of the title search
+            features_uris = get_store().titles.search(self.collection.uri, request.values.get("q"))
+        elif len(matches) > 0:
+            features_uris = matches.pop(0)
         else:
-            # all features in list
-            for s in g.subjects(predicate=DCTERMS.isPartOf, object=URIRef(self.collection.uri)):
-                features_uris.append(s)
-
-        features_uris.sort()
+            # all features in list, already sorted
+            features_uris = get_store().membership.members(self.collection.uri)
+        # only those matching every filter
+        for m in matches:
+            features_uris = features_uris.intersection(m)
 
         self.feature_count = len(features_uris)
+        # only the search's results aren't sorted by URI, so their cursors also carry the Feature's place in them
+        by_uri = request.values.get("q") is None
+        self.start, self.end = self._page_range(features_uris, by_uri)
         # truncate the list of Features to this page
         page = features_uris[self.start:self.end]
 
+        # cursors for the pages either side of this one
+        self.next_cursor = None
+        self.prev_cursor = None
+        if len(page) > 0 and self.start + len(page) < self.feature_count:
+            self.next_cursor = encode_cursor("next", page[-1], None if by_uri else self.start + len(page) - 1)
+        if len(page) > 0 and self.start > 0:
+            self.prev_cursor = encode_cursor("prev", page[0], None if by_uri else self.start)
+
         # Features - only this page's
         self.features = []
         for s in page:
@@ -74,13 +123,45 @@ class FeaturesList:
                 (str(s), identifier, title, description)
             )
 
-        self.bbox_type = None
+    def _page_range(self, features_uris, by_uri: bool):
+        # the start and end of this page in features_uris
+        size = self.limit if self.limit is not None else self.per_page
+        if self.cursor is None:
+            # if limit is set, ignore page & per_page
+            if self.limit is not None:
+                return 0, self.limit
+            # generate list for requested page and per_page
+            start = (self.page - 1) * self.per_page
+            return start, start + self.per_page
+
+        # the cursor's Feature, found by binary search of a list sorted by URI and otherwise at the place in the list
+        # the cursor gives, or if it isn't there, as the results have changed since, by looking for it
+        direction, uri, position = self.cursor
+        uri = URIRef(uri)
+        if by_uri:
+            position = bisect_left(features_uris, uri)
+            found = position < len(features_uris) and features_uris[position] == uri
+        elif position is not None and position < len(features_uris) and features_uris[position] == uri:
+            found = True
+        else:
+            try:
+                position = features_uris.index(uri)
+                found = True
+            except ValueError:
+                position = 0
+                found = False
+
+        if direction == "next":
+            start = position + 1 if found else position
+            return start, start + size
+        else:
+            return max(position - size, 0), position
 
     def get_feature_uris_by_bbox(self):
         allowed_bbox_formats = {
-            "coords": r"([0-9\.\-]+),([0-9\.\-]+),([0-9\.\-]+),([0-9\.\-]+)",  # Lat Longs, e.g. 160.6,-55.95,-170,-25.89
+            "coords": r"([0-9\.\-]+),([0-9\.\-]+),([0-9\.\-]+),([0-9\.\-]+)$",  # Lat Longs, e.g. 160.6,-55.95,-170,-25.89
             "cell_id": r"([A-Z][0-9]{0,15})$",  # single DGGS Cell ID, e.g. R1234
-            "cell_ids": r"([A-Z][0-9]{0,15}),([A-Z][0-9]{0,15})",  # two DGGS cells, e.g. R123,R456
+            "cell_ids": r"([A-Z][0-9]{0,15}),([A-Z][0-9]{0,15})$",  # two DGGS cells, e.g. R123,R456
         }
         for k, v in allowed_bbox_formats.items():
             if re.match(v, self.request.values.get("bbox")):
@@ -90,127 +171,33 @@ class FeaturesList:
             return None
         elif self.bbox_type == "coords":
             return self._get_filtered_features_list_bbox_wgs84()
-        elif self.bbox_type == "cell_id":
+        elif self.bbox_type in ["cell_id", "cell_ids"]:
             return self._get_filtered_features_list_bbox_dggs()
-        elif self.bbox_type == "cell_ids":
-            pass
 
     def _get_filtered_features_list_bbox_wgs84(self):
-        parts = self.request.values.get("bbox").split(",")
-
-        demo = """
-            149.041411262992398 -35.292795884738389, 
-            149.041411262992398 -35.141378579917053, 
-            149.314863045854082 -35.141378579917053,
-            149.314863045854082 -35.292795884738389,
-            149.041411262992398 -35.292795884738389
-            """
-
-        q = """
-            PREFIX dcterms: <http://purl.org/dc/terms/>
-            PREFIX geo: <http://www.opengis.net/ont/geosparql#>
-            PREFIX geof: <http://www.opengis.net/def/function/geosparql/>
-            PREFIX ogcapi: <https://data.surroundaustralia.com/def/ogcapi/>
-
-            SELECT ?f
-            WHERE {{
-                ?f a ogcapi:Feature ;
-                   dcterms:isPartOf <{collection_uri}> ;            
-                   geo:hasGeometry/geo:asWKT ?wkt .
-    
-                FILTER (geof:sfWithin(?wkt, 
-                    '''
-                    <http://www.opengis.net/def/crs/OGC/1.3/CRS84>
-                    POLYGON ((
-                        {tl_lon} {tl_lat}, 
-                        {tl_lon} {br_lat}, 
-                        {br_lon} {br_lat},
-                        {br_lon} {tl_lat},
-                        {tl_lon} {tl_lat}
-                    ))
-                    '''^^geo:wktLiteral))
-            }}
-            ORDER BY ?f
-            """.format(**{
-            "collection_uri": self.collection.uri,
-            "tl_lon": parts[0],
-            "tl_lat": parts[1],
-            "br_lon": parts[2],
-            "br_lat": parts[3]
-        })
-        features_uris = []
-        for r in get_graph().query(q):
-            features_uris.append(r["f"])
-
-        return features_uris
+        # west, south, east, north: a box whose west is east of its east crosses the antimeridian
+        west, south, east, north = [float(x) for x in self.request.values.get("bbox").split(",")]
+
+        # the Features whose extents are within the box, from the spatial index
+        return get_store().spatial.within(self.collection.uri, west, min(south, north), east, max(south, north))
 
     def _get_filtered_features_list_bbox_dggs(self):
-        # # geo:sfIntersects - any Cell of the Feature is within the BBox
-        # q = """
-        #     PREFIX dcterms: <http://purl.org/dc/terms/>
-        #     PREFIX geo: <http://www.opengis.net/ont/geosparql#>
-        #     PREFIX geox: <https://linked.data.gov.au/def/geox#>
-        #     PREFIX ogcapi: <https://data.surroundaustralia.com/def/ogcapi/>
-        #
-        #     SELECT ?f
-        #     WHERE {{
-        #         ?f a ogcapi:Feature ;
-        #            dcterms:isPartOf <https://linked.data.gov.au/dataset/asgs2016/statisticalarealevel1/> .
-        #         ?f geo:hasGeometry/geox:asDGGS ?dggs .
-        #
-        #         BIND (STRAFTER(STR(?dggs), "> ") AS ?coords)
-        #
-        #         FILTER CONTAINS(?coords, "{}")
-        #     }}
-        #     """.format(self.request.values.get("bbox"))
-        # # TODO: update as RDFlib updates
-        # # for r in get_graph().query(q):
-        # #     features_uris.append((r["f"], r["prefLabel"]))
-        # from SPARQLWrapper import SPARQLWrapper, JSON
-        # sparql = SPARQLWrapper(SPARQL_ENDPOINT)
-        # sparql.setQuery(q)
-        # sparql.setReturnFormat(JSON)
-        # ret = sparql.queryAndConvert()["results"]["bindings"]
-        # return [URIRef(r["f"]["value"]) for r in ret]
-
-        # geo:sfWithin - every Cell of the Feature is within the BBox
-        q = """
-            PREFIX dcterms: <http://purl.org/dc/terms/>
-            PREFIX geo: <http://www.opengis.net/ont/geosparql#>
-            PREFIX geox: <https://linked.data.gov.au/def/geox#>
-            PREFIX ogcapi: <https://data.surroundaustralia.com/def/ogcapi/>            
-            
-            SELECT ?f ?coords
-            WHERE {{
-                ?f a ogcapi:Feature ;
-                   dcterms:isPartOf <{}> .
-                ?f geo:hasGeometry/geox:asDGGS ?dggs .
-    
-                BIND (STRBEFORE(STRAFTER(STR(?dggs), "POLYGON ("), ")")AS ?coords)
-            }}
-            """.format(self.collection.uri)
-        from SPARQLWrapper import SPARQLWrapper, JSON
-        sparql = SPARQLWrapper(SPARQL_ENDPOINT)
-        sparql.setQuery(q)
-        sparql.setReturnFormat(JSON)
-        ret = sparql.queryAndConvert()["results"]["bindings"]
-        feature_ids = []
-        for r in ret:
-            within = True
-            for cell in r["coords"]["value"].split(" "):
-                if not str(cell).startswith(self.request.values.get("bbox")):
-                    within = False
-                    break
-            if within:
-                feature_ids.append(URIRef(r["f"]["value"]))
-
-        return feature_ids
+        # geo:sfWithin - every Cell of the Feature is within the BBox Cell, or either of the two BBox Cells
+        return get_store().dggs.within(self.collection.uri, *self.request.values.get("bbox").split(","))
+
+    def get_feature_uris_by_age(self):
+        # the Features whose ages overlap the range, from the age index
+        younger, older = get_store().ages.parse(self.request.values.get("age"))
+        return get_store().ages.overlapping(self.collection.uri, younger, older)
 
     def _get_filtered_features_list_bbox_paging(self):
         pass
 
 
 class FeaturesRenderer(ContainerRenderer):
+    PROFILES = {"oai": profile_openapi, "geosp": profile_geosparql}
+    DEFAULT_PROFILE_TOKEN = "oai"
+
     def __init__(self, request, collection_id, other_links: List[Link] = None):
         self.request = request
         self.valid = self._valid_parameters()
@@ -233,6 +220,8 @@ class FeaturesRenderer(ContainerRenderer):
                 self.links.extend(other_links)
 
             self.feature_list = FeaturesList(request, collection_id)
+            self.paging_links = self._paging_links(collection_id)
+            self.links.extend(self.paging_links)
 
             super().__init__(
                 request,
@@ -242,18 +231,66 @@ class FeaturesRenderer(ContainerRenderer):
                 None,
                 None,
                 [(LANDING_PAGE_URL + "/collections/" + self.feature_list.collection.identifier + "/items/" + x[1], x[2]) for x in self.feature_list.features],
-                self.feature_list.collection.feature_count,
-                profiles={"oai": profile_openapi, "geosp": profile_geosparql},
-                default_profile_token="oai"
+                self.feature_list.feature_count,
+                profiles=dict(self.PROFILES),
+                default_profile_token=self.DEFAULT_PROFILE_TOKEN,
+                page_size_max=MAX_PAGE_SIZE
             )
+            if self.vf_error is None and self.paging_error is None:
+                # the cursor next & prev links replace the page number ones that ContainerRenderer makes
+                self.headers["Link"] = ", ".join(
+                    [self._make_header_link_tokens(), self._make_header_link_list_profiles()] +
+                    ['<{}>; rel="{}"'.format(x.href, x.rel) for x in self._header_paging_links()]
+                )
+
+    def _header_paging_links(self):
+        # the paging links of the Link header: those of ContainerRenderer's that are kept and the cursor ones
+        def page_url(page):
+            # the first and last pages by number, keeping all the other query parameters, as the cursor links do
+            args = [
+                (k, v) for k, v in self.request.args.items(multi=True)
+                if k not in ["page", "per_page", "limit", "cursor"]
+            ]
+            args.extend([("per_page", self.per_page), ("page", page)])
+            return "{}?{}".format(self.instance_uri, urlencode(args))
+
+        return [
+            Link("http://www.w3.org/ns/ldp#Resource", rel="type"),
+            Link("http://www.w3.org/ns/ldp#Page", rel="type"),
+            Link(page_url(self.first_page), rel="first"),
+        ] + self.paging_links + [
+            Link(page_url(self.last_page), rel="last"),
+        ]
+
+    def _paging_links(self, collection_id):
+        # the links to the next & previous pages, by cursor, keeping all the other query parameters
+        links = []
+        for rel, cursor, title in [
+            (RelType.NEXT, self.feature_list.next_cursor, "Next page"),
+            (RelType.PREV, self.feature_list.prev_cursor, "Previous page"),
+        ]:
+            if cursor is None:
+                continue
+            args = [(k, v) for k, v in self.request.args.items(multi=True) if k not in ["page", "cursor"]]
+            args.append(("cursor", cursor))
+            links.append(
+                Link(
+                    LANDING_PAGE_URL + "/collections/" + collection_id + "/items?" + urlencode(args),
+                    rel=rel.value,
+                    title=title
+                )
+            )
+        return links
 
     def _valid_parameters(self):
-        allowed_params = ["_profile", "_view", "_mediatype", "_format", "page", "per_page", "limit", "bbox"]
+        allowed_params = [
+            "_profile", "_view", "_mediatype", "_format", "page", "per_page", "limit", "cursor", "bbox", "q", "age"
+        ]
 
         allowed_bbox_formats = [
-            r"([0-9\.\-]+),([0-9\.\-]+),([0-9\.\-]+),([0-9\.\-]+)",  # Lat Longs, e.g. 160.6,-55.95,-170,-25.89
+            r"([0-9\.\-]+),([0-9\.\-]+),([0-9\.\-]+),([0-9\.\-]+)$",  # Lat Longs, e.g. 160.6,-55.95,-170,-25.89
             r"([A-Z][0-9]{0,15})$",  # single DGGS Cell ID, e.g. R1234
-            r"([A-Z][0-9]{0,15}),([A-Z][0-9]{0,15})",  # two DGGS cells, e.g. R123,R456
+            r"([A-Z][0-9]{0,15}),([A-Z][0-9]{0,15})$",  # two DGGS cells, e.g. R123,R456
         ]
 
         for p in self.request.values.keys():
@@ -262,27 +299,60 @@ class FeaturesRenderer(ContainerRenderer):
                        "The parameter {} you supplied is not allowed. " \
                        "For this API endpoint, you may only use one of '{}'".format(p, "', '".join(allowed_params)),
 
-        if self.request.values.get("limit") is not None:
+        for p in ["page", "per_page", "limit"]:
+            if self.request.values.get(p) is not None:
+                try:
+                    value = int(self.request.values.get(p))
+                except ValueError:
+                    return False, "The parameter '{}' you supplied is invalid. It must be an integer".format(p)
+                if value < 1:
+                    return False, "The parameter '{}' you supplied is invalid. It must be at least 1".format(p)
+                if p != "page" and value > MAX_PAGE_SIZE:
+                    return False, "The parameter '{}' you supplied is invalid. It must be no more than {}"\
+                        .format(p, MAX_PAGE_SIZE)
+
+        if self.request.values.get("cursor") is not None:
             try:
-                int(self.request.values.get("limit"))
+                decode_cursor(self.request.values.get("cursor"))
             except ValueError:
-                return False, "The parameter 'limit' you supplied is invalid. It must be an integer"
+                return False, "The parameter 'cursor' you supplied is invalid. Use the cursor of a next or prev link"
+
+        if self.request.values.get("age") is not None:
+            # no ages at all means no harvest has stored any yet, rather than that no unit is of the age
+            if len(get_store().ages) == 0:
+                return False, "The parameter 'age' can't be used yet: the units' ages are indexed from the harvest " \
+                              "of the units, which hasn't stored any", 503
+            try:
+                get_store().ages.parse(self.request.values.get("age"))
+            except ValueError:
+                return False, "The parameter 'age' you supplied is invalid. It must be an age in Ma, e.g. 260, the " \
+                              "name of a geological age, e.g. Permian, or a range of two of those, e.g. 250/300, " \
+                              "either of which may be '..' for no bound"
 
         if self.request.values.get("bbox") is not None:
-            for p in allowed_bbox_formats:
-                if re.match(p, self.request.values.get("bbox")):
-                    return True, None
-            return False, "The parameter 'bbox' you supplied is invalid. Must be either two pairs of long/lat values, " \
-                          "a DGGS Cell ID or a pair of DGGS Cell IDs"
+            bbox = self.request.values.get("bbox")
+            valid = False
+            if re.match(allowed_bbox_formats[0], bbox):
+                # the digits, points and minus signs must also make numbers
+                try:
+                    [float(x) for x in bbox.split(",")]
+                    valid = True
+                except ValueError:
+                    pass
+            else:
+                valid = any(re.match(p, bbox) for p in allowed_bbox_formats[1:])
+            if not valid:
+                return False, "The parameter 'bbox' you supplied is invalid. Must be either two pairs of long/lat " \
+                              "values, a DGGS Cell ID or a pair of DGGS Cell IDs"
 
         return True, None
 
     def render(self):
-        # return without rendering anything if there is an error with the parameters
+        # return without rendering anything if there is an error with the parameters, or one can't be used now
         if not self.valid[0]:
             return Response(
                 self.valid[1],
-                status=400,
+                status=self.valid[2] if len(self.valid) > 2 else 400,
                 mimetype="text/plain"
             )
 
@@ -329,38 +399,57 @@ class FeaturesRenderer(ContainerRenderer):
         )
 
     def _render_oai_html(self):
-        pagination = Pagination(page=self.page, per_page=self.per_page, total=self.feature_list.feature_count)
-
         _template_context = {
             "links": self.links,
             "collection": self.feature_list.collection,
             "members": self.members,
-            "pagination": pagination
         }
 
+        # a page from a cursor has no page number, so is linked to the pages either side of it by their cursors
+        if self.feature_list.cursor is not None:
+            _template_context["cursor_links"] = self.paging_links
+        else:
+            _template_context["pagination"] = Pagination(
+                page=self.page,
+                per_page=self.per_page,
+                total=self.feature_list.feature_count
+            )
+
         if self.request.values.get("bbox") is not None:  # it it exists at this point, it must be valid
             _template_context["bbox"] = (self.feature_list.bbox_type, self.request.values.get("bbox"))
 
+        if self.request.values.get("q") is not None:
+            _template_context["q"] = self.request.values.get("q")
+
+        if self.request.values.get("age") is not None:
+            _template_context["age"] = self.request.values.get("age")
+
         return Response(
             render_template("features.html", **_template_context),
             headers=self.headers,
         )
 
     def _render_geosp_rdf(self):
-        g = Graph()
-
-        g = g + self.feature_list.collection.to_geosp_graph()
-
-        for f in self.feature_list.features:
-            g = g + StratUnit(f[0]).to_geosp_graph()
+        # the GeoSPARQL view of a Feature is made from the graph alone, so nothing is got from the WFS for a page
+        parts = [self.feature_list.collection.to_geosp_graph] + [
+            StratUnit(f[0], title=f[2]).to_geosp_graph for f in self.feature_list.features
+        ]
+        headers = {"Link": self.headers["Link"]}
 
+        # N-Triples & Turtle are streamed a Feature at a time, other formats are serialised from one graph
+        if self.mediatype in WRITERS.keys():
+            return Response(stream_rdf(self.mediatype, parts), mimetype=self.mediatype, headers=headers)
 
+        # all triples are added to the one graph rather than adding graphs together, which copies them each time
+        g = Graph()
+        for add_triples in parts:
+            add_triples(g)
 
         # serialise in the appropriate RDF format
         if self.mediatype in ["application/rdf+json", "application/json"]:
-            return Response(g.serialize(format="json-ld"), mimetype=self.mediatype)
+            return Response(g.serialize(format="json-ld"), mimetype=self.mediatype, headers=headers)
         elif self.mediatype in Renderer.RDF_MEDIA_TYPES:
-            return Response(g.serialize(format=self.mediatype), mimetype=self.mediatype)
+            return Response(g.serialize(format=self.mediatype), mimetype=self.mediatype, headers=headers)
         else:
             return Response(
                 "The Media Type you requested cannot be serialized to",
@@ -0,0 +1,145 @@
+import json
+from urllib.parse import urlencode
+from flask import Response
+from rdflib.namespace import DCTERMS
+from api.config import *
+from api.graph_store import get_store
+from api.model.link import *
+from api.model.profiles import profile_openapi
+
+DIRECTIONS = ["ancestors", "descendants"]
+
+
+class UnitHierarchy:
+    """
+    A Feature's ancestors or descendants in the stratigraphic hierarchy, optionally to a depth, a page at a time.
+    """
+    # for conditional(), as for the Renderers: this is only ever rendered as JSON
+    PROFILES = {"oai": profile_openapi}
+    DEFAULT_PROFILE_TOKEN = "oai"
+
+    def __init__(self, request, collection_id: str, item_id: str, direction: str):
+        self.request = request
+        self.collection_id = collection_id
+        self.item_id = item_id
+        self.direction = direction
+        self.valid = self._valid_parameters()
+        if not self.valid[0]:
+            return
+
+        self.depth = int(request.values.get("depth")) if request.values.get("depth") is not None else None
+        self.page = int(request.values.get("page")) if request.values.get("page") is not None else 1
+        self.per_page = int(request.values.get("per_page")) if request.values.get("per_page") is not None else 20
+        limit = int(request.values.get("limit")) if request.values.get("limit") is not None else None
+        # if limit is set, ignore page & per_page
+        if limit is not None:
+            self.start, self.end = 0, limit
+        else:
+            self.start = (self.page - 1) * self.per_page
+            self.end = self.start + self.per_page
+
+        store = get_store()
+        collection_uri = store.identifiers.collection(collection_id)
+        self.uri, self.title = store.identifiers.item(collection_id, item_id)
+        position = store.membership.position(collection_uri, item_id)
+        uris, depths = getattr(store.hierarchy, direction)(collection_uri, position, self.depth)
+        self.count = len(uris)
+
+        # the units - only this page's
+        self.units = []
+        for uri, depth in zip(uris[self.start:self.end], depths[self.start:self.end]):
+            identifier = None
+            title = None
+            for p, o in store.index_graph.predicate_objects(subject=uri):
+                if p == DCTERMS.identifier:
+                    identifier = str(o)
+                elif p == DCTERMS.title:
+                    title = str(o)
+            self.units.append((str(uri), identifier, title, depth))
+
+    def _url(self, **args):
+        # this resource's URL with the given query parameters replacing those of the request
+        query = [(k, v) for k, v in self.request.args.items(multi=True) if k not in args.keys()]
+        query.extend((k, v) for k, v in args.items() if v is not None)
+        return "{}/collections/{}/items/{}/{}{}".format(
+            LANDING_PAGE_URL,
+            self.collection_id,
+            self.item_id,
+            self.direction,
+            "?" + urlencode(query) if len(query) > 0 else ""
+        )
+
+    def _links(self):
+        links = [
+            Link(self._url(), rel=RelType.SELF.value, type=MediaType.JSON.value, title="This Document"),
+            Link(
+                "{}/collections/{}/items/{}".format(LANDING_PAGE_URL, self.collection_id, self.item_id),
+                rel="up",
+                title=self.title
+            ),
+        ]
+        # the links to the next & previous pages, unless paging by limit
+        if self.request.values.get("limit") is None:
+            if self.end < self.count:
+                links.append(Link(self._url(page=self.page + 1), rel=RelType.NEXT.value, title="Next page"))
+            if self.page > 1:
+                links.append(Link(self._url(page=self.page - 1), rel=RelType.PREV.value, title="Previous page"))
+        return links
+
+    def _valid_parameters(self):
+        allowed_params = ["_mediatype", "depth", "page", "per_page", "limit"]
+
+        for p in self.request.values.keys():
+            if p not in allowed_params:
+                return False, \
+                       "The parameter {} you supplied is not allowed. " \
+                       "For this API endpoint, you may only use one of '{}'".format(p, "', '".join(allowed_params)),
+
+        for p in ["depth", "page", "per_page", "limit"]:
+            if self.request.values.get(p) is not None:
+                try:
+                    value = int(self.request.values.get(p))
+                except ValueError:
+                    return False, "The parameter '{}' you supplied is invalid. It must be an integer".format(p)
+                if value < 1:
+                    return False, "The parameter '{}' you supplied is invalid. It must be at least 1".format(p)
+                if p in ["per_page", "limit"] and value > MAX_PAGE_SIZE:
+                    return False, "The parameter '{}' you supplied is invalid. It must be no more than {}"\
+                        .format(p, MAX_PAGE_SIZE)
+
+        mediatype = self.request.values.get("_mediatype")
+        if mediatype is not None and mediatype != MediaType.JSON.value:
+            return False, "The Media Type you requested is not available. It must be {}".format(MediaType.JSON.value)
+
+        return True, None
+
+    def render(self):
+        # return without rendering anything if there is an error with the parameters
+        if not self.valid[0]:
+            return Response(
+                self.valid[1],
+                status=400,
+                mimetype="text/plain"
+            )
+
+        links = self._links()
+        page_json = {
+            "links": [x.__dict__ for x in links],
+            "uri": self.uri,
+            "identifier": self.item_id,
+            "title": self.title,
+            "direction": self.direction,
+            "depth": self.depth,
+            "numberMatched": self.count,
+            "numberReturned": len(self.units),
+            "units": [
+                {"uri": uri, "identifier": identifier, "title": title, "depth": depth}
+                for uri, identifier, title, depth in self.units
+            ],
+        }
+
+        return Response(
+            json.dumps(page_json),
+            mimetype=MediaType.JSON.value,
+            headers={"Link": ", ".join('<{}>; rel="{}"'.format(x.href, x.rel) for x in links)},
+        )
@@ -70,6 +70,9 @@ class LandingPage:
 
 
 class LandingPageRenderer(Renderer):
+    PROFILES = {"oai": profile_openapi, "dcat": profile_dcat}
+    DEFAULT_PROFILE_TOKEN = "oai"
+
     def __init__(
             self,
             request,
@@ -77,7 +80,7 @@ class LandingPageRenderer(Renderer):
     ):
         self.landing_page = LandingPage(other_links=other_links)
 
-        super().__init__(request, self.landing_page.uri, {"oai": profile_openapi, "dcat": profile_dcat}, "oai")
+        super().__init__(request, self.landing_page.uri, dict(self.PROFILES), self.DEFAULT_PROFILE_TOKEN)
 
         # add OGC API Link headers to pyLDAPI Link headers
         self.headers["Link"] = self.headers["Link"] + ", ".join([link.render_as_http_header() for link in self.landing_page.links])
@@ -8,6 +8,8 @@ class RelType(Enum):
     CONFORMANCE = "conformance"
     DATA = "data"
     ITEMS = "items"
+    NEXT = "next"
+    PREV = "prev"
 
 
 class MediaType(Enum):
@@ -26,6 +26,17 @@ profile_dcat = Profile(
     default_language="en",
 )
 
+# the Members profile that pyldapi's ContainerRenderer adds to every container's profiles
+profile_mem = Profile(
+    "https://w3id.org/profile/mem",
+    label="Members Profile",
+    comment="A very basic RDF data model-only profile that lists the sub-items (members) of collections (rdf:Bag)",
+    mediatypes=["text/html"] + Renderer.RDF_MEDIA_TYPES,
+    default_mediatype="text/html",
+    languages=["en"],  # default 'en' only for now
+    default_language="en",
+)
+
 profile_geosparql = Profile(
     "http://www.opengis.net/ont/geosparql",
     label="GeoSPARQL",
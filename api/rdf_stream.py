@@ -0,0 +1,144 @@
+import re
+from rdflib import URIRef, Literal
+from rdflib.namespace import RDF, RDFS, XSD, DCTERMS, SKOS
+
+# Streaming RDF serialisation: writers that take triples with Graph's add() and bind(), so the models' to_*_graph()
+# methods can write to them instead of to a Graph, and give the serialisation of what they have been given so far
+# each time they are flushed. A response can then be streamed a Feature at a time, without holding a whole Graph or
+# the whole serialisation in memory.
+
+# the namespaces bound before any others, as rdflib's Graph does
+DEFAULT_PREFIXES = {
+    "rdf": RDF,
+    "rdfs": RDFS,
+    "xsd": XSD,
+    "dcterms": DCTERMS,
+    "skos": SKOS,
+}
+
+# local names that can be written as is after a prefix: a simple, safe subset of Turtle's PN_LOCAL
+LOCAL_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_\-]*$")
+
+
+def _nt_term(term):
+    # a term as N-Triples writes it: n3() would write a literal with a line break in it across lines
+    if isinstance(term, Literal):
+        value = str(term).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+        if term.language is not None:
+            return '"{}"@{}'.format(value, term.language)
+        elif term.datatype is not None:
+            return '"{}"^^<{}>'.format(value, term.datatype)
+        return '"{}"'.format(value)
+    return term.n3()
+
+
+class NTriplesWriter:
+    mediatype = "application/n-triples"
+
+    def __init__(self):
+        self._lines = []
+
+    def bind(self, prefix, namespace, *args, **kwargs):
+        # N-Triples has no prefixes
+        pass
+
+    def add(self, triple):
+        self._lines.append("{} {} {} .\n".format(*(_nt_term(t) for t in triple)))
+
+    def flush(self):
+        """
+        Returns the serialisation of the triples added since the last flush.
+        """
+        out = "".join(self._lines)
+        self._lines = []
+        return out
+
+
+class TurtleWriter:
+    """
+    Writes Turtle with prefixed names for the namespaces bound to it.
+
+    Turtle allows @prefix anywhere between statements, so a prefix is declared when it is first used rather than
+    all at the start, and each flush writes its triples grouped by subject.
+    """
+    mediatype = "text/turtle"
+
+    def __init__(self):
+        self._prefixes = {}  # namespace: prefix
+        self._declared = set()
+        self._subjects = {}
+        self._written = False
+        for prefix, namespace in DEFAULT_PREFIXES.items():
+            self.bind(prefix, namespace)
+
+    def bind(self, prefix, namespace, *args, **kwargs):
+        namespace = str(namespace)
+        if namespace not in self._prefixes and prefix not in self._prefixes.values():
+            self._prefixes[namespace] = prefix
+
+    def add(self, triple):
+        s, p, o = triple
+        self._subjects.setdefault(s, {}).setdefault(p, []).append(o)
+
+    def _term(self, term, declare: list):
+        if isinstance(term, URIRef):
+            if term == RDF.type:
+                return "a"
+            # the longest bound namespace the URI is in
+            uri = str(term)
+            namespace = max((ns for ns in self._prefixes if uri.startswith(ns)), key=len, default=None)
+            if namespace is not None and LOCAL_NAME.match(uri[len(namespace):]):
+                if namespace not in self._declared:
+                    self._declared.add(namespace)
+                    declare.append("@prefix {}: <{}> .\n".format(self._prefixes[namespace], namespace))
+                return "{}:{}".format(self._prefixes[namespace], uri[len(namespace):])
+            return term.n3()
+        elif isinstance(term, Literal) and term.datatype is not None:
+            return '{}^^{}'.format(Literal(str(term)).n3(), self._term(term.datatype, declare))
+        return term.n3()
+
+    def flush(self):
+        """
+        Returns the serialisation of the triples added since the last flush, preceded by the declarations of any
+        prefixes they use that haven't been declared already.
+        """
+        declare = []
+        statements = []
+        for s, predicates in self._subjects.items():
+            statements.append(
+                "\n{}\n    {} .\n".format(
+                    self._term(s, declare),
+                    " ;\n    ".join(
+                        "{} {}".format(self._term(p, declare), " , ".join(self._term(o, declare) for o in objects))
+                        for p, objects in predicates.items()
+                    )
+                )
+            )
+        self._subjects = {}
+        # prefixes declared after the first chunk are set off from the statements before them
+        if len(declare) > 0 and self._written:
+            declare.insert(0, "\n")
+        self._written = self._written or len(statements) > 0
+        return "".join(declare) + "".join(statements)
+
+
+WRITERS = {
+    NTriplesWriter.mediatype: NTriplesWriter,
+    TurtleWriter.mediatype: TurtleWriter,
+}
+
+
+def stream_rdf(mediatype: str, parts):
+    """
+    Yields the serialisation, in the given Media Type, of the triples that each of parts adds to a writer, part by
+    part.
+
+    :param parts: an iterable of functions that add triples to a Graph-like writer passed to them, such as the models'
+        to_*_graph() methods
+    """
+    writer = WRITERS[mediatype]()
+    for add_triples in parts:
+        add_triples(writer)
+        chunk = writer.flush()
+        if len(chunk) > 0:
+            yield chunk.encode("utf-8")
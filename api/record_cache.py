@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from api.config import CACHE_HOURS, RECORD_CACHE_FILE, RECORD_CACHE_MAX_ENTRIES
+
+# A persistent cache of the Stratigraphic Unit records fetched from the GeoSciML WFS, keyed by stratno. It holds both
+# the dict that get_strat_unit() parses from a WFS response and the response's original XML.
+#
+# SQLite is used so that all the gunicorn workers on a host share the one cache file safely.
+#
+# Reads don't write: the times records are read at, for evicting the least recently used, are kept in memory and
+# written in batches. Nor does every put count the records: the cache is only trimmed every so many puts.
+
+# how often the read times are written, at most, in seconds and in records
+ACCESS_FLUSH_SECONDS = 30
+ACCESS_FLUSH_RECORDS = 1000
+
+_local = threading.local()
+_lock = threading.Lock()
+_accessed = {}
+_flushed = time.time()
+_puts = 0
+
+
+def _connection():
+    # one connection per thread, and a new one after a fork as SQLite connections can't cross processes
+    if getattr(_local, "pid", None) != os.getpid():
+        RECORD_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(RECORD_CACHE_FILE), timeout=30, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                stratno TEXT PRIMARY KEY,
+                record TEXT,
+                xml TEXT,
+                fetched REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS records_accessed ON records (accessed)")
+        _local.con = con
+        _local.pid = os.getpid()
+    return _local.con
+
+
+def _max_age():
+    return float(CACHE_HOURS) * 3600
+
+
+def _restore(value):
+    # JSON turns the record's tuples into lists so turn them back
+    if isinstance(value, list):
+        return tuple(_restore(x) for x in value)
+    elif isinstance(value, dict):
+        return {k: _restore(v) for k, v in value.items()}
+    return value
+
+
+def load_record(s: str):
+    """
+    Loads a record dict stored as JSON, restoring it to the form get_strat_unit() returns.
+    """
+    record = _restore(json.loads(s))
+    if record.get("hierarchyLinks") is not None:
+        record["hierarchyLinks"] = list(record["hierarchyLinks"])
+    return record
+
+
+def get_record(stratno: str):
+    """
+    Returns the cached record dict for a Stratigraphic Unit, or None if there is no current one.
+    """
+    row = _get(stratno, "record")
+    return load_record(row) if row is not None else None
+
+
+def get_xml(stratno: str):
+    """
+    Returns the cached original WFS XML for a Stratigraphic Unit, or None if there is no current one.
+    """
+    return _get(stratno, "xml")
+
+
+def _get(stratno, column):
+    con = _connection()
+    now = time.time()
+    row = con.execute(
+        "SELECT {} FROM records WHERE stratno = ? AND fetched > ?".format(column),
+        (stratno, now - _max_age())
+    ).fetchone()
+    if row is None or row[0] is None:
+        return None
+    _touch(stratno, now)
+    return row[0]
+
+
+def _touch(stratno, now):
+    # notes that a record was read, writing the read times when enough of them are waiting or they've waited long enough
+    with _lock:
+        _accessed[stratno] = now
+        due = len(_accessed) >= ACCESS_FLUSH_RECORDS or now - _flushed >= ACCESS_FLUSH_SECONDS
+    if due:
+        _flush_accessed(_connection())
+
+
+def _flush_accessed(con):
+    global _flushed
+    with _lock:
+        accessed = list(_accessed.items())
+        _accessed.clear()
+        _flushed = time.time()
+    if len(accessed) > 0:
+        with con:
+            con.execute("BEGIN")
+            con.executemany(
+                "UPDATE records SET accessed = ? WHERE stratno = ? AND accessed < ?",
+                ((t, stratno, t) for stratno, t in accessed)
+            )
+
+
+def get_fetched(stratno: str):
+    """
+    Returns the time the current cached record for a Stratigraphic Unit was fetched, or None.
+    """
+    row = _connection().execute(
+        "SELECT fetched FROM records WHERE stratno = ? AND fetched > ?",
+        (stratno, time.time() - _max_age())
+    ).fetchone()
+    return row[0] if row is not None else None
+
+
+def put(stratno: str, record: dict = None, xml: str = None):
+    global _puts
+    con = _connection()
+    now = time.time()
+    con.execute(
+        "INSERT OR REPLACE INTO records (stratno, record, xml, fetched, accessed) VALUES (?, ?, ?, ?, ?)",
+        (stratno, json.dumps(record) if record is not None else None, xml, now, now)
+    )
+    # trim the cache every hundredth of its size in puts, so it exceeds its size by that much per worker at most
+    with _lock:
+        _puts += 1
+        due = _puts >= max(1, RECORD_CACHE_MAX_ENTRIES // 100)
+        if due:
+            _puts = 0
+    if due:
+        _evict(con, now)
+
+
+def _evict(con, now):
+    _flush_accessed(con)
+    con.execute("DELETE FROM records WHERE fetched <= ?", (now - _max_age(),))
+    over = con.execute("SELECT COUNT(*) FROM records").fetchone()[0] - RECORD_CACHE_MAX_ENTRIES
+    if over > 0:
+        con.execute(
+            "DELETE FROM records WHERE stratno IN (SELECT stratno FROM records ORDER BY accessed LIMIT ?)",
+            (over,)
+        )
+
+
+def clear():
+    with _lock:
+        _accessed.clear()
+    _connection().execute("DELETE FROM records")
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from api.config import RESPONSE_CACHE_MAX_BYTES
+
+# An in-process cache of rendered responses, for the routes whose representations only change when the graph does.
+#
+# Entries are keyed by (path, normalised query string, profile, Media Type) and held in least recently used order
+# within a budget of bytes. The whole cache is for one version of the graph: it is emptied when a response for
+# another version is looked up or stored. Each gunicorn worker has its own cache.
+#
+# Streamed responses are read ahead, up to RESPONSE_CACHE_MAX_STREAM_BYTES, to be kept too: those too large to be are
+# counted in the stats as too_large, with those too large for the whole cache.
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.too_large = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.bytes = 0
+            self.version = version
+
+    def get(self, version: str, key: tuple):
+        """
+        Returns the (body, status, headers) cached for key, or None.
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, version: str, key: tuple, body: bytes, status: int, headers: list):
+        size = len(body) + sum(len(k) + len(v) for k, v in headers)
+        if size > self.max_bytes:
+            self.skip()
+            return
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = ((body, status, headers), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def skip(self):
+        """
+        Counts a response that wasn't kept as it was too large.
+        """
+        with self._lock:
+            self.too_large += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "too_large": self.too_large,
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
@@ -0,0 +1,298 @@
+import logging
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from rdflib import Graph, URIRef, BNode, Literal
+
+# A compact binary snapshot of a graph, written once when the data is built and read back with mmap.
+#
+# The file holds a table of every term in the graph, encoded as bytes and sorted, and the graph's triples as arrays
+# of term numbers in three sort orders (SPO, POS and OSP). Loading it is a matter of mapping the file: terms are only
+# turned into rdflib objects when a lookup returns them, and the pages of the file are shared by every process that
+# maps it. Unlike a pickled Graph, it doesn't depend on the version of rdflib installed.
+#
+# Layout, with all integers unsigned 32 bit in native byte order:
+#
+#   header:  MAGIC, format version, number of terms, number of triples, length of the terms blob
+#   offsets: number of terms + 1 offsets into the terms blob
+#   terms:   the encoded terms, concatenated
+#   padding: to a 4 byte boundary
+#   triples: for each of SPO, POS and OSP, three arrays of number of triples term numbers: first, second, third
+
+MAGIC = b"ASTRSNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("=8sIIII")
+ORDERS = ("spo", "pos", "osp")
+
+
+def encode_term(term):
+    if isinstance(term, URIRef):
+        return b"U" + str(term).encode("utf-8")
+    elif isinstance(term, BNode):
+        return b"B" + str(term).encode("utf-8")
+    elif isinstance(term, Literal):
+        return b"L" + b"\x00".join([
+            str(term).encode("utf-8"),
+            (term.language or "").encode("utf-8"),
+            str(term.datatype or "").encode("utf-8"),
+        ])
+    raise ValueError("Terms of type {} can't be stored in a snapshot".format(type(term).__name__))
+
+
+def decode_term(b: bytes):
+    kind, value = b[:1], b[1:]
+    if kind == b"U":
+        return URIRef(value.decode("utf-8"))
+    elif kind == b"B":
+        return BNode(value.decode("utf-8"))
+    lexical, language, datatype = value.split(b"\x00")
+    return Literal(
+        lexical.decode("utf-8"),
+        lang=language.decode("utf-8") or None,
+        datatype=URIRef(datatype.decode("utf-8")) if datatype else None
+    )
+
+
+def write_snapshot(graph: Graph, path: Path):
+    """
+    Writes a graph to a snapshot file. The file is written alongside path and moved into place when complete.
+    """
+    encoded = sorted({encode_term(t) for triple in graph for t in triple})
+    numbers = {b: i for i, b in enumerate(encoded)}
+    triples = [tuple(numbers[encode_term(t)] for t in triple) for triple in graph]
+
+    offsets = array("I", [0])
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    terms = b"".join(encoded)
+
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded), len(triples), len(terms)))
+        f.write(offsets.tobytes())
+        f.write(terms)
+        f.write(b"\x00" * (-len(terms) % 4))
+        for order in ORDERS:
+            positions = ["spo".index(c) for c in order]
+            ordered = sorted(tuple(t[i] for i in positions) for t in triples)
+            for column in range(3):
+                f.write(array("I", (t[column] for t in ordered)).tobytes())
+    os.replace(tmp, path)
+
+
+def snapshot_version(stat: os.stat_result):
+    return "{:x}-{:x}".format(stat.st_ino, stat.st_mtime_ns)
+
+
+class GraphReader:
+    """
+    The parts of rdflib's Graph API that this API reads graphs with, on top of a graph's triples() method.
+    """
+    def triples(self, triple):
+        raise NotImplementedError
+
+    def __iter__(self):
+        return self.triples((None, None, None))
+
+    def __contains__(self, triple):
+        for _ in self.triples(triple):
+            return True
+        return False
+
+    def subjects(self, predicate=None, object=None):
+        for s, p, o in self.triples((None, predicate, object)):
+            yield s
+
+    def predicates(self, subject=None, object=None):
+        for s, p, o in self.triples((subject, None, object)):
+            yield p
+
+    def objects(self, subject=None, predicate=None):
+        for s, p, o in self.triples((subject, predicate, None)):
+            yield o
+
+    def subject_objects(self, predicate=None):
+        for s, p, o in self.triples((None, predicate, None)):
+            yield s, o
+
+    def subject_predicates(self, object=None):
+        for s, p, o in self.triples((None, None, object)):
+            yield s, p
+
+    def predicate_objects(self, subject=None):
+        for s, p, o in self.triples((subject, None, None)):
+            yield p, o
+
+    def value(self, subject=None, predicate=None, object=None, default=None):
+        for s, p, o in self.triples((subject, predicate, object)):
+            if subject is None:
+                return s
+            elif predicate is None:
+                return p
+            return o
+        return default
+
+
+class NumberedGraph(GraphReader):
+    """
+    A read-only graph whose terms are numbered in the order of their encoding, so URIs are numbered in the order of
+    the URI strings. The indexes are built from, and hold, term numbers.
+
+    Subclasses give term(), number() and triple_numbers().
+    """
+    def term(self, n: int):
+        raise NotImplementedError
+
+    def number(self, term):
+        raise NotImplementedError
+
+    def triple_numbers(self, s: int = None, p: int = None, o: int = None):
+        raise NotImplementedError
+
+    def triples(self, triple):
+        numbers = []
+        for term in triple:
+            if term is None:
+                numbers.append(None)
+            else:
+                n = self.number(term)
+                if n is None:
+                    return
+                numbers.append(n)
+        # bound terms are given back as they were given rather than decoded again
+        s_term, p_term, o_term = triple
+        for s, p, o in self.triple_numbers(*numbers):
+            yield (
+                s_term if s_term is not None else self.term(s),
+                p_term if p_term is not None else self.term(p),
+                o_term if o_term is not None else self.term(o),
+            )
+
+    def to_graph(self):
+        """
+        Returns the graph as an rdflib Graph, made on first use, for anything needing the full Graph API. It is a
+        full copy of the graph in this process's memory, so it is for tools and benchmarks, not for serving requests.
+        """
+        if self._graph is None:
+            logging.warning("copying the whole graph into an rdflib Graph in process {}".format(os.getpid()))
+            g = Graph()
+            for triple in self:
+                g.add(triple)
+            self._graph = g
+        return self._graph
+
+    def query(self, *args, **kwargs):
+        # SPARQL would need the full Graph API, i.e. a full copy of the graph in every worker, which is what this
+        # class avoids: use the lookups, or to_graph() explicitly where a copy is acceptable
+        raise NotImplementedError(
+            "SPARQL queries aren't supported by {}: use triples() and the indexes, or to_graph() outside of "
+            "serving requests".format(type(self).__name__)
+        )
+
+
+class SnapshotGraph(NumberedGraph):
+    """
+    A read-only graph loaded from a snapshot file, offering the parts of rdflib's Graph API that this API uses.
+    """
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # identifies this snapshot file: a rebuilt one replaces it with a new file
+            stat = os.fstat(f.fileno())
+            self.version = snapshot_version(stat)
+            self.modified = stat.st_mtime
+        buffer = memoryview(self._mmap)
+
+        magic, version, n_terms, n_triples, terms_length = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("{} is not a version {} graph snapshot".format(path, FORMAT_VERSION))
+
+        position = HEADER.size
+        self._offsets = buffer[position:position + (n_terms + 1) * 4].cast("I")
+        position += (n_terms + 1) * 4
+        self._terms = buffer[position:position + terms_length]
+        position += terms_length + (-terms_length % 4)
+        self._columns = {}
+        for order in ORDERS:
+            columns = []
+            for _ in range(3):
+                columns.append(buffer[position:position + n_triples * 4].cast("I"))
+                position += n_triples * 4
+            self._columns[order] = columns
+        self._n_terms = n_terms
+        self._n_triples = n_triples
+        self._graph = None
+
+    def term(self, n: int):
+        """
+        Returns the term with the given number.
+        """
+        return decode_term(bytes(self._terms[self._offsets[n]:self._offsets[n + 1]]))
+
+    def number(self, term):
+        """
+        Returns the number of a term, or None if it isn't in the graph. Terms are numbered in the order of their
+        encoding, so URIs are numbered in the order of the URI strings.
+        """
+        # binary search of the sorted term table
+        b = encode_term(term)
+        lo, hi = 0, self._n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self._terms[self._offsets[mid]:self._offsets[mid + 1]]) < b:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n_terms and bytes(self._terms[self._offsets[lo]:self._offsets[lo + 1]]) == b:
+            return lo
+        return None
+
+    @staticmethod
+    def _range(column, value, lo, hi):
+        # the range of rows in lo:hi, sorted on column, with the value in that column
+        a, b = lo, hi
+        while a < b:
+            mid = (a + b) // 2
+            if column[mid] < value:
+                a = mid + 1
+            else:
+                b = mid
+        start = a
+        b = hi
+        while a < b:
+            mid = (a + b) // 2
+            if column[mid] <= value:
+                a = mid + 1
+            else:
+                b = mid
+        return start, a
+
+    def triple_numbers(self, s: int = None, p: int = None, o: int = None):
+        """
+        Returns the matching triples as tuples of term numbers, given the numbers of the terms to match.
+        """
+        # chooses the sort order whose leading columns are the bound terms
+        bound = {"s": s, "p": p, "o": o}
+        if s is not None:
+            order = "osp" if o is not None and p is None else "spo"
+        elif p is not None:
+            order = "pos"
+        elif o is not None:
+            order = "osp"
+        else:
+            order = "spo"
+        columns = self._columns[order]
+        lo, hi = 0, self._n_triples
+        for i, c in enumerate(order):
+            if bound[c] is None:
+                break
+            lo, hi = self._range(columns[i], bound[c], lo, hi)
+        positions = [order.index(c) for c in "spo"]
+        for row in range(lo, hi):
+            values = (columns[0][row], columns[1][row], columns[2][row])
+            yield tuple(values[i] for i in positions)
+
+    def __len__(self):
+        return self._n_triples
@@ -0,0 +1,254 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from api.config import UNIT_STORE_FILE
+from api.geologic_time import in_ma
+from api.record_cache import load_record
+
+# The local store of every Stratigraphic Unit record, filled by the bulk harvester in api.harvest. Unlike the
+# record cache, entries don't expire: they are replaced each time the harvester runs.
+
+_local = threading.local()
+
+
+def _connection():
+    # one connection per thread, and a new one after a fork as SQLite connections can't cross processes
+    if getattr(_local, "pid", None) != os.getpid():
+        UNIT_STORE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(UNIT_STORE_FILE), timeout=30, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS units (
+                stratno TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                harvested REAL NOT NULL
+            )
+            """
+        )
+        # each unit's extent, from its envelope, for the spatial index
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS envelopes (
+                stratno TEXT PRIMARY KEY,
+                minx REAL NOT NULL,
+                miny REAL NOT NULL,
+                maxx REAL NOT NULL,
+                maxy REAL NOT NULL
+            )
+            """
+        )
+        # each unit's hierarchy links, to other units in any role, for the hierarchy index
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hierarchy_links (
+                stratno TEXT NOT NULL,
+                role TEXT,
+                target TEXT NOT NULL,
+                PRIMARY KEY (stratno, role, target)
+            )
+            """
+        )
+        _key_hierarchy_links_by_role(con)
+        # each unit's age bounds in Ma and named ages, for the age index
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ages (
+                stratno TEXT PRIMARY KEY,
+                younger REAL,
+                older REAL,
+                younger_named TEXT,
+                older_named TEXT
+            )
+            """
+        )
+        # progress of the current harvest, so an interrupted one can be resumed
+        con.execute("CREATE TABLE IF NOT EXISTS harvest_pages (start_index INTEGER PRIMARY KEY)")
+        con.execute("CREATE TABLE IF NOT EXISTS harvest (key TEXT PRIMARY KEY, value TEXT)")
+        _local.con = con
+        _local.pid = os.getpid()
+    return _local.con
+
+
+def _key_hierarchy_links_by_role(con):
+    # hierarchy_links used to be keyed on (stratno, target) alone, which kept only one of a unit's links to a target
+    # with different roles, so a table from then is remade with role in its key
+    def role_in_key():
+        columns = con.execute("PRAGMA table_info(hierarchy_links)")
+        return any(column[1] == "role" and column[5] > 0 for column in columns)
+
+    if role_in_key():
+        return
+    with con:
+        con.execute("BEGIN IMMEDIATE")
+        # another process may have remade it meanwhile
+        if not role_in_key():
+            con.execute(
+                """
+                CREATE TABLE hierarchy_links_new (
+                    stratno TEXT NOT NULL,
+                    role TEXT,
+                    target TEXT NOT NULL,
+                    PRIMARY KEY (stratno, role, target)
+                )
+                """
+            )
+            con.execute("INSERT INTO hierarchy_links_new SELECT stratno, role, target FROM hierarchy_links")
+            con.execute("DROP TABLE hierarchy_links")
+            con.execute("ALTER TABLE hierarchy_links_new RENAME TO hierarchy_links")
+
+
+def get_record(stratno: str):
+    """
+    Returns the harvested record dict for a Stratigraphic Unit, or None if it hasn't been harvested.
+    """
+    row = _connection().execute("SELECT record FROM units WHERE stratno = ?", (stratno,)).fetchone()
+    return load_record(row[0]) if row is not None else None
+
+
+def get_records(stratnos: list):
+    """
+    Returns the harvested record dicts of many Stratigraphic Units, as a dict of stratno: record, leaving out any
+    that haven't been harvested.
+    """
+    records = {}
+    con = _connection()
+    # in batches, within SQLite's limit on the number of parameters
+    for i in range(0, len(stratnos), 500):
+        batch = stratnos[i:i + 500]
+        rows = con.execute(
+            "SELECT stratno, record FROM units WHERE stratno IN ({})".format(", ".join("?" * len(batch))),
+            batch
+        )
+        for stratno, record in rows:
+            records[stratno] = load_record(record)
+    return records
+
+
+def get_harvested(stratno: str):
+    """
+    Returns the time a Stratigraphic Unit was harvested, or None if it hasn't been.
+    """
+    row = _connection().execute("SELECT harvested FROM units WHERE stratno = ?", (stratno,)).fetchone()
+    return row[0] if row is not None else None
+
+
+def count():
+    return _connection().execute("SELECT COUNT(*) FROM units").fetchone()[0]
+
+
+def _ages(record: dict):
+    # the (younger bound in Ma, older bound in Ma, younger named age, older named age) of a record, each named age
+    # given by its URI or else its title
+    named = []
+    for k in ["youngerNamedAge", "olderNamedAge"]:
+        uri, title = record.get(k) or (None, None)
+        named.append(uri or title)
+    return (in_ma(record.get("youngerBound")), in_ma(record.get("olderBound"))) + tuple(named)
+
+
+def put_page(start_index: int, records: dict):
+    """
+    Stores one harvested page of records, given as a dict of stratno: record, and marks the page as done.
+    """
+    con = _connection()
+    now = time.time()
+    with con:
+        con.execute("BEGIN")
+        con.executemany(
+            "INSERT OR REPLACE INTO units (stratno, record, harvested) VALUES (?, ?, ?)",
+            [(k, json.dumps(v), now) for k, v in records.items()]
+        )
+        con.executemany("DELETE FROM envelopes WHERE stratno = ?", [(k,) for k in records.keys()])
+        con.executemany(
+            "INSERT OR REPLACE INTO envelopes (stratno, minx, miny, maxx, maxy) VALUES (?, ?, ?, ?, ?)",
+            [(k,) + tuple(v["envelope"]) for k, v in records.items() if v.get("envelope") is not None]
+        )
+        con.executemany("DELETE FROM hierarchy_links WHERE stratno = ?", [(k,) for k in records.keys()])
+        con.executemany(
+            "INSERT OR REPLACE INTO hierarchy_links (stratno, role, target) VALUES (?, ?, ?)",
+            [
+                (k, hl["role"][0], hl["targetUnit"][0].split("/SU")[-1])
+                for k, v in records.items() for hl in v.get("hierarchyLinks") or []
+                if hl["targetUnit"][0] is not None
+            ]
+        )
+        con.executemany(
+            "INSERT OR REPLACE INTO ages (stratno, younger, older, younger_named, older_named) VALUES (?, ?, ?, ?, ?)",
+            [(k,) + _ages(v) for k, v in records.items()]
+        )
+        con.execute("INSERT OR REPLACE INTO harvest_pages (start_index) VALUES (?)", (start_index,))
+
+
+def get_envelopes():
+    """
+    Yields the (stratno, min long, min lat, max long, max lat) of every unit that has an envelope.
+    """
+    yield from _connection().execute("SELECT stratno, minx, miny, maxx, maxy FROM envelopes")
+
+
+def get_hierarchy_links():
+    """
+    Yields the (stratno, role, target stratno) of every unit's hierarchy links, e.g. a Formation's link to the Group
+    it is a member_of, with a unit's links to the same target in different roles each yielded.
+    """
+    yield from _connection().execute("SELECT stratno, role, target FROM hierarchy_links")
+
+
+def get_ages():
+    """
+    Yields the (stratno, younger bound in Ma, older bound in Ma, younger named age, older named age) of every unit,
+    any of which but the stratno may be None.
+    """
+    yield from _connection().execute("SELECT stratno, younger, older, younger_named, older_named FROM ages")
+
+
+def get_finished():
+    """
+    Returns the time the last complete harvest finished, or None if none has.
+    """
+    row = _connection().execute("SELECT value FROM harvest WHERE key = 'finished'").fetchone()
+    return float(row[0]) if row is not None else None
+
+
+def get_harvest_state():
+    """
+    Returns the state of the current harvest as a tuple of (started, total, page size, set of done page start
+    indexes), or None if there's no unfinished harvest. The page size is None for a harvest started before it was
+    recorded.
+    """
+    con = _connection()
+    state = dict(con.execute("SELECT key, value FROM harvest").fetchall())
+    if "started" not in state or "finished" in state:
+        return None
+    done = {r[0] for r in con.execute("SELECT start_index FROM harvest_pages")}
+    page_size = int(state["page_size"]) if "page_size" in state else None
+    return float(state["started"]), int(state["total"]), page_size, done
+
+
+def start_harvest(total: int, page_size: int):
+    con = _connection()
+    started = time.time()
+    with con:
+        con.execute("BEGIN")
+        con.execute("DELETE FROM harvest_pages")
+        con.execute("DELETE FROM harvest")
+        con.executemany(
+            "INSERT INTO harvest (key, value) VALUES (?, ?)",
+            [("started", str(started)), ("total", str(total)), ("page_size", str(page_size))]
+        )
+    return started
+
+
+def finish_harvest(started: float):
+    con = _connection()
+    with con:
+        con.execute("BEGIN")
+        # units no longer delivered by the WFS
+        con.execute("DELETE FROM units WHERE harvested < ?", (started,))
+        con.execute("DELETE FROM envelopes WHERE stratno NOT IN (SELECT stratno FROM units)")
+        con.execute("DELETE FROM hierarchy_links WHERE stratno NOT IN (SELECT stratno FROM units)")
+        con.execute("DELETE FROM ages WHERE stratno NOT IN (SELECT stratno FROM units)")
+        con.execute("INSERT OR REPLACE INTO harvest (key, value) VALUES ('finished', ?)", (str(time.time()),))
@@ -0,0 +1,50 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from api.config import UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT, UPSTREAM_RETRIES, UPSTREAM_POOL_SIZE
+
+# The HTTP client for all calls to upstream services, such as GA's WFSs.
+#
+# Each process has one Session, shared by its threads, so connections are pooled and kept alive between requests
+# rather than a new one being opened for every call.
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _new_session():
+    retry = Retry(
+        total=UPSTREAM_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+def get_session():
+    global _session, _session_pid
+    # a new session after a fork as pooled connections can't be shared across processes
+    if _session_pid != os.getpid():
+        with _session_lock:
+            if _session_pid != os.getpid():
+                _session = _new_session()
+                _session_pid = os.getpid()
+    return _session
+
+
+def get(url, params=None, **kwargs):
+    """
+    GETs a URL through the shared session, with the configured connect and read timeouts unless others are given.
+    """
+    kwargs.setdefault("timeout", (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT))
+    return get_session().get(url, params=params, **kwargs)
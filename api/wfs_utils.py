@@ -1,4 +1,3 @@
-import requests
 from lxml import etree
 from rdflib import Graph, Literal, URIRef, Namespace
 from rdflib.namespace import DCTERMS, RDF
@@ -6,6 +5,8 @@ from api.config import *
 from os.path import *
 import logging
 from api.config import DATA_DIR
+from api import record_cache, unit_store, upstream
+from api.gsmlb_extract import extract_strat_unit
 
 
 def get_no_of_stratunits():
@@ -16,185 +17,108 @@ def get_no_of_stratunits():
             "&version=1.1.0" \
             "&resultType=hits"
 
-    r = requests.get(url)
+    r = upstream.get(url)
 
     return int(r.text.split("numberOfFeatures=\"", 1)[1].split("\"", 1)[0])
 
 
 def store_stratunit_index(no_of_stratunits):
-    r = requests.get(
+    # the response is parsed as it is downloaded and each feature is written out and discarded once it's been read,
+    # so memory use stays flat however many features the WFS returns
+    r = upstream.get(
         "http://stratunits.gs.cloud.ga.gov.au/stratunit/ows"
         "?service=WFS"
         "&version=1.0.0"
         "&request=GetFeature"
         "&typeName=stratunit%3AStratigraphicUnit"
         "&maxFeatures={}"
-        "&propertyname=stratunit:name".format(no_of_stratunits)
+        "&propertyname=stratunit:name".format(no_of_stratunits),
+        stream=True
     )
+    r.raise_for_status()
+    r.raw.decode_content = True
+
+    STRATUNIT = "{http://www.ga.gov.au/stratunit}"
+    collection_uri = "http://example.com/dataset/auststrat/sus"  # TODO: remove magic var
+    index_file = os.path.join(DATA_DIR, "stratunits-index.ttl")
+
+    # written alongside the index and moved over it when complete so the index is never seen half-written
+    with open(index_file + ".tmp", "w", encoding="utf-8") as f:
+        f.write(
+            "@prefix dcterms: <http://purl.org/dc/terms/> .\n"
+            "@prefix gfs: <http://pid.geoscience.gov.au/geologicFeature/au/> .\n"
+            "@prefix strat: <http://pid.geoscience.gov.au/def/stratunits#> .\n"
+            "\n"
+        )
+        for _, feature in etree.iterparse(r.raw, events=("end",), tag="{http://www.opengis.net/gml}featureMember"):
+            unit = feature.find(STRATUNIT + "StratigraphicUnit")
+            fid = "SU" + unit.get("fid").replace("StratigraphicUnit.", "")
+            name = unit.findtext(STRATUNIT + "name")
+            f.write(
+                "gfs:{} a strat:Unit ;\n"
+                "    dcterms:isPartOf <{}> ;\n"
+                "    dcterms:identifier {} ;\n"
+                "    dcterms:title {} .\n\n".format(fid, collection_uri, Literal(fid).n3(), Literal(name).n3())
+            )
 
-    tree = etree.fromstring(r.content)
-    features = tree.xpath('//gml:featureMember', namespaces={"gml": "http://www.opengis.net/gml"})
-    g = Graph()
-    STRAT = Namespace("http://pid.geoscience.gov.au/def/stratunits#")
-    GFS = Namespace("http://pid.geoscience.gov.au/geologicFeature/au/")
-    g.bind("strat", STRAT)
-    g.bind("gfs", GFS)
-    g.bind("dcterms", DCTERMS)
-
-    for feature in features:
-        fid = "SU" + feature.xpath(
-            './/stratunit:StratigraphicUnit/@fid', namespaces={"stratunit": "http://www.ga.gov.au/stratunit"}
-        )[0].replace("StratigraphicUnit.", "")
-        name = feature.xpath('.//stratunit:name/text()', namespaces={"stratunit": "http://www.ga.gov.au/stratunit"})[0]
-        this_feature_uri = GFS[fid]
-        g.add((
-            this_feature_uri,
-            RDF.type,
-            STRAT.Unit
-        ))
-        g.add((
-            this_feature_uri,
-            DCTERMS.identifier,
-            Literal(fid)
-        ))
-        g.add((
-            this_feature_uri,
-            DCTERMS.title,
-            Literal(name)
-        ))
-
-    g.serialize(destination=os.path.join(DATA_DIR, "stratunits-index.ttl"), format="turtle")
-
-    print("index stored")
+            # free this feature and the already-handled ones before it
+            feature.clear()
+            while feature.getprevious() is not None:
+                del feature.getparent()[0]
 
+    os.replace(index_file + ".tmp", index_file)
 
-def safe_list_get(ls, idx, default):
-    try:
-        return ls[idx]
-    except IndexError:
-        return default
+    print("index stored")
 
 
 def get_strat_unit(strat_unit_id, return_original_xml=False):
     # with open("10003.xml", "rb") as f:
     #     tree = etree.fromstring(f.read())
     # ?service=WFS&version=2.0.0&request=GetFeature&typeName=gsmlb%3AGeologicUnit&featureid=asud.gsml.geologicunit.332
+    stratno = strat_unit_id.lstrip("GA.GeologicProvince.")
+
+    # repeat lookups are served from the record cache
+    if return_original_xml:
+        xml = record_cache.get_xml(stratno)
+        if xml is not None:
+            return xml
+    else:
+        # harvested units first, then those cached from earlier lookups
+        record = unit_store.get_record(stratno)
+        if record is None:
+            record = record_cache.get_record(stratno)
+        if record is not None:
+            return record
+
     params = {
         "service": "WFS",
         "version": "2.0.0",
         "request": "GetFeature",
         "typeName": "gsmlb:GeologicUnit",
-        "featureid": "asud.gsml.geologicunit.{}".format(strat_unit_id.lstrip("GA.GeologicProvince.")),
+        "featureid": "asud.gsml.geologicunit.{}".format(stratno),
     }
 
     headers = {'Content-Type': 'application/xml'}
-    r = requests.get(
+    r = upstream.get(
         "http://stratunits.gs.cloud.ga.gov.au/gsmlb/wfs",
         params=params,
         headers=headers
     )
-    if return_original_xml:
-        return r.text
-
-    tree = etree.fromstring(r.content)
-    namespaces = {
-        "gml": "http://www.opengis.net/gml/3.2",  # "http://www.opengis.net/gml",
-        "gsmlb": "http://www.opengis.net/gsml/4.1/GeoSciML-Basic",
-        "swe": "http://www.opengis.net/swe/2.0",
-        "xlink": "http://www.w3.org/1999/xlink",
-    }
-    descriptionpurposes = {
-        "definingNorm": ("http://resource.geosciml.org/classifier/cgi/descriptionpurpose/defining_norm", "defining norm"),
-        "instance": ("http://resource.geosciml.org/classifier/cgi/descriptionpurpose/instance", "instance"),
-        "typicalNorm": ("http://resource.geosciml.org/classifier/cgi/descriptionpurpose/typical_norm", "typical norm")
-    }
-    descriptionPurpose = safe_list_get(tree.xpath('//gsmlb:purpose/text()', namespaces=namespaces), 0, None)
-    if descriptionPurpose is not None:
-        descriptionPurpose = descriptionpurposes[descriptionPurpose]
-
-    eventProcess = None
-    youngerBound = None
-    olderBound = None
-    youngerNamedAge = None
-    olderNamedAge = None
-
-    geologicHistory = safe_list_get(tree.xpath('//gsmlb:geologicHistory/gsmlb:GeologicEvent', namespaces=namespaces), 0, None)
-    if geologicHistory is not None:
-        if safe_list_get(geologicHistory.xpath("//gsmlb:eventProcess", namespaces=namespaces), 0, None) is not None:
-            eventProcess = (
-                safe_list_get(geologicHistory.xpath("gsmlb:eventProcess/@xlink:href", namespaces=namespaces), 0, None),
-                safe_list_get(geologicHistory.xpath("gsmlb:eventProcess/@xlink:title", namespaces=namespaces), 0, None),
-            )
-
-        if safe_list_get(geologicHistory.xpath("//gsmlb:youngerBoundDate", namespaces=namespaces), 0, None) is not None:
-            youngerBound = (
-                safe_list_get(tree.xpath("//gsmlb:youngerBoundDate/swe:Quantity/swe:value/text()", namespaces=namespaces), 0, None),
-                safe_list_get(tree.xpath("//gsmlb:youngerBoundDate/swe:Quantity/swe:uom/@xlink:href", namespaces=namespaces), 0, None),
-                safe_list_get(tree.xpath("//gsmlb:youngerBoundDate/swe:Quantity/swe:uom/@xlink:title", namespaces=namespaces), 0, None),
-            )
+    r.raise_for_status()
 
-        if safe_list_get(geologicHistory.xpath("//gsmlb:olderBoundDate", namespaces=namespaces), 0, None) is not None:
-            olderBound = (
-                safe_list_get(tree.xpath("//gsmlb:olderBoundDate/swe:Quantity/swe:value/text()", namespaces=namespaces), 0, None),
-                safe_list_get(tree.xpath("//gsmlb:olderBoundDate/swe:Quantity/swe:uom/@xlink:href", namespaces=namespaces), 0, None),
-                safe_list_get(tree.xpath("//gsmlb:olderBoundDate/swe:Quantity/swe:uom/@xlink:title", namespaces=namespaces), 0, None),
-            )
-
-        if safe_list_get(geologicHistory.xpath("//gsmlb:youngerNamedAge", namespaces=namespaces), 0, None) is not None:
-            youngerNamedAge = (
-                safe_list_get(geologicHistory.xpath("//gsmlb:youngerNamedAge/@xlink:href", namespaces=namespaces), 0, None),
-                safe_list_get(geologicHistory.xpath("//gsmlb:youngerNamedAge/@xlink:title", namespaces=namespaces), 0, None),
-            )
+    try:
+        record = extract_strat_unit(etree.fromstring(r.content))
+    except (etree.XMLSyntaxError, IndexError):
+        # not a GeologicUnit response so don't cache it but still give back the original XML if that was asked for
+        if return_original_xml:
+            return r.text
+        raise
 
-        if safe_list_get(geologicHistory.xpath("//gsmlb:olderNamedAge", namespaces=namespaces), 0, None) is not None:
-            olderNamedAge = (
-                safe_list_get(geologicHistory.xpath("//gsmlb:olderNamedAge/@xlink:href", namespaces=namespaces), 0, None),
-                safe_list_get(geologicHistory.xpath("//gsmlb:olderNamedAge/@xlink:title", namespaces=namespaces), 0, None),
-            )
+    record_cache.put(stratno, record, r.text)
 
-    hierarchyLinks = tree.xpath('//gsmlb:hierarchyLink/gsmlb:GeologicUnitHierarchy', namespaces=namespaces)
-    if len(hierarchyLinks) > 0:
-        hierarchy_links = []
-        for hl in hierarchyLinks:
-            role = (
-                safe_list_get(hl.xpath("//gsmlb:role/@xlink:href", namespaces=namespaces), 0, None),
-                safe_list_get(hl.xpath("//gsmlb:role/@xlink:title", namespaces=namespaces), 0, None),
-            )
-            target_unit = (
-                safe_list_get(hl.xpath("//gsmlb:targetUnit/@xlink:href", namespaces=namespaces), 0, None),
-                safe_list_get(hl.xpath("//gsmlb:targetUnit/@xlink:title", namespaces=namespaces), 0, None),
-            )
-            hierarchy_links.append({
-                "role": role,
-                "targetUnit": target_unit
-            })
-    else:
-        hierarchy_links = None
-
-    return {
-        "uri": tree.xpath('//gml:identifier/text()', namespaces=namespaces)[0],
-        "title": tree.xpath('//gml:name/text()', namespaces=namespaces)[0],
-        "description": safe_list_get(tree.xpath('//gml:description/text()', namespaces=namespaces), 0, None),
-        "observationMethod": (
-            tree.xpath("//gsmlb:observationMethod/@xlink:href", namespaces=namespaces)[0],
-            tree.xpath("//gsmlb:observationMethod/@xlink:title", namespaces=namespaces)[0],
-        ),
-        "descriptionPurpose": descriptionPurpose,
-        "geologicUnitType": (
-            tree.xpath("//gsmlb:geologicUnitType/@xlink:href", namespaces=namespaces)[0],
-            tree.xpath("//gsmlb:geologicUnitType/@xlink:title", namespaces=namespaces)[0]
-        ),
-        "stratigraphicRank": (
-            tree.xpath("//gsmlb:rank/@xlink:href", namespaces=namespaces)[0],
-            tree.xpath("//gsmlb:rank/@xlink:title", namespaces=namespaces)[0]
-        ),
-        "eventProcess": eventProcess,
-        "youngerBound": youngerBound,
-        "olderBound": olderBound,
-        "youngerNamedAge": youngerNamedAge,
-        "olderNamedAge": olderNamedAge,
-        "hierarchyLinks": hierarchy_links
-    }
+    if return_original_xml:
+        return r.text
+    return record
 
 
 if __name__ == "__main__":
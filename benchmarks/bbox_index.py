@@ -0,0 +1,67 @@
+"""
+Compares finding the Stratigraphic Units within a bbox with the spatial index, i.e. an R-tree probe, with checking
+every unit's envelope, for boxes from a 1:250k map sheet up to the whole continent.
+
+The envelopes harvested into the unit store are used if there are any, otherwise random ones over Australia for
+every unit in the graph, sized like a mix of local units and basin-scale ones.
+
+Run from the repository root:
+
+    python benchmarks/bbox_index.py
+"""
+import random
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from api import unit_store
+from api.graph_store import get_store
+from api.index.spatial import SpatialIndex
+
+COLLECTION = "http://example.com/dataset/auststrat/sus"
+BOXES = [
+    # name, west, south, east, north
+    ("1:250k sheet", 148.5, -36.0, 150.0, -35.0),
+    ("1:1M sheet", 144.0, -40.0, 150.0, -36.0),
+    ("state", 141.0, -39.0, 154.0, -28.0),
+    ("continent", 112.0, -44.0, 154.0, -10.0),
+]
+
+
+def random_envelopes(store):
+    rnd = random.Random(1)
+    for uri in store.membership.members(COLLECTION):
+        width = rnd.choice([0.05, 0.2, 1.0, 5.0]) * rnd.random()
+        height = width * (0.5 + rnd.random())
+        x = rnd.uniform(113.0, 153.0 - width)
+        y = rnd.uniform(-43.0, -11.0 - height)
+        yield str(uri).split("/SU")[-1], x, y, x + width, y + height
+
+
+def linear(envelopes, west, south, east, north):
+    return sorted(
+        stratno for stratno, minx, miny, maxx, maxy in envelopes
+        if minx >= west and maxx <= east and miny >= south and maxy <= north
+    )
+
+
+def timed_ms(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) * 1000 / repeat, result
+
+
+if __name__ == "__main__":
+    store = get_store()
+    envelopes = list(unit_store.get_envelopes()) or list(random_envelopes(store))
+    start = time.perf_counter()
+    index = SpatialIndex(store.index_graph, store.membership, envelopes)
+    print("{} envelopes, index built in {:.0f} ms\n".format(len(index), (time.perf_counter() - start) * 1000))
+
+    print("{:>14}{:>10}{:>14}{:>14}".format("box", "units", "index ms", "scan ms"))
+    for name, west, south, east, north in BOXES:
+        indexed, found = timed_ms(lambda: index.within(COLLECTION, west, south, east, north))
+        scanned, expected = timed_ms(lambda: linear(envelopes, west, south, east, north))
+        assert sorted(str(uri).split("/SU")[-1] for uri in found) == expected
+        print("{:>14}{:>10}{:>14.3f}{:>14.3f}".format(name, len(found), indexed, scanned))
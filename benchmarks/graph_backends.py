@@ -0,0 +1,103 @@
+"""
+Compares the graph backends: the time to build and load each one's data, and to make the graph lookups of an items
+page, a Feature and the Collections. The sparql backend is run against the stand-in endpoint, in this process, so its
+times are of a local endpoint with nothing else to do; the second run of each lookup is answered by the query cache.
+
+The data is built in a temporary directory rather than the API's cache directory.
+
+Run from the repository root:
+
+    python benchmarks/graph_backends.py
+"""
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from rdflib import Graph, URIRef
+from rdflib.namespace import RDF, DCTERMS
+from api.config import OGCAPI
+from api.backends.base import data_files
+from api.backends.snapshot import SnapshotBackend
+from api.backends.sqlite import SQLiteBackend
+from api.backends.sparql import SPARQLBackend
+from api.backends.standin import make_app, ThreadingWSGIServer
+from api.graph_store import GraphStore
+
+COLLECTION = "http://example.com/dataset/auststrat/sus"
+LISTED = [DCTERMS.identifier, DCTERMS.title, DCTERMS.description]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_standin():
+    g = Graph()
+    for f in data_files():
+        g.parse(f)
+    server = make_server("localhost", 0, make_app(g), server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return "http://localhost:{}/sparql".format(server.server_port)
+
+
+def items_page(store):
+    # the identifiers, titles and descriptions that FeaturesList reads
+    return [
+        [(p, o) for p, o in store.index_graph.predicate_objects(subject=uri) if p in LISTED]
+        for uri in store.membership.page(COLLECTION, 8000, 8020)
+    ]
+
+
+def feature(store):
+    uri, title = store.identifiers.item("sus", "SU1001")
+    return list(store.graph.predicate_objects(subject=URIRef(uri)))
+
+
+def collections(store):
+    return [
+        list(store.graph.predicate_objects(subject=c))
+        for c in store.graph.subjects(predicate=RDF.type, object=OGCAPI.Collection)
+    ]
+
+
+def timed_ms(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+if __name__ == "__main__":
+    tmp = Path(tempfile.mkdtemp())
+    backends = [
+        ("snapshot", SnapshotBackend()),
+        ("sqlite", SQLiteBackend()),
+        ("sparql", SPARQLBackend(start_standin())),
+    ]
+    for name, backend in backends:
+        backend.path = tmp / Path(backend.path).name
+
+    print("{:>10}{:>10}{:>10}{:>10}{:>12}{:>12}{:>12}{:>12}{:>12}{:>12}".format(
+        "backend", "build ms", "load ms", "index ms",
+        "page ms", "again ms", "item ms", "again ms", "colls ms", "again ms"
+    ))
+    expected = None
+    for name, backend in backends:
+        build, _ = timed_ms(backend.build)
+        load, (graph, index_graph) = timed_ms(backend.open)
+        index, store = timed_ms(GraphStore, graph, index_graph)
+        times = []
+        results = []
+        for lookup in [items_page, feature, collections]:
+            first, result = timed_ms(lookup, store)
+            second, _ = timed_ms(lookup, store)
+            times.extend([first, second])
+            results.append(sorted(sorted(r) for r in result) if lookup is not feature else sorted(result))
+        if expected is None:
+            expected = results
+        assert results == expected, name
+        print("{:>10}{:>10.0f}{:>10.1f}{:>10.0f}".format(name, build, load, index) +
+              "".join("{:>12.2f}".format(t) for t in times))
@@ -0,0 +1,66 @@
+"""
+Compares the cold-load time and resident memory of the graph loaded from a pickled rdflib Graph, as the cache used
+to be, with the graph loaded from a binary snapshot. Each is loaded in a fresh process.
+
+Run from the repository root:
+
+    python benchmarks/graph_snapshot.py
+"""
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from rdflib import Graph
+from rdflib.namespace import DCTERMS
+from api.config import DATA_DIR
+from api.snapshot import SnapshotGraph, write_snapshot
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+
+def load(kind, path):
+    # run in a fresh process: loads the graph, makes a typical lookup and reports the time taken and memory added
+    before = rss_kb()
+    start = time.perf_counter()
+    if kind == "pickle":
+        with open(path, "rb") as f:
+            g = pickle.load(f)
+    else:
+        g = SnapshotGraph(Path(path))
+    loaded = time.perf_counter() - start
+    len(list(g.subjects(predicate=DCTERMS.isPartOf)))
+    print("{} {} {}".format(loaded * 1000, before, rss_kb()))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        load(sys.argv[1], sys.argv[2])
+        exit()
+
+    g = Graph()
+    for f in DATA_DIR.glob("**/*.ttl"):
+        g.parse(f)
+
+    with tempfile.TemporaryDirectory() as d:
+        files = {"pickle": Path(d) / "DATA.pickle", "snapshot": Path(d) / "DATA.snapshot"}
+        with open(files["pickle"], "wb") as f:
+            pickle.dump(g, f)
+        write_snapshot(g, files["snapshot"])
+
+        print("{:<10}{:>12}{:>12}{:>16}".format("", "file MB", "load ms", "RSS added MB"))
+        for kind, path in files.items():
+            out = subprocess.run(
+                [sys.executable, __file__, kind, str(path)], capture_output=True, text=True, check=True
+            ).stdout.split()
+            loaded, before, after = float(out[0]), int(out[1]), int(out[2])
+            print("{:<10}{:>12.1f}{:>12.1f}{:>16.1f}".format(
+                kind, path.stat().st_size / 1e6, loaded, (after - before) / 1024
+            ))
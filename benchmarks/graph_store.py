@@ -0,0 +1,70 @@
+"""
+Compares the per-request cost of getting the graph by unpickling the cache file on every call (the previous
+behaviour) with the process-resident graph store.
+
+Run from the repository root:
+
+    python benchmarks/graph_store.py [repeats]
+"""
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from rdflib import URIRef
+from api.graph_store import get_store
+import api.model.collection
+import api.model.collections
+from api.model.collections import Collections
+from api.model.collection import Collection
+
+COLLECTION_URI = "http://example.com/dataset/auststrat/sus"
+PICKLE_FILE = Path(tempfile.gettempdir()) / "DATA.pickle"
+
+
+def unpickle_graph():
+    with open(PICKLE_FILE, "rb") as f:
+        return pickle.load(f)
+
+
+def request_work():
+    # roughly what an items request asks of the graph: the Collections, the Collection and its members
+    Collections()
+    Collection(COLLECTION_URI)
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000, times[-1] * 1000
+
+
+def use_get_graph(fn):
+    for module in (api.model.collection, api.model.collections):
+        module.get_graph = fn
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    start = time.perf_counter()
+    store = get_store()
+    print("first load: {:.0f} ms".format((time.perf_counter() - start) * 1000))
+
+    # the cache file as it used to be
+    with open(PICKLE_FILE, "wb") as f:
+        pickle.dump(store.graph.to_graph(), f)
+
+    use_get_graph(unpickle_graph)
+    before = timed(request_work, repeats)
+    use_get_graph(lambda: get_store().graph)
+    after = timed(request_work, repeats)
+
+    print("{:<28}{:>12}{:>12}".format("", "median ms", "max ms"))
+    print("{:<28}{:>12.1f}{:>12.1f}".format("unpickle per call", *before))
+    print("{:<28}{:>12.1f}{:>12.1f}".format("process-resident store", *after))
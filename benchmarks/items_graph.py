@@ -0,0 +1,52 @@
+"""
+Compares building the GeoSPARQL graph for a page of items by adding each Feature's graph to the page's graph, which
+copies the page's graph each time, with adding every Feature's triples to the one graph.
+
+Run from the repository root:
+
+    python benchmarks/items_graph.py
+"""
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from rdflib import Graph
+from api.model.feature import StratUnit
+
+
+def strat_unit(stratno):
+    # a StratUnit without its WFS properties, which the GeoSPARQL profile doesn't use
+    su = StratUnit.__new__(StratUnit)
+    su.uri = "http://pid.geoscience.gov.au/geologicFeature/au/SU{}".format(stratno)
+    su.isPartOf = "http://example.com/dataset/auststrat/sus"
+    return su
+
+
+def by_addition(strat_units):
+    g = Graph()
+    for su in strat_units:
+        g = g + su.to_geosp_graph()
+    return g
+
+
+def into_one_graph(strat_units):
+    g = Graph()
+    for su in strat_units:
+        su.to_geosp_graph(g)
+    return g
+
+
+def timed_ms(fn, strat_units):
+    start = time.perf_counter()
+    g = fn(strat_units)
+    return (time.perf_counter() - start) * 1000, len(g)
+
+
+if __name__ == "__main__":
+    print("{:>10}{:>10}{:>16}{:>16}".format("page size", "triples", "addition ms", "one graph ms"))
+    for page_size in [10, 100, 1000]:
+        strat_units = [strat_unit(i) for i in range(page_size)]
+        addition, n = timed_ms(by_addition, strat_units)
+        one_graph, m = timed_ms(into_one_graph, strat_units)
+        assert n == m
+        print("{:>10}{:>10}{:>16.1f}{:>16.1f}".format(page_size, n, addition, one_graph))
@@ -0,0 +1,50 @@
+"""
+Times the parsing of saved GeoSciML WFS GetFeature responses into Stratigraphic Unit records.
+
+Run from the repository root with the responses to time, e.g. ones saved as in api/wfs_utils.py's __main__:
+
+    python benchmarks/parse_strat_unit.py 1001.xml 10003.xml
+
+With no files given, the responses for units 1001 and 10003 are fetched and saved to benchmarks/samples/ first.
+"""
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from lxml import etree
+from api.gsmlb_extract import extract_strat_unit, GEOLOGIC_UNIT
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+
+def fetch_samples():
+    from api.wfs_utils import get_strat_unit
+    SAMPLES_DIR.mkdir(exist_ok=True)
+    paths = []
+    for stratno in ["1001", "10003"]:
+        path = SAMPLES_DIR / (stratno + ".xml")
+        if not path.is_file():
+            path.write_text(get_strat_unit(stratno, return_original_xml=True), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def per_unit_us(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000000
+
+
+if __name__ == "__main__":
+    paths = [Path(p) for p in sys.argv[1:]] or sorted(SAMPLES_DIR.glob("*.xml")) or fetch_samples()
+    repeats = 2000
+
+    print("{:<24}{:>8}{:>14}{:>14}".format("response", "units", "parse us", "extract us"))
+    for path in paths:
+        content = path.read_bytes()
+        tree = etree.fromstring(content)
+        units = GEOLOGIC_UNIT(tree)
+        parse = per_unit_us(lambda: etree.fromstring(content), repeats) / len(units)
+        extract = per_unit_us(lambda: [extract_strat_unit(u) for u in units], repeats) / len(units)
+        print("{:<24}{:>8}{:>14.1f}{:>14.1f}".format(path.name, len(units), parse, extract))
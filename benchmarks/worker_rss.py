@@ -0,0 +1,43 @@
+"""
+Reports the memory of a running gunicorn master and each of its workers: RSS, PSS (resident memory with shared pages
+divided among the processes sharing them) and USS (memory unique to the process, i.e. that it doesn't share).
+
+USS is what each extra worker costs. Run on the server, with the master's PID:
+
+    python benchmarks/worker_rss.py <master pid>
+"""
+import sys
+from pathlib import Path
+
+
+def memory_kb(pid):
+    values = {}
+    with open("/proc/{}/smaps_rollup".format(pid)) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values["Rss"], values["Pss"], values["Private_Clean"] + values["Private_Dirty"]
+
+
+def children(pid):
+    return [
+        int(p.name) for p in Path("/proc").iterdir()
+        if p.name.isdigit() and (p / "stat").is_file()
+        and int((p / "stat").read_text().rsplit(")", 1)[1].split()[1]) == pid
+    ]
+
+
+if __name__ == "__main__":
+    master = int(sys.argv[1])
+    workers = children(master)
+
+    print("{:<10}{:>8}{:>12}{:>12}{:>12}".format("", "pid", "RSS MB", "PSS MB", "USS MB"))
+    print("{:<10}{:>8}{:>12.1f}{:>12.1f}{:>12.1f}".format("master", master, *(x / 1024 for x in memory_kb(master))))
+    total_uss = 0
+    for pid in workers:
+        rss, pss, uss = memory_kb(pid)
+        total_uss += uss
+        print("{:<10}{:>8}{:>12.1f}{:>12.1f}{:>12.1f}".format("worker", pid, rss / 1024, pss / 1024, uss / 1024))
+    if len(workers) > 0:
+        print("mean unique memory per worker: {:.1f} MB".format(total_uss / len(workers) / 1024))
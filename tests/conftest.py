@@ -0,0 +1,89 @@
+import os
+import sys
+import pytest
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import DCTERMS
+
+# the tests import the api package from the repository root, as the app does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.index import MembershipIndex  # noqa: E402
+from api.snapshot import SnapshotGraph, write_snapshot  # noqa: E402
+
+COLLECTION = URIRef("http://example.com/dataset/auststrat/sus")
+UNIT = "http://pid.geoscience.gov.au/geologicFeature/au/SU{}"
+
+
+@pytest.fixture
+def snapshot_of(tmp_path):
+    """
+    Returns a function giving the SnapshotGraph of an rdflib Graph, written to a temporary file.
+    """
+    def snapshot_of(graph: Graph):
+        path = tmp_path / "{}.snapshot".format(len(list(tmp_path.iterdir())))
+        write_snapshot(graph, path)
+        return SnapshotGraph(path)
+    return snapshot_of
+
+
+@pytest.fixture
+def units(snapshot_of):
+    """
+    Returns a function giving the (SnapshotGraph, MembershipIndex) of a Collection of units, given their titles by
+    stratno, and a function adding any other triples to the graph first.
+    """
+    def units(titles: dict, add=None):
+        g = Graph()
+        for stratno, title in titles.items():
+            uri = URIRef(UNIT.format(stratno))
+            g.add((uri, DCTERMS.isPartOf, COLLECTION))
+            g.add((uri, DCTERMS.identifier, Literal("SU{}".format(stratno))))
+            g.add((uri, DCTERMS.title, Literal(title)))
+        if add is not None:
+            add(g)
+        graph = snapshot_of(g)
+        return graph, MembershipIndex(graph)
+    return units
+
+
+@pytest.fixture
+def store_file(tmp_path, monkeypatch):
+    """
+    Points the unit store at a temporary database, returning the unit_store module.
+    """
+    from api import unit_store
+    monkeypatch.setattr(unit_store, "UNIT_STORE_FILE", tmp_path / "units.sqlite")
+    monkeypatch.setattr(unit_store, "_local", type(unit_store._local)())
+    return unit_store
+
+
+@pytest.fixture
+def store(units, store_file, monkeypatch):
+    """
+    Returns a function making the current GraphStore, of a Collection "sus" of units given their titles by stratno, as
+    units() does, and their records, given by stratno, stored as a harvest in a temporary unit store.
+    """
+    import math
+    from rdflib.namespace import RDF
+    from api import graph_store
+    from api.config import OGCAPI
+
+    def store(titles: dict, records: dict = None, add=None):
+        def add_collection(g):
+            g.add((COLLECTION, RDF.type, OGCAPI.Collection))
+            g.add((COLLECTION, DCTERMS.identifier, Literal("sus")))
+            g.add((COLLECTION, DCTERMS.title, Literal("Stratigraphic Units")))
+            if add is not None:
+                add(g)
+
+        graph, _ = units(titles, add_collection)
+        if records is not None:
+            started = store_file.start_harvest(len(records), len(records))
+            store_file.put_page(0, records)
+            store_file.finish_harvest(started)
+        s = graph_store.GraphStore(graph)
+        # never checked for a newer one
+        monkeypatch.setattr(graph_store, "_store", s)
+        monkeypatch.setattr(graph_store, "_store_checked", math.inf)
+        return s
+    return store
@@ -0,0 +1,129 @@
+import math
+import random
+import pytest
+from api.geologic_time import ICS_AGES
+from api.index.ages import AgeIndex
+from conftest import COLLECTION, UNIT
+
+ISC = "http://resource.geosciml.org/classifier/ics/ischart/"
+
+
+@pytest.fixture
+def index(units):
+    graph, membership = units({1: "Unit 1", 2: "Unit 2", 3: "Unit 3"})
+    # "Lady Loretta" isn't in the ICS chart, so its span is from the bounds of the units given it
+    return AgeIndex(graph, membership, [
+        ("1", 1500.0, 1600.0, "Lady Loretta", "Lady Loretta"),
+        ("2", 1550.0, 1700.0, None, "Lady Loretta"),
+        ("3", None, None, ISC + "Permian", ISC + "Permian"),
+    ])
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("260", (260.0, 260.0)),
+    (".5", (0.5, 0.5)),
+    ("250/300", (250.0, 300.0)),
+    ("300/250", (250.0, 300.0)),
+    (" 250 / 300 ", (250.0, 300.0)),
+    ("../300", (0.0, 300.0)),
+    ("250/..", (250.0, math.inf)),
+    ("../..", (0.0, math.inf)),
+    ("Permian", ICS_AGES["permian"]),
+    ("permian", ICS_AGES["permian"]),
+    ("Upper Cretaceous", ICS_AGES["latecretaceous"]),
+    ("Triassic/Permian", (ICS_AGES["triassic"][0], ICS_AGES["permian"][1])),
+    ("Jurassic/..", (ICS_AGES["jurassic"][0], math.inf)),
+    ("../Jurassic", (0.0, ICS_AGES["jurassic"][1])),
+    ("100/Jurassic", (100.0, ICS_AGES["jurassic"][1])),
+    ("Lady Loretta", (1500.0, 1700.0)),
+])
+def test_parse(index, value, expected):
+    assert index.parse(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "", "bad", "..", "-5", "1e3", "250/", "/300", "250/300/350", "Permian/bad", "../Nowhere",
+])
+def test_parse_bad_input(index, value):
+    with pytest.raises(ValueError):
+        index.parse(value)
+
+
+def test_the_units_intervals(index):
+    def overlapping(younger, older):
+        return [str(uri) for uri in index.overlapping(COLLECTION, younger, older)]
+
+    assert len(index) == 3
+    assert overlapping(*ICS_AGES["permian"]) == [UNIT.format(3)]
+    assert overlapping(1650.0, 1650.0) == [UNIT.format(2)]
+    assert overlapping(1600.0, 1600.0) == [UNIT.format(1), UNIT.format(2)]
+    assert overlapping(0.0, math.inf) == [UNIT.format(n) for n in [1, 2, 3]]
+    assert overlapping(0.0, 100.0) == []
+
+
+def test_overlapping_against_brute_force(units):
+    rng = random.Random(2)
+    stratnos = range(1, 401)
+    graph, membership = units({stratno: "Unit {}".format(stratno) for stratno in stratnos})
+    names = sorted(ICS_AGES)
+    ages = []
+    intervals = {}
+    for stratno in list(stratnos) + [9999]:
+        kind = rng.randrange(5)
+        if kind == 0:
+            # no age at all
+            ages.append((str(stratno), None, None, None, None))
+            continue
+        elif kind == 1:
+            # only named ages
+            younger_named, older_named = rng.choice(names), rng.choice(names)
+            ages.append((str(stratno), None, None, younger_named, older_named))
+            younger, older = ICS_AGES[younger_named][0], ICS_AGES[older_named][1]
+        elif kind == 2:
+            # only one bound
+            younger = older = rng.uniform(0.0, 3000.0)
+            ages.append((str(stratno), younger, None, None, None) if rng.random() < 0.5 else
+                        (str(stratno), None, older, None, None))
+        else:
+            younger = rng.uniform(0.0, 3000.0)
+            older = younger + rng.uniform(0.0, 300.0)
+            ages.append((str(stratno), younger, older, None, None))
+        intervals[UNIT.format(stratno)] = (min(younger, older), max(younger, older))
+    index = AgeIndex(graph, membership, ages)
+    assert len(index) == len(intervals)
+
+    members = [str(uri) for uri in membership.members(COLLECTION)]
+    queries = [sorted((rng.uniform(0.0, 3500.0), rng.uniform(0.0, 3500.0))) for _ in range(60)]
+    queries += [(0.0, math.inf), (1000.0, math.inf), (0.0, 0.0), (5000.0, 6000.0)]
+    for younger, older in queries:
+        expected = [
+            uri for uri in members
+            if uri in intervals and intervals[uri][0] <= older and intervals[uri][1] >= younger
+        ]
+        assert [str(uri) for uri in index.overlapping(COLLECTION, younger, older)] == expected
+
+
+@pytest.fixture
+def client(store):
+    from api.app import app
+    store({n: "Unit {}".format(n) for n in range(1, 4)}, {
+        "1": {"youngerBound": ("260", "http://pid.geoscience.gov.au/def/voc/ga/uom/Ma", None),
+              "olderBound": ("280", "http://pid.geoscience.gov.au/def/voc/ga/uom/Ma", None)},
+        "2": {"youngerNamedAge": (ISC + "Jurassic", "Jurassic"), "olderNamedAge": (ISC + "Jurassic", "Jurassic")},
+        "3": {},
+    })
+    return app.test_client()
+
+
+@pytest.mark.parametrize("age", ["bad", "", "250/300/350", "../Nowhere"])
+def test_bad_age_filter_is_a_400(client, age):
+    r = client.get("/collections/sus/items", query_string={"age": age, "_mediatype": "application/json"})
+    assert r.status_code == 400
+    assert "'age' you supplied is invalid" in r.data.decode("utf-8")
+
+
+def test_no_ages_is_a_503(store):
+    from api.app import app
+    store({1: "Unit 1"}, {"1": {}})
+    r = app.test_client().get("/collections/sus/items", query_string={"age": "Permian"})
+    assert r.status_code == 503
@@ -0,0 +1,167 @@
+import gc
+import itertools
+import threading
+import pytest
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.namespace import DCTERMS, RDF, RDFS, XSD
+from api.backends import sqlite as sqlite_backend
+from api.backends.sparql import SPARQLBackend, SPARQLGraph, QueryCache
+from api.backends.sqlite import SQLiteBackend
+from api.backends.standin import make_app, ThreadingWSGIServer
+from api.config import GEO, GEOX, OGCAPI
+from conftest import COLLECTION, UNIT
+
+EX = "http://example.com/def/"
+
+
+def _graph():
+    g = Graph()
+    g.add((COLLECTION, RDF.type, OGCAPI.Collection))
+    g.add((COLLECTION, DCTERMS.identifier, Literal("sus")))
+    for n in range(1, 6):
+        uri = URIRef(UNIT.format(n))
+        g.add((uri, DCTERMS.isPartOf, COLLECTION))
+        g.add((uri, DCTERMS.identifier, Literal("SU{}".format(n))))
+        g.add((uri, DCTERMS.title, Literal("Unit {}".format(n), lang="en")))
+        g.add((uri, RDFS.comment, Literal('a "quoted"\nline')))
+        g.add((uri, URIRef(EX + "rank"), Literal(str(n), datatype=XSD.integer)))
+        geometry = BNode()
+        g.add((uri, GEO.hasGeometry, geometry))
+        g.add((geometry, GEOX.asDGGS, Literal("<https://w3id.org/dggs/auspix> POLYGON (R{})".format(n))))
+    return g
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint():
+    """
+    The URL of the stand-in SPARQL endpoint, answering queries of _graph().
+    """
+    server = make_server("localhost", 0, make_app(_graph()), server_class=ThreadingWSGIServer,
+                         handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://localhost:{}/sparql".format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+def _no_bnodes(triples):
+    return {t for t in triples if not any(isinstance(x, BNode) for x in t)}
+
+
+def test_sparql_graph_against_the_standin(endpoint):
+    g = _graph()
+    remote = SPARQLGraph(endpoint, QueryCache(100, 1024 * 1024, 60))
+    terms = sorted({t for triple in g for t in triple if not isinstance(t, BNode)}) + [URIRef(EX + "absent")]
+    # SPARQL has no triple patterns with a literal predicate
+    patterns = [
+        (s, p, o) for s, p, o in itertools.product([None] + terms, repeat=3)
+        if [s, p, o].count(None) >= 2 and not isinstance(p, Literal)
+    ]
+    patterns += list(_no_bnodes(g))[:5] + [(URIRef(UNIT.format(1)), DCTERMS.title, Literal("Unit 2", lang="en"))]
+    for pattern in patterns:
+        assert _no_bnodes(remote.triples(pattern)) == _no_bnodes(g.triples(pattern)), pattern
+    uri = URIRef(UNIT.format(1))
+    assert remote.value(subject=uri, predicate=DCTERMS.title) == Literal("Unit 1", lang="en")
+    assert set(remote.predicate_objects(subject=uri)) >= {(RDFS.comment, Literal('a "quoted"\nline'))}
+    assert list(remote.triples((BNode(), None, None))) == []
+
+
+def test_sparql_backend_index_triples_from_the_standin(endpoint, tmp_path):
+    backend = SPARQLBackend(endpoint)
+    backend.path = tmp_path / "sparql-index.snapshot"
+    backend.build()
+    graph, index_graph = backend.open()
+    assert isinstance(graph, SPARQLGraph)
+    # the triples the indexes need, and no others
+    g = _graph()
+    expected = _no_bnodes(
+        t for t in g if t[1] in [DCTERMS.isPartOf, DCTERMS.identifier, DCTERMS.title] or t[1] == RDF.type
+    )
+    assert _no_bnodes(index_graph) == expected
+    assert len([t for t in index_graph if t[1] == GEOX.asDGGS]) == 5
+    assert len([t for t in index_graph if t[1] == RDFS.comment]) == 0
+
+
+def test_query_cache_bounds():
+    cache = QueryCache(3, 100, 60)
+    results = [(Literal("x" * 10),)]
+    for q in "abc":
+        cache.put(q, results)
+    cache.get("a")
+    # too many entries: the least recently used goes
+    cache.put("d", results)
+    assert cache.get("b") is None and all(cache.get(q) is not None for q in "acd")
+    # too many bytes: as many go as it takes
+    cache.put("e", [(Literal("x" * 80),)])
+    assert cache.get("e") is not None and cache.bytes <= 100
+    assert sum(cache.get(q) is not None for q in "acd") <= 1
+    # larger than the whole budget, so not kept at all
+    cache.put("f", [(Literal("x" * 200),)])
+    assert cache.get("f") is None and cache.get("e") is not None
+    # replaced, not counted twice
+    cache.put("e", [(Literal("x" * 50),)])
+    assert cache.bytes <= 100
+    # ASK results
+    cache.put("ask", True)
+    assert cache.get("ask") is True
+
+
+def test_query_cache_expiry():
+    cache = QueryCache(10, 1000, 0)
+    cache.put("a", [(Literal("x"),)])
+    assert cache.get("a") is None
+    assert cache.bytes == 0
+
+
+def _sqlite_backend(tmp_path, monkeypatch):
+    source = tmp_path / "data.ttl"
+    _graph().serialize(str(source), format="turtle")
+    monkeypatch.setattr(sqlite_backend, "data_files", lambda: [source])
+    backend = SQLiteBackend()
+    backend.path = tmp_path / "graph.sqlite"
+    return backend
+
+
+def _builds(tmp_path):
+    return sorted(p.name for p in tmp_path.glob("graph-*.sqlite"))
+
+
+def test_sqlite_graph(tmp_path, monkeypatch):
+    backend = _sqlite_backend(tmp_path, monkeypatch)
+    backend.build()
+    graph, index_graph = backend.open()
+    assert graph is index_graph
+    assert _no_bnodes(graph) == _no_bnodes(_graph())
+    assert len(graph) == len(_graph())
+
+
+def test_sqlite_builds_are_kept_while_open(tmp_path, monkeypatch):
+    backend = _sqlite_backend(tmp_path, monkeypatch)
+    backend.build()
+    graph = backend.open()[0]
+    first = graph.path.name
+
+    # still open, so kept however many builds there are after it
+    backend.build(force=True)
+    backend.build(force=True)
+    builds = _builds(tmp_path)
+    assert first in builds and len(builds) == 2
+    assert graph.value(subject=URIRef(UNIT.format(1)), predicate=DCTERMS.identifier) == Literal("SU1")
+    # a thread's first use of the graph connects to its build
+    found = []
+    t = threading.Thread(target=lambda: found.append(graph.number(DCTERMS.identifier)))
+    t.start()
+    t.join()
+    assert found[0] is not None
+
+    # once closed, removed when the next is opened
+    del graph
+    gc.collect()
+    latest = backend.open()[0]
+    assert _builds(tmp_path) == [latest.path.name]
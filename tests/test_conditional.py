@@ -0,0 +1,151 @@
+import types
+import pytest
+from rdflib import Literal, URIRef
+from rdflib.namespace import RDFS
+from flask import Flask, Response
+from api import conditional as conditional_module, record_cache, unit_store
+from api.rdf_stream import stream_rdf
+from api.conditional import conditional, item_record_age
+from api.model.feature import StratUnitRenderer
+from api.response_cache import ResponseCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    A test client of an app with an item route, whose responses count the times it is called, and the store and
+    upstream record ages it sees, to be changed by the tests.
+    """
+    store = types.SimpleNamespace(version="v1", modified=1000.0)
+    ages = {"harvested": None, "fetched": None}
+    monkeypatch.setattr(conditional_module, "get_store", lambda: store)
+    monkeypatch.setattr(conditional_module, "response_cache", ResponseCache(1024 * 1024))
+    monkeypatch.setattr(unit_store, "get_harvested", lambda stratno: ages["harvested"])
+    monkeypatch.setattr(record_cache, "get_fetched", lambda stratno: ages["fetched"])
+
+    app = Flask(__name__)
+    calls = []
+
+    @app.route("/collections/<collection_id>/items/<item_id>")
+    @conditional(StratUnitRenderer, record_age=item_record_age)
+    def item(collection_id, item_id):
+        calls.append(item_id)
+        return Response("call {}".format(len(calls)))
+
+    @app.route("/cached/<collection_id>/items/<item_id>")
+    @conditional(StratUnitRenderer, cache=True)
+    def cached_item(collection_id, item_id):
+        calls.append(item_id)
+        return Response("call {}".format(len(calls)))
+
+    @app.route("/streamed/<int:n>")
+    @conditional(StratUnitRenderer, cache=True)
+    def streamed(n):
+        calls.append(n)
+
+        def chunk(i):
+            def add_triples(g):
+                g.add((URIRef("http://example.com/{}".format(i)), RDFS.label, Literal("x" * 100)))
+            return add_triples
+        return Response(stream_rdf("application/n-triples", [chunk(i) for i in range(n)]))
+
+    c = app.test_client()
+    c.store, c.ages, c.calls = store, ages, calls
+    return c
+
+
+GRAPH_ONLY = "/collections/sus/items/SU1?_profile=geosp&_mediatype=text/turtle"
+SU = "/collections/sus/items/SU1?_profile=su"
+GSMLB = "/collections/sus/items/SU1?_profile=gsmlb"
+
+
+def test_304_for_a_current_etag(client):
+    r = client.get(GRAPH_ONLY)
+    assert r.status_code == 200 and r.headers["ETag"] and r.headers["Last-Modified"]
+    r = client.get(GRAPH_ONLY, headers={"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+    assert client.calls == ["SU1"]
+    # another etag, or none, isn't current
+    assert client.get(GRAPH_ONLY, headers={"If-None-Match": '"other"'}).status_code == 200
+    assert client.get(GRAPH_ONLY).status_code == 200
+
+
+def test_304_for_if_modified_since(client):
+    r = client.get(GRAPH_ONLY)
+    assert client.get(GRAPH_ONLY, headers={"If-Modified-Since": r.headers["Last-Modified"]}).status_code == 304
+    assert client.get(GRAPH_ONLY, headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}).status_code == 200
+
+
+def test_etag_changes_with_the_store_version(client):
+    etag = client.get(GRAPH_ONLY).headers["ETag"]
+    client.store.version = "v2"
+    r = client.get(GRAPH_ONLY, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    assert client.get(GRAPH_ONLY, headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+
+
+def test_etag_varies_with_the_representation(client):
+    etags = {client.get(url).headers["ETag"] for url in [GRAPH_ONLY, GRAPH_ONLY + "&x=1", GRAPH_ONLY.replace("1?", "2?")]}
+    assert len(etags) == 3
+
+
+def test_record_profile_validated_by_the_harvested_record(client):
+    # no record yet: rendered, from what is got, and nothing to validate against
+    r = client.get(SU)
+    assert r.status_code == 200 and "ETag" not in r.headers
+
+    client.ages["harvested"] = 2000.0
+    etag = client.get(SU).headers["ETag"]
+    assert client.get(SU, headers={"If-None-Match": etag}).status_code == 304
+    client.ages["harvested"] = 3000.0
+    r = client.get(SU, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+
+
+def test_gsmlb_validated_by_the_cached_xml_not_the_harvested_record(client):
+    # the harvested record isn't the XML served, so gives it no validator
+    client.ages["harvested"] = 2000.0
+    r = client.get(GSMLB)
+    assert r.status_code == 200 and "ETag" not in r.headers
+
+    client.ages["fetched"] = 2500.0
+    etag = client.get(GSMLB).headers["ETag"]
+    assert client.get(GSMLB, headers={"If-None-Match": etag}).status_code == 304
+    # the XML fetched again, e.g. when it had expired, while the harvest is unchanged
+    client.ages["fetched"] = 2600.0
+    r = client.get(GSMLB, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+
+
+def test_item_record_age():
+    assert item_record_age("su", "sus", None) is None
+
+
+def test_response_cache(client):
+    url = GRAPH_ONLY.replace("/collections/", "/cached/")
+    assert client.get(url).data == b"call 1"
+    assert client.get(url).data == b"call 1"
+    client.store.version = "v2"
+    assert client.get(url).data == b"call 2"
+
+
+def test_streamed_responses_are_cached(client, monkeypatch):
+    monkeypatch.setattr(conditional_module, "RESPONSE_CACHE_MAX_STREAM_BYTES", 2000)
+    first = client.get("/streamed/5?_profile=geosp")
+    assert first.status_code == 200 and len(first.data) > 500
+    second = client.get("/streamed/5?_profile=geosp")
+    assert second.data == first.data
+    assert client.calls == [5]
+    assert conditional_module.response_cache.stats()["entries"] == 1
+
+
+def test_long_streamed_responses_are_streamed_whole_and_not_cached(client, monkeypatch):
+    monkeypatch.setattr(conditional_module, "RESPONSE_CACHE_MAX_STREAM_BYTES", 2000)
+    first = client.get("/streamed/50?_profile=geosp")
+    assert first.data.count(b"\n") == 50
+    second = client.get("/streamed/50?_profile=geosp")
+    assert second.data == first.data
+    assert client.calls == [50, 50]
+    stats = conditional_module.response_cache.stats()
+    assert stats["entries"] == 0 and stats["too_large"] == 2
@@ -0,0 +1,56 @@
+import random
+from rdflib import BNode, Literal, URIRef
+from api.config import GEO, GEOX
+from api.index.dggs import DGGSIndex, dggs_cells
+from conftest import COLLECTION, UNIT
+
+
+def _cell(rng, depth):
+    return rng.choice("NOPQRS") + "".join(rng.choice("012345678") for _ in range(depth))
+
+
+def _literal(cells):
+    return Literal("<https://w3id.org/dggs/auspix> POLYGON ({})".format(" ".join(cells)))
+
+
+def test_dggs_cells():
+    assert dggs_cells("<https://w3id.org/dggs/auspix> POLYGON (R1234 R1235)") == ["R1234", "R1235"]
+    assert dggs_cells("<https://w3id.org/dggs/auspix> POLYGON ()") == []
+
+
+def test_dggs_index_against_brute_force(units):
+    rng = random.Random(2)
+    stratnos = range(1, 401)
+    # some members have no geometry, and some have several, with overlapping cells
+    cells = {}
+    for stratno in stratnos:
+        if stratno % 5 == 0:
+            continue
+        cells[stratno] = [
+            [_cell(rng, rng.randint(1, 4)) for _ in range(rng.randint(1, 4))] for _ in range(1 + (stratno % 11 == 0))
+        ]
+
+    def add(g):
+        for stratno, geometries in cells.items():
+            for member_cells in geometries:
+                geometry = BNode()
+                g.add((URIRef(UNIT.format(stratno)), GEO.hasGeometry, geometry))
+                g.add((geometry, GEOX.asDGGS, _literal(member_cells)))
+
+    graph, membership = units({stratno: "Unit {}".format(stratno) for stratno in stratnos}, add)
+    index = DGGSIndex(graph, membership)
+
+    members = list(membership.members(COLLECTION))
+    queries = [[_cell(rng, rng.randint(0, 2)) for _ in range(rng.randint(1, 3))] for _ in range(200)]
+    # a cell within another given one, and one of every member's cells
+    queries += [["N", "N1"], ["N1", "N"], list("NOPQRS")]
+    for query in queries:
+        expected = []
+        for uri in members:
+            member_cells = [c for geometry in cells.get(int(str(uri).split("/SU")[-1]), []) for c in geometry]
+            if len(member_cells) > 0 and all(any(c.startswith(q) for q in query) for c in member_cells):
+                expected.append(uri)
+        assert list(index.within(COLLECTION, *query)) == expected, query
+
+    assert len(index.within(COLLECTION, *"NOPQRS")) == len(cells)
+    assert list(index.within("http://example.com/absent", "N")) == []
@@ -0,0 +1,70 @@
+import json
+import pytest
+from api.export import GEOJSON_SEQ, NDJSON
+from api.model.features import encode_cursor
+from conftest import UNIT
+
+STRATNOS = range(1, 21)
+
+
+@pytest.fixture
+def client(store):
+    from api.app import app
+    records = {
+        str(n): {"envelope": (float(n), -1.0, n + 1.0, 1.0) if n % 2 == 0 else None} for n in STRATNOS if n != 7
+    }
+    records["5"] = {"envelope": (170.0, -1.0, -170.0, 1.0)}
+    records["9"] = {"envelope": (9.0, 1.0, 9.0, 1.0)}
+    store({n: "Unit {}".format(n) for n in STRATNOS}, records)
+    return app.test_client()
+
+
+def _export(client, mediatype=NDJSON, **args):
+    r = client.get("/collections/sus/export", query_string=dict(args, _mediatype=mediatype))
+    assert r.status_code == 200, r.data
+    lines = r.data.decode("utf-8").split("\n")[:-1]
+    if mediatype == GEOJSON_SEQ:
+        assert all(line.startswith("\x1e") for line in lines)
+        lines = [line[1:] for line in lines]
+    return [json.loads(line) for line in lines]
+
+
+def test_export(client):
+    features = _export(client)
+    assert [f["uri"] for f in features] == sorted(UNIT.format(n) for n in STRATNOS)
+    assert [f for f in features if f["id"] == "SU7"][0]["record"] is None
+
+
+def test_resume_after_the_cursors_feature(client):
+    features = _export(client)
+    for i in [0, 5, len(features) - 1]:
+        resumed = _export(client, cursor=features[i]["cursor"])
+        assert [f["uri"] for f in resumed] == [f["uri"] for f in features[i + 1:]]
+
+
+def test_resume_where_a_feature_that_has_gone_was(client):
+    uris = sorted(UNIT.format(n) for n in STRATNOS)
+    # between SU10 and SU11, and after every one
+    gone = UNIT.format(105)
+    assert [f["uri"] for f in _export(client, cursor=encode_cursor("next", gone))] == [u for u in uris if u > gone]
+    assert _export(client, cursor=encode_cursor("next", UNIT.format(99))) == []
+
+
+@pytest.mark.parametrize("cursor", ["!!!", encode_cursor("prev", UNIT.format(1))])
+def test_invalid_cursors(client, cursor):
+    r = client.get("/collections/sus/export", query_string={"cursor": cursor})
+    assert r.status_code == 400
+
+
+def test_geojson_geometries_from_envelopes(client):
+    features = {f["id"]: f for f in _export(client, GEOJSON_SEQ)}
+    assert features["SU2"]["geometry"] == {
+        "type": "Polygon",
+        "coordinates": [[[2.0, -1.0], [3.0, -1.0], [3.0, 1.0], [2.0, 1.0], [2.0, -1.0]]],
+    }
+    assert features["SU3"]["geometry"] is None
+    assert features["SU7"]["geometry"] is None
+    assert features["SU9"]["geometry"] == {"type": "Point", "coordinates": [9.0, 1.0]}
+    assert features["SU5"]["geometry"]["type"] == "MultiPolygon"
+    assert [p[0][1][0] for p in features["SU5"]["geometry"]["coordinates"]] == [180.0, -170.0]
+    assert all(f["type"] == "Feature" and f["cursor"] for f in features.values())
@@ -0,0 +1,137 @@
+import base64
+import random
+import pytest
+from flask import Flask
+from rdflib import URIRef
+from api.model.features import FeaturesList, FeaturesRenderer, decode_cursor, encode_cursor
+from conftest import UNIT
+
+app = Flask(__name__)
+
+WORDS = ["lady", "loretta", "formation", "group", "granite", "sandstone"]
+
+
+@pytest.mark.parametrize("direction, uri, position", [
+    ("next", UNIT.format(1), None),
+    ("prev", UNIT.format(1), None),
+    ("next", UNIT.format(1), 0),
+    ("prev", "http://example.com/with:colon@and?query=1", 1234),
+])
+def test_cursor_round_trip(direction, uri, position):
+    cursor = encode_cursor(direction, uri, position)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == (direction, uri, position)
+
+
+def _raw(s):
+    return base64.urlsafe_b64encode(s).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "!!!", "a", _raw(b"next"), _raw(b"next:"), _raw(b"up:" + UNIT.format(1).encode()),
+    _raw(b"next@x:" + UNIT.format(1).encode()), _raw(b"next@-1:" + UNIT.format(1).encode()), _raw(b"\xff\xfe"),
+])
+def test_invalid_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.fixture
+def units_store(store):
+    rng = random.Random(4)
+    titles = {n: " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) for n in range(1, 101)}
+    # every unit in a band of longitude by its number, and every third one a long way off
+    records = {
+        str(n): {"envelope": (float(n), 0.0, n + 0.5, 1.0) if n % 3 != 0 else (-170.0, 50.0, -169.0, 51.0)}
+        for n in titles
+    }
+    return store(titles, records)
+
+
+def _features_list(**args):
+    with app.test_request_context(query_string=args):
+        from flask import request
+        return FeaturesList(request, "sus")
+
+
+def _all_pages(per_page, direction="next", **args):
+    # every page, by following the cursors from the first or last page
+    pages = []
+    if direction == "next":
+        features = _features_list(per_page=per_page, **args)
+    else:
+        count = _features_list(per_page=per_page, **args).feature_count
+        features = _features_list(per_page=per_page, page=-(-count // per_page), **args)
+    while True:
+        pages.append([f[0] for f in features.features])
+        cursor = features.next_cursor if direction == "next" else features.prev_cursor
+        if cursor is None:
+            break
+        features = _features_list(per_page=per_page, cursor=cursor, **args)
+    return [uri for page in (pages if direction == "next" else reversed(pages)) for uri in page]
+
+
+@pytest.mark.parametrize("per_page", [1, 7, 20, 200])
+@pytest.mark.parametrize("args", [{}, {"q": "lady"}, {"q": "gran form"}, {"bbox": "0,0,60,1"},
+                                  {"bbox": "0,0,60,1", "q": "san"}, {"q": "nothing"}])
+def test_paging_by_cursor_covers_every_result_once(units_store, per_page, args):
+    by_page_number = [f[0] for f in _features_list(limit=1000, **args).features]
+    assert _all_pages(per_page, **args) == by_page_number
+    assert _all_pages(per_page, direction="prev", **args) == by_page_number
+
+
+def test_paging_a_search_by_cursor_follows_its_ranking(units_store):
+    ranked = [str(uri) for uri in units_store.titles.search("http://example.com/dataset/auststrat/sus", "lady")]
+    assert len(ranked) > 20
+    assert _all_pages(6, q="lady") == ranked
+    # not in URI order
+    assert ranked != sorted(ranked)
+
+
+def test_filtered_paging(units_store):
+    features = _features_list(per_page=5, bbox="0,0,60,1")
+    # in the band, and not the ones a long way off
+    expected = [UNIT.format(n) for n in range(1, 60) if n % 3 != 0]
+    assert features.feature_count == len(expected)
+    assert [f[0] for f in features.features] == sorted(expected)[:5]
+
+
+def test_cursor_of_a_feature_no_longer_in_the_results(units_store):
+    # sorted by URI: the page after where the Feature would be
+    uris = sorted(UNIT.format(n) for n in range(1, 60) if n % 3 != 0)
+    gone = UNIT.format(30)
+    features = _features_list(per_page=3, cursor=encode_cursor("next", gone), bbox="0,0,60,1")
+    after = [u for u in uris if u > gone][:3]
+    assert [f[0] for f in features.features] == after
+    # ranked: from the start
+    features = _features_list(per_page=3, q="lady", cursor=encode_cursor("next", "http://example.com/gone", 10))
+    assert [f[0] for f in features.features] == _all_pages(3, q="lady")[:3]
+
+
+def test_link_header_keeps_the_filters(units_store):
+    with app.test_request_context(query_string={"q": "lady", "bbox": "0,0,60,1", "per_page": 2, "page": 2}):
+        from flask import request
+        renderer = FeaturesRenderer(request, "sus")
+        links = renderer.headers["Link"]
+    for rel in ["first", "last", "next", "prev"]:
+        link = [x for x in links.split(", ") if x.endswith('rel="{}"'.format(rel))]
+        assert len(link) == 1, rel
+        assert "q=lady" in link[0] and "bbox=0%2C0%2C60%2C1" in link[0], link[0]
+    assert "page=1>" in [x for x in links.split(", ") if x.endswith('rel="first"')][0]
+
+
+def test_geosparql_page_gets_nothing_from_the_wfs(units_store, monkeypatch):
+    from api.model.collection import Collection
+    from api.model.feature import StratUnit
+
+    def load(self):
+        raise AssertionError("a record was loaded")
+    monkeypatch.setattr(StratUnit, "load", load)
+    # the Collection's own GeoSPARQL isn't what is tested here
+    monkeypatch.setattr(Collection, "to_geosp_graph", lambda self, g=None: g)
+    with app.test_request_context(query_string={"_profile": "geosp", "_mediatype": "text/turtle", "per_page": 5}):
+        from flask import request
+        r = FeaturesRenderer(request, "sus").render()
+        data = b"".join(r.response)
+    assert r.status_code == 200
+    assert data.count(b"geologicFeature/au/SU") >= 5
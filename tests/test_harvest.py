@@ -0,0 +1,84 @@
+import pytest
+from api import harvest
+
+TOTAL = 95
+
+
+@pytest.fixture
+def wfs(monkeypatch):
+    """
+    A stand-in for the WFS, of TOTAL units, recording the pages asked for and failing those in its failing set.
+    """
+    class WFS:
+        def __init__(self):
+            self.pages = []
+            self.failing = set()
+
+        def get_page(self, start_index, count):
+            self.pages.append((start_index, count))
+            if start_index in self.failing:
+                raise ConnectionError("no response")
+            return {
+                str(stratno): {"uri": "http://pid.geoscience.gov.au/geologicFeature/au/SU{}".format(stratno)}
+                for stratno in range(start_index + 1, min(start_index + count, TOTAL) + 1)
+            }
+
+    w = WFS()
+    monkeypatch.setattr(harvest, "get_no_of_geologic_units", lambda: TOTAL)
+    monkeypatch.setattr(harvest, "get_page", w.get_page)
+    return w
+
+
+def _stratnos(unit_store):
+    return {r[0] for r in unit_store._connection().execute("SELECT stratno FROM units")}
+
+
+def test_harvest(store_file, wfs):
+    assert harvest.harvest(page_size=10, workers=2)
+    assert _stratnos(store_file) == {str(n) for n in range(1, TOTAL + 1)}
+    assert store_file.get_finished() is not None
+    assert store_file.get_harvest_state() is None
+
+
+def test_resume(store_file, wfs):
+    wfs.failing = {20, 70}
+    assert not harvest.harvest(page_size=10, workers=2)
+    assert store_file.get_finished() is None
+    started, total, page_size, done = store_file.get_harvest_state()
+    assert (total, page_size) == (TOTAL, 10)
+    assert done == set(range(0, TOTAL, 10)) - {20, 70}
+
+    # only the pages not yet stored are fetched again
+    wfs.failing = set()
+    wfs.pages = []
+    assert harvest.harvest(page_size=10, workers=2)
+    assert sorted(wfs.pages) == [(20, 10), (70, 10)]
+    assert _stratnos(store_file) == {str(n) for n in range(1, TOTAL + 1)}
+    assert store_file.get_finished() is not None
+
+
+def test_resume_with_another_page_size_is_refused(store_file, wfs):
+    assert harvest.harvest(page_size=10, workers=2)
+    wfs.failing = {30}
+    assert not harvest.harvest(page_size=10, workers=2, restart=True)
+
+    # pages of 25 would leave 30-49 unfetched, and their units would be deleted as gone from the WFS
+    wfs.failing = set()
+    wfs.pages = []
+    assert not harvest.harvest(page_size=25, workers=2)
+    assert wfs.pages == []
+    assert _stratnos(store_file) == {str(n) for n in range(1, TOTAL + 1)}
+
+    assert harvest.harvest(page_size=10, workers=2)
+    assert wfs.pages == [(30, 10)]
+    assert _stratnos(store_file) == {str(n) for n in range(1, TOTAL + 1)}
+
+
+def test_restart(store_file, wfs):
+    wfs.failing = {0}
+    assert not harvest.harvest(page_size=10, workers=2)
+    wfs.failing = set()
+    wfs.pages = []
+    assert harvest.harvest(page_size=25, workers=2, restart=True)
+    assert sorted(wfs.pages) == [(0, 25), (25, 25), (50, 25), (75, 25)]
+    assert _stratnos(store_file) == {str(n) for n in range(1, TOTAL + 1)}
@@ -0,0 +1,136 @@
+import random
+import sqlite3
+from rdflib import URIRef
+from api.index.hierarchy import CONTAINMENT_ROLES, HierarchyIndex
+from conftest import COLLECTION, UNIT
+
+SUH = "http://pid.geoscience.gov.au/def/voc/stratigraphichierarchy/"
+MEMBER_OF = SUH + "member_of"
+PART_OF = SUH + "part_of"
+EQUIVALENT_TO = SUH + "equivalent_to"
+
+
+def _closure(links, stratno, up=True):
+    # each unit reachable from stratno by containment links, with the fewest links to it, by brute force
+    edges = {(s, t) if up else (t, s) for s, role, t in links if role in CONTAINMENT_ROLES and s != t}
+    depths = {stratno: 0}
+    changed = True
+    while changed:
+        changed = False
+        for a, b in edges:
+            if a in depths and (b not in depths or depths[b] > depths[a] + 1):
+                depths[b] = depths[a] + 1
+                changed = True
+    del depths[stratno]
+    return depths
+
+
+def _expected(links, stratno, members, up, max_depth=None):
+    related = [
+        (depth, URIRef(UNIT.format(s))) for s, depth in _closure(links, stratno, up).items()
+        if s in members and (max_depth is None or depth <= max_depth)
+    ]
+    # nearest first, then in URI order, which is the order of the term numbers
+    return sorted(related)
+
+
+def _check(index, membership, links, members):
+    for position, uri in enumerate(membership.members(COLLECTION)):
+        stratno = str(uri).split("/SU")[-1]
+        for up, related in [(True, index.ancestors), (False, index.descendants)]:
+            for max_depth in [None, 1, 2]:
+                uris, depths = related(COLLECTION, position, max_depth)
+                expected = _expected(links, stratno, members, up, max_depth)
+                assert list(zip(depths, uris)) == expected, (stratno, up, max_depth)
+
+
+def test_hierarchy_index_against_hand_built_links(units):
+    members = {str(n) for n in range(1, 9)}
+    graph, membership = units({n: "Unit {}".format(n) for n in sorted(members)})
+    links = [
+        # 1 is a Supergroup of Groups 2 and 3, and Formations 4 and 5 are in Group 2, 6 in Group 3
+        ("2", PART_OF, "1"),
+        ("3", PART_OF, "1"),
+        ("4", MEMBER_OF, "2"),
+        ("5", MEMBER_OF, "2"),
+        ("6", MEMBER_OF, "3"),
+        # 7 is in both 5 and 2, so 2 is one link up from it, not two
+        ("7", MEMBER_OF, "5"),
+        ("7", PART_OF, "2"),
+        # not containment, so none of the hierarchy
+        ("8", EQUIVALENT_TO, "4"),
+        ("6", EQUIVALENT_TO, "5"),
+        ("4", None, "3"),
+        # to itself, and to a unit not in the Collection
+        ("3", PART_OF, "3"),
+        ("6", PART_OF, "99"),
+        ("99", PART_OF, "8"),
+    ]
+    index = HierarchyIndex(graph, membership, links)
+    assert len(index) == 9
+
+    position = {str(uri).split("/SU")[-1]: i for i, uri in enumerate(membership.members(COLLECTION))}
+    uris, depths = index.ancestors(COLLECTION, position["7"])
+    assert [str(u) for u in uris] == [UNIT.format(2), UNIT.format(5), UNIT.format(1)]
+    assert list(depths) == [1, 1, 2]
+    uris, depths = index.descendants(COLLECTION, position["1"], 1)
+    assert [str(u) for u in uris] == [UNIT.format(2), UNIT.format(3)]
+    # 8 is only linked to by containment through 99, which isn't a member: it's not in the Collection's hierarchy
+    assert len(index.ancestors(COLLECTION, position["8"])[0]) == 0
+    assert [str(u) for u in index.descendants(COLLECTION, position["8"])[0]] == [UNIT.format(6)]
+    _check(index, membership, links, members)
+
+
+def test_hierarchy_index_cycles_against_brute_force(units):
+    rng = random.Random(3)
+    members = {str(n) for n in range(1, 61)}
+    graph, membership = units({n: "Unit {}".format(n) for n in sorted(members)})
+    roles = [MEMBER_OF, PART_OF, EQUIVALENT_TO]
+    # random links, with cycles, some to units not in the Collection
+    links = {
+        (str(rng.randint(1, 60)), rng.choice(roles), str(rng.randint(1, 70)))
+        for _ in range(120)
+    }
+    links.add(("1", MEMBER_OF, "2"))
+    links.add(("2", PART_OF, "1"))
+    index = HierarchyIndex(graph, membership, links)
+    _check(index, membership, links, members)
+
+
+def test_no_containment_links(units):
+    graph, membership = units({1: "Unit 1", 2: "Unit 2"})
+    index = HierarchyIndex(graph, membership, [("1", EQUIVALENT_TO, "2")])
+    assert len(index) == 0
+    assert len(index.ancestors(COLLECTION, 0)[0]) == 0
+
+
+def test_links_in_different_roles_to_the_same_target_are_kept(store_file):
+    store_file.put_page(0, {
+        "1": {"hierarchyLinks": [
+            {"role": (MEMBER_OF, "member of"), "targetUnit": (UNIT.format(2), "Unit 2")},
+            {"role": (EQUIVALENT_TO, "equivalent to"), "targetUnit": (UNIT.format(2), "Unit 2")},
+        ]},
+    })
+    assert sorted(store_file.get_hierarchy_links()) == [("1", EQUIVALENT_TO, "2"), ("1", MEMBER_OF, "2")]
+
+
+def test_hierarchy_links_keyed_without_role_are_remade(store_file):
+    con = sqlite3.connect(str(store_file.UNIT_STORE_FILE))
+    con.execute(
+        "CREATE TABLE hierarchy_links (stratno TEXT NOT NULL, role TEXT, target TEXT NOT NULL, "
+        "PRIMARY KEY (stratno, target))"
+    )
+    con.execute("INSERT INTO hierarchy_links VALUES ('1', ?, '2')", (MEMBER_OF,))
+    con.commit()
+    con.close()
+
+    assert list(store_file.get_hierarchy_links()) == [("1", MEMBER_OF, "2")]
+    store_file.put_page(0, {
+        "3": {"hierarchyLinks": [
+            {"role": (MEMBER_OF, None), "targetUnit": (UNIT.format(2), None)},
+            {"role": (PART_OF, None), "targetUnit": (UNIT.format(2), None)},
+        ]},
+    })
+    assert sorted(store_file.get_hierarchy_links()) == [
+        ("1", MEMBER_OF, "2"), ("3", MEMBER_OF, "2"), ("3", PART_OF, "2")
+    ]
@@ -0,0 +1,97 @@
+import pytest
+from rdflib import BNode, Graph, Literal, Namespace, URIRef
+from rdflib.compare import isomorphic
+from rdflib.namespace import DCTERMS, RDF, RDFS, XSD
+from api.rdf_stream import NTriplesWriter, TurtleWriter, stream_rdf
+
+EX = Namespace("http://example.com/def/")
+S = URIRef("http://example.com/thing/1")
+
+# local names that can't be written as is after a prefix, and must be written as full URIs instead
+AWKWARD_LOCAL_NAMES = ["1starts-with-digit", "ends.", "has.dot", "has/slash", "has#hash", "has%20escape", "has~tilde",
+                       "has,comma", "has(paren)", "ünïcode", ""]
+
+
+def _parse(data, format):
+    g = Graph()
+    g.parse(data=data, format=format)
+    return g
+
+
+def _graph():
+    g = Graph()
+    g.add((S, RDF.type, EX.Thing))
+    g.add((S, RDFS.label, Literal("plain")))
+    g.add((S, RDFS.label, Literal("avec accent é", lang="fr")))
+    g.add((S, RDFS.comment, Literal('quotes " and \\\\ backslash\nand newline')))
+    g.add((S, EX["count"], Literal("3", datatype=XSD.integer)))
+    g.add((S, EX.custom, Literal("x", datatype=EX["type.with.dots"])))
+    g.add((S, EX.custom, Literal("y", datatype=URIRef("http://other.example.com/type"))))
+    g.add((S, EX.node, BNode("b1")))
+    g.add((BNode("b1"), DCTERMS.title, Literal("in a node")))
+    for name in AWKWARD_LOCAL_NAMES:
+        g.add((S, EX.related, EX[name]))
+        g.add((EX[name], EX["p-" + str(len(name))], Literal(name)))
+    return g
+
+
+def _chunks(g):
+    # a part per subject, as a model's to_*_graph() methods would add them
+    def part(s):
+        def add_triples(writer):
+            writer.bind("ex", EX)
+            for triple in g.triples((s, None, None)):
+                writer.add(triple)
+        return add_triples
+    return [part(s) for s in sorted(set(g.subjects()))]
+
+
+@pytest.mark.parametrize("mediatype, format", [("text/turtle", "turtle"), ("application/n-triples", "nt")])
+def test_stream_parses_to_the_same_graph(mediatype, format):
+    g = _graph()
+    data = b"".join(stream_rdf(mediatype, _chunks(g))).decode("utf-8")
+    assert isomorphic(_parse(data, format), g)
+
+
+def test_turtle_prefixed_names():
+    writer = TurtleWriter()
+    writer.bind("ex", EX)
+    writer.add((S, EX.simple_name, EX["with-hyphen"]))
+    for name in AWKWARD_LOCAL_NAMES:
+        writer.add((S, EX.related, EX[name]))
+    out = writer.flush()
+    assert "ex:simple_name ex:with-hyphen" in out
+    for name in AWKWARD_LOCAL_NAMES:
+        assert "<{}>".format(EX[name]) in out
+
+
+def test_turtle_prefixes_declared_once_when_first_used():
+    writer = TurtleWriter()
+    writer.bind("ex", EX)
+    writer.add((S, RDFS.label, Literal("a")))
+    first = writer.flush()
+    assert "@prefix rdfs:" in first and "@prefix ex:" not in first
+    writer.add((S, EX.p, Literal("b")))
+    writer.add((S, RDFS.label, Literal("c")))
+    second = writer.flush()
+    assert "@prefix ex:" in second and "@prefix rdfs:" not in second
+    assert isomorphic(_parse(first + second, "turtle"), _parse(
+        '<{0}> <{1}label> "a", "c" ; <{2}p> "b" .'.format(S, RDFS, EX), "turtle"
+    ))
+
+
+def test_turtle_binding_a_taken_prefix_is_ignored():
+    writer = TurtleWriter()
+    writer.bind("rdfs", EX)
+    writer.add((S, EX.p, Literal("a")))
+    out = writer.flush()
+    assert "<http://example.com/def/p>" in out
+    assert isomorphic(_parse(out, "turtle"), _parse('<{}> <{}p> "a" .'.format(S, EX), "turtle"))
+
+
+def test_ntriples_writer():
+    writer = NTriplesWriter()
+    writer.add((S, RDFS.label, Literal('a "quoted"\nline')))
+    out = writer.flush()
+    assert out.endswith(" .\n") and out.count("\n") == 1
+    assert writer.flush() == ""
@@ -0,0 +1,120 @@
+import time
+import pytest
+from api import record_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """
+    The record cache, in a temporary database.
+    """
+    monkeypatch.setattr(record_cache, "RECORD_CACHE_FILE", tmp_path / "records.sqlite")
+    monkeypatch.setattr(record_cache, "_local", type(record_cache._local)())
+    monkeypatch.setattr(record_cache, "_accessed", {})
+    monkeypatch.setattr(record_cache, "_puts", 0)
+    return record_cache
+
+
+def _accessed(cache, stratno):
+    return cache._connection().execute("SELECT accessed FROM records WHERE stratno = ?", (stratno,)).fetchone()[0]
+
+
+def test_put_and_get(cache):
+    record = {"uri": "http://example.com/SU1", "youngerBound": (251.9, "Ma"), "hierarchyLinks": [{"role": ("a", "b")}]}
+    cache.put("1", record, "<xml/>")
+    assert cache.get_xml("1") == "<xml/>"
+    assert cache.get_fetched("1") is not None
+    assert cache.get_record("2") is None and cache.get_xml("2") is None and cache.get_fetched("2") is None
+
+
+def test_restore_tuples_and_lists(cache):
+    record = {
+        "youngerBound": (251.9, "Ma"),
+        "nested": {"pair": ("x", ("y", "z"))},
+        "hierarchyLinks": [{"role": ("r", "role"), "targetUnit": ("t", None)}],
+    }
+    cache.put("1", record)
+    restored = cache.get_record("1")
+    assert restored["youngerBound"] == (251.9, "Ma")
+    assert restored["nested"]["pair"] == ("x", ("y", "z"))
+    # hierarchyLinks is the one list in a record, of dicts of tuples
+    assert restored["hierarchyLinks"] == [{"role": ("r", "role"), "targetUnit": ("t", None)}]
+    assert isinstance(restored["hierarchyLinks"], list)
+
+
+def test_expiry(cache, monkeypatch):
+    cache.put("1", {"a": 1}, "<xml/>")
+    monkeypatch.setattr(record_cache, "CACHE_HOURS", 0)
+    assert cache.get_record("1") is None
+    assert cache.get_xml("1") is None
+    assert cache.get_fetched("1") is None
+
+
+def test_reads_are_flushed_in_batches(cache, monkeypatch):
+    monkeypatch.setattr(record_cache, "ACCESS_FLUSH_RECORDS", 3)
+    monkeypatch.setattr(record_cache, "_flushed", time.time())
+    for stratno in ["1", "2", "3"]:
+        cache.put(stratno, {"a": 1})
+    put_at = {stratno: _accessed(cache, stratno) for stratno in ["1", "2", "3"]}
+
+    time.sleep(0.01)
+    cache.get_record("1")
+    cache.get_record("2")
+    # not yet written
+    assert _accessed(cache, "1") == put_at["1"] and _accessed(cache, "2") == put_at["2"]
+    assert set(cache._accessed) == {"1", "2"}
+
+    cache.get_record("3")
+    assert cache._accessed == {}
+    assert all(_accessed(cache, stratno) > put_at[stratno] for stratno in ["1", "2", "3"])
+
+
+def test_reads_are_flushed_when_old_enough(cache, monkeypatch):
+    cache.put("1", {"a": 1})
+    put_at = _accessed(cache, "1")
+    monkeypatch.setattr(record_cache, "_flushed", time.time() - record_cache.ACCESS_FLUSH_SECONDS)
+    time.sleep(0.01)
+    cache.get_record("1")
+    assert _accessed(cache, "1") > put_at
+
+
+def test_eviction_of_least_recently_read(cache, monkeypatch):
+    monkeypatch.setattr(record_cache, "RECORD_CACHE_MAX_ENTRIES", 3)
+    # trims on every put, as a hundredth of 3 is less than 1
+    for stratno in ["1", "2", "3"]:
+        cache.put(stratno, {"a": 1})
+        time.sleep(0.01)
+    # read, but only noted in memory: eviction writes the read times first
+    cache.get_record("1")
+    assert "1" in cache._accessed
+    cache.put("4", {"a": 1})
+    stored = {r[0] for r in cache._connection().execute("SELECT stratno FROM records")}
+    assert stored == {"1", "3", "4"}
+
+
+def test_eviction_every_hundredth_put(cache, monkeypatch):
+    monkeypatch.setattr(record_cache, "RECORD_CACHE_MAX_ENTRIES", 500)
+    count = "SELECT COUNT(*) FROM records"
+    # trimmed every 5 puts, so over by up to 4 between
+    for stratno in range(503):
+        cache.put(str(stratno), {"a": 1})
+    assert cache._connection().execute(count).fetchone()[0] == 503
+    for stratno in range(503, 505):
+        cache.put(str(stratno), {"a": 1})
+    assert cache._connection().execute(count).fetchone()[0] == 500
+
+
+def test_eviction_of_expired(cache, monkeypatch):
+    monkeypatch.setattr(record_cache, "RECORD_CACHE_MAX_ENTRIES", 1)
+    cache.put("1", {"a": 1})
+    monkeypatch.setattr(record_cache, "CACHE_HOURS", 0)
+    cache.put("2", {"a": 1})
+    assert cache._connection().execute("SELECT COUNT(*) FROM records").fetchone()[0] == 0
+
+
+def test_clear(cache):
+    cache.put("1", {"a": 1})
+    cache.get_record("1")
+    cache.clear()
+    assert cache._accessed == {}
+    assert cache.get_record("1") is None
@@ -0,0 +1,65 @@
+from api.response_cache import ResponseCache
+
+
+def _put(cache, key, size, version="v1"):
+    cache.put(version, (key,), b"x" * size, 200, [])
+
+
+def test_get_and_put():
+    cache = ResponseCache(1000)
+    assert cache.get("v1", ("a",)) is None
+    cache.put("v1", ("a",), b"body", 200, [("Content-Type", "text/plain")])
+    assert cache.get("v1", ("a",)) == (b"body", 200, [("Content-Type", "text/plain")])
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    # headers count towards the size
+    assert stats["bytes"] == len(b"body") + len("Content-Type") + len("text/plain")
+
+
+def test_least_recently_used_are_evicted_first():
+    cache = ResponseCache(300)
+    for key in "abc":
+        _put(cache, key, 100)
+    # a was used last, so b is the least recently used
+    assert cache.get("v1", ("a",)) is not None
+    _put(cache, "d", 100)
+    assert cache.get("v1", ("b",)) is None
+    assert all(cache.get("v1", (key,)) is not None for key in "acd")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_bytes():
+    cache = ResponseCache(300)
+    for key in "abc":
+        _put(cache, key, 100)
+    # as many as it takes to fit
+    _put(cache, "d", 250)
+    assert [cache.get("v1", (key,)) is not None for key in "abcd"] == [False, False, False, True]
+    assert cache.stats()["bytes"] == 250
+    assert cache.stats()["evictions"] == 3
+
+
+def test_replacing_an_entry():
+    cache = ResponseCache(300)
+    _put(cache, "a", 100)
+    _put(cache, "a", 200)
+    assert cache.stats()["bytes"] == 200 and cache.stats()["entries"] == 1
+
+
+def test_too_large():
+    cache = ResponseCache(300)
+    _put(cache, "a", 100)
+    _put(cache, "b", 301)
+    assert cache.get("v1", ("b",)) is None
+    assert cache.get("v1", ("a",)) is not None
+    assert cache.stats()["too_large"] == 1
+
+
+def test_another_version_empties_the_cache():
+    cache = ResponseCache(300)
+    _put(cache, "a", 100)
+    assert cache.get("v2", ("a",)) is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+    _put(cache, "a", 100, "v2")
+    assert cache.get("v1", ("a",)) is None
+    assert cache.stats()["version"] == "v1"
@@ -0,0 +1,86 @@
+import itertools
+import pytest
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.namespace import DCTERMS, RDF, XSD
+from api.snapshot import decode_term, encode_term
+
+EX = "http://example.com/"
+
+TERMS = [
+    URIRef(EX + "a"),
+    URIRef(EX + "ünïcode/☃"),
+    BNode("b0"),
+    Literal("plain"),
+    Literal(""),
+    Literal("chat", lang="fr"),
+    Literal("42", datatype=XSD.integer),
+    Literal("POLYGON ((1 2, 3 4))", datatype=URIRef("http://www.opengis.net/ont/geosparql#wktLiteral")),
+    Literal("ünïcode ☃"),
+]
+
+
+@pytest.mark.parametrize("term", TERMS, ids=repr)
+def test_encode_decode_round_trip(term):
+    decoded = decode_term(encode_term(term))
+    assert decoded == term
+    assert type(decoded) is type(term)
+    if isinstance(term, Literal):
+        assert decoded.language == term.language
+        assert decoded.datatype == term.datatype
+
+
+def test_terms_sort_as_uris_do():
+    # the indexes rely on term numbers sorting as the URIs do
+    uris = sorted(URIRef(EX + "SU{}".format(n)) for n in [1, 10, 2, 100, 20, 3])
+    assert sorted(uris, key=encode_term) == uris
+
+
+def _graph():
+    g = Graph()
+    subjects = [URIRef(EX + "s{}".format(i)) for i in range(6)]
+    for i, s in enumerate(subjects):
+        g.add((s, RDF.type, URIRef(EX + "Unit")))
+        g.add((s, DCTERMS.title, Literal("Unit {}".format(i), lang="en")))
+        g.add((s, DCTERMS.identifier, Literal(str(i))))
+        g.add((s, URIRef(EX + "next"), subjects[(i + 1) % len(subjects)]))
+        g.add((s, URIRef(EX + "node"), BNode("n{}".format(i))))
+    return g
+
+
+def test_triples_match_rdflib_for_every_pattern(snapshot_of):
+    g = _graph()
+    snapshot = snapshot_of(g)
+    assert set(snapshot) == set(g)
+    assert len(snapshot) == len(g)
+
+    terms = sorted({t for triple in g for t in triple}) + [URIRef(EX + "absent")]
+    for s, p, o in itertools.product([None] + terms, repeat=3):
+        if None not in (s, p, o) and (s, p, o) not in g and (s, p, o) != (terms[0], terms[1], terms[2]):
+            # every fully bound pattern would be slow: the absent ones are all alike
+            continue
+        assert set(snapshot.triples((s, p, o))) == set(g.triples((s, p, o))), (s, p, o)
+
+
+def test_numbers_and_terms(snapshot_of):
+    g = _graph()
+    snapshot = snapshot_of(g)
+    for t in {t for triple in g for t in triple}:
+        assert snapshot.term(snapshot.number(t)) == t
+    assert snapshot.number(URIRef(EX + "absent")) is None
+
+
+def test_lookups(snapshot_of):
+    g = _graph()
+    snapshot = snapshot_of(g)
+    s0 = URIRef(EX + "s0")
+    assert snapshot.value(subject=s0, predicate=DCTERMS.identifier) == Literal("0")
+    assert set(snapshot.subjects(predicate=RDF.type)) == set(g.subjects(predicate=RDF.type))
+    assert set(snapshot.predicate_objects(subject=s0)) == set(g.predicate_objects(subject=s0))
+    assert (s0, RDF.type, URIRef(EX + "Unit")) in snapshot
+
+
+def test_query_refuses_rather_than_copying(snapshot_of):
+    snapshot = snapshot_of(_graph())
+    with pytest.raises(NotImplementedError):
+        snapshot.query("SELECT * WHERE { ?s ?p ?o }")
+    assert snapshot._graph is None
@@ -0,0 +1,76 @@
+import random
+import pytest
+from api.index.spatial import PackedRTree, SpatialIndex
+from conftest import COLLECTION, UNIT
+
+
+def _box(rng, size=20.0):
+    x, y = rng.uniform(-180.0, 180.0 - size), rng.uniform(-90.0, 90.0 - size)
+    return x, y, x + rng.uniform(0.0, size), y + rng.uniform(0.0, size)
+
+
+def _intersects(box, minx, miny, maxx, maxy):
+    return not (box[0] > maxx or box[2] < minx or box[1] > maxy or box[3] < miny)
+
+
+def _within(box, minx, miny, maxx, maxy):
+    return box[0] >= minx and box[2] <= maxx and box[1] >= miny and box[3] <= maxy
+
+
+@pytest.mark.parametrize("n, node_size", [(0, 16), (1, 16), (15, 4), (500, 4), (3000, 16)])
+def test_packed_rtree_against_brute_force(n, node_size):
+    rng = random.Random(n)
+    boxes = [_box(rng) for _ in range(n)]
+    tree = PackedRTree(boxes, node_size=node_size)
+    assert sorted(tree.ids) == list(range(n))
+    for _ in range(50):
+        query = _box(rng, 120.0)
+        found = tree.search(*query)
+        assert len(found) == len(set(found))
+        assert sorted(found) == [i for i, box in enumerate(boxes) if _intersects(box, *query)]
+        found = tree.search(*query, within=True)
+        assert len(found) == len(set(found))
+        assert sorted(found) == [i for i, box in enumerate(boxes) if _within(box, *query)]
+
+
+def test_spatial_index_against_brute_force(units):
+    rng = random.Random(1)
+    stratnos = range(1, 801)
+    graph, membership = units({stratno: "Unit {}".format(stratno) for stratno in stratnos})
+    # some members have no envelope, and some envelopes are of units not in the Collection
+    envelopes = {stratno: _box(rng) for stratno in stratnos if stratno % 7 != 0}
+    envelopes[9999] = (0.0, 0.0, 1.0, 1.0)
+    index = SpatialIndex(graph, membership, [(stratno,) + box for stratno, box in envelopes.items()])
+    assert len(index) == len(envelopes)
+
+    members = list(membership.members(COLLECTION))
+    queries = [_box(rng, 120.0) for _ in range(40)]
+    # boxes crossing the antimeridian, and one covering everything
+    queries += [(150.0, -60.0, -150.0, 60.0), (100.0, -90.0, -100.0, 90.0), (179.0, -10.0, -179.0, 10.0)]
+    queries += [(-180.0, -90.0, 180.0, 90.0)]
+    for minx, miny, maxx, maxy in queries:
+        if minx > maxx:
+            expected = [
+                uri for uri in members
+                if _within_envelope(envelopes, uri, minx, miny, 180.0, maxy)
+                or _within_envelope(envelopes, uri, -180.0, miny, maxx, maxy)
+            ]
+        else:
+            expected = [uri for uri in members if _within_envelope(envelopes, uri, minx, miny, maxx, maxy)]
+        assert list(index.within(COLLECTION, minx, miny, maxx, maxy)) == expected
+
+    assert len(index.within(COLLECTION, -180.0, -90.0, 180.0, 90.0)) == len(envelopes) - 1
+    assert list(index.within("http://example.com/absent", -180.0, -90.0, 180.0, 90.0)) == []
+
+
+def _within_envelope(envelopes, uri, minx, miny, maxx, maxy):
+    box = envelopes.get(int(str(uri).split("/SU")[-1]))
+    return box is not None and _within(box, minx, miny, maxx, maxy)
+
+
+def test_spatial_index_without_envelopes(units):
+    graph, membership = units({1: "Unit 1"})
+    index = SpatialIndex(graph, membership, [])
+    assert len(index) == 0
+    assert list(index.within(COLLECTION, -180.0, -90.0, 180.0, 90.0)) == []
+    assert UNIT.format(1) in [str(uri) for uri in membership.members(COLLECTION)]
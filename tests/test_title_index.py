@@ -0,0 +1,41 @@
+import random
+from api.index.title_search import TitleIndex, tokenise
+from conftest import COLLECTION
+
+WORDS = ["lady", "loretta", "lord", "formation", "form", "group", "granite", "gneiss", "sandstone", "sand", "ñandú"]
+
+
+def _brute_force(members, titles, q):
+    # the ranking as documented: every search word is a title word or the start of one; then by the number of search
+    # words that are whole title words, whether the first title word starts with the first search word, the number of
+    # title words and the URI
+    words = tokenise(q)
+    if len(words) == 0:
+        return []
+    ranked = []
+    for uri in members:
+        tokens = tokenise(titles[int(str(uri).split("/SU")[-1])])
+        if not all(any(t.startswith(w) for t in tokens) for w in words):
+            continue
+        whole = sum(1 for w in words if w in tokens)
+        ranked.append((-whole, not tokens[0].startswith(words[0]), len(tokens), str(uri), uri))
+    return [r[-1] for r in sorted(ranked)]
+
+
+def test_title_index_against_brute_force(units):
+    rng = random.Random(3)
+    titles = {stratno: " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5))) for stratno in range(1, 601)}
+    titles[601] = "Lady Loretta Formation"
+    titles[602] = "LADY-LORETTA formation (upper)"
+    titles[603] = ""
+    graph, membership = units(titles)
+    index = TitleIndex(graph, membership)
+
+    members = list(membership.members(COLLECTION))
+    queries = ["lady lor", "Lady Loretta Formation", "form", "formation form", "s", "sand sandstone", "ñan", "xyz",
+               "", "  ", "lady lady", "GRANITE"]
+    queries += [" ".join(rng.choice(WORDS)[:rng.randint(1, 6)] for _ in range(rng.randint(1, 3))) for _ in range(200)]
+    for q in queries:
+        assert list(index.search(COLLECTION, q)) == _brute_force(members, titles, q), q
+
+    assert list(index.search("http://example.com/absent", "lady")) == []